@@ -1,6 +1,10 @@
 from rest_framework.authentication import BaseAuthentication
 from django.utils import timezone
-from .models import Session
+from .models import Session, UserData
+from .revocation import revocation_list
+from .session_cache import SessionCache, normalize_session_id
+from .session_refresh import SessionRefresher
+from .tokens import GuestToken, SessionToken
 
 # class SessionAuthentication(BaseAuthentication):
 #     def authenticate(self, request):
@@ -21,22 +25,102 @@ from .models import Session
 
 #         return (session.user_data, None)
 
+class SessionContext:
+    """
+    The session resolved for the current request.
+
+    Returned as request.auth and attached to the underlying HttpRequest, so that
+    RefreshSessionMiddleware can extend the session without loading it again.
+    """
+
+    def __init__(self, session_id, user_data, session_type, expires_at, lazy_guest=False):
+        self.session_id = session_id
+        self.user_data = user_data
+        self.session_type = session_type
+        self.expires_at = expires_at
+        # a guest identified by a GuestToken only: session_id is the guest uuid, there is no Session row
+        self.lazy_guest = lazy_guest
+
+    def cookie_value(self) -> str:
+        if self.lazy_guest:
+            return GuestToken.issue(self.session_id, self.expires_at)
+        return SessionToken.cookie_value(self.session_id, self.user_data.uuid, self.session_type, self.expires_at)
+
+
 class SessionAuthentication(BaseAuthentication):
     def authenticate(self, request):
-        session_id = request.COOKIES.get('session_id')
+        cookie = request.COOKIES.get('session_id')
 
+        if not cookie:
+            return None
+
+        if SessionToken.enabled():
+            claims = SessionToken.parse(cookie)
+            if claims is not None:
+                return self.authenticate_token(request, *claims)
+
+        if GuestToken.enabled():
+            claims = GuestToken.parse(cookie)
+            if claims is not None:
+                return self.authenticate_guest(request, *claims)
+
+        session_id = normalize_session_id(cookie)
         if not session_id:
             return None
 
+        cached = SessionCache.get(session_id)
+        if cached is not None:
+            user_data, session_type, expires_at = cached
+            expires_at = SessionRefresher.effective_expiry(session_id, expires_at)
+            return self.resolved(request, SessionContext(session_id, user_data, session_type, expires_at))
+
         try:
-            session = Session.objects.get(uuid=session_id, is_active=True)
+            session = Session.objects.select_related('user_data').get(uuid=session_id, is_active=True)
         except Session.DoesNotExist:
             return None
 
+        # A bump waiting in the write-behind buffer is newer than the row
+        expires_at = SessionRefresher.effective_expiry(session_id, session.expires_at)
+
         # Checking expiration date
-        if session.expires_at <= timezone.now():
+        if expires_at <= timezone.now():
             session.is_active = False
-            session.save(update_fields=["is_active"])
+            session.deactivated_at = timezone.now()
+            session.save(update_fields=["is_active", "deactivated_at"])
             return None
 
-        return (session.user_data, None)
\ No newline at end of file
+        SessionCache.store(session_id, session.user_data, session.session_type, expires_at)
+        return self.resolved(
+            request,
+            SessionContext(session_id, session.user_data, session.session_type, expires_at)
+        )
+
+    def authenticate_token(self, request, session_id, user_uuid, session_type, expires_at):
+        """Signed token mode: no Session lookup, the user comes from the snapshot cache when possible"""
+        expires_at = SessionRefresher.effective_expiry(session_id, expires_at)
+        if expires_at <= timezone.now() or revocation_list.is_revoked(session_id):
+            return None
+
+        user_data = SessionCache.get_user(user_uuid)
+        if user_data is None:
+            try:
+                user_data = UserData.objects.get(uuid=user_uuid)
+            except UserData.DoesNotExist:
+                return None
+            SessionCache.store_user(user_data)
+
+        return self.resolved(request, SessionContext(session_id, user_data, session_type, expires_at))
+
+    def authenticate_guest(self, request, guest_uuid, expires_at):
+        """Lazy guests get an unsaved UserData, persisted by AuthService.persist_guest when needed"""
+        if expires_at <= timezone.now() or revocation_list.is_revoked(guest_uuid):
+            return None
+
+        guest = UserData(uuid=guest_uuid, user_type='guest', is_profile_complete=False)
+        return self.resolved(request, SessionContext(guest_uuid, guest, 'guest', expires_at, lazy_guest=True))
+
+    @staticmethod
+    def resolved(request, context):
+        django_request = getattr(request, '_request', request)
+        django_request.session_context = context
+        return (context.user_data, context)
@@ -0,0 +1,195 @@
+import csv
+import io
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.parsers import BaseParser
+
+from .models import UserData
+from .serializers import EmployeeRowSerializer
+from .services import OrganizationService
+from .session_cache import SessionCache
+from .signals import employees_added
+
+logger = logging.getLogger(__name__)
+
+
+class EmployeeImportError(Exception):
+    """The payload as a whole can't be imported (bad format, too many rows)"""
+
+
+class CSVTextParser(BaseParser):
+    """Accepts a raw text/csv request body; the rows are parsed by parse_csv"""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return stream.read().decode('utf-8-sig')
+
+
+def parse_csv(text: str) -> list:
+    """CSV with a header row: phone_number (or phone), name, email"""
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames:
+        raise EmployeeImportError("CSV file is empty")
+
+    header = {name.strip().lower(): name for name in reader.fieldnames if name}
+    phone_column = header.get('phone_number') or header.get('phone')
+    if phone_column is None:
+        raise EmployeeImportError("CSV header must contain a phone_number column")
+
+    rows = []
+    for record in reader:
+        row = {'phone_number': (record.get(phone_column) or '').strip()}
+        for field in ('name', 'email'):
+            if field in header:
+                row[field] = (record.get(header[field]) or '').strip()
+        rows.append(row)
+    return rows
+
+
+def rows_from_request(request) -> list:
+    """Rows from a JSON body ({"employees": [...]} or a bare list), a text/csv body or an uploaded CSV file"""
+    upload = request.FILES.get('file') if hasattr(request, 'FILES') else None
+    if upload is not None:
+        try:
+            return parse_csv(upload.read().decode('utf-8-sig'))
+        except UnicodeDecodeError:
+            raise EmployeeImportError("CSV file must be UTF-8 encoded")
+
+    data = request.data
+    if isinstance(data, str):
+        return parse_csv(data)
+    if isinstance(data, dict):
+        data = data.get('employees')
+    if not isinstance(data, list):
+        raise EmployeeImportError("Expected a list of employees or a CSV file")
+    return data
+
+
+class EmployeeImporter:
+    """
+    Bulk version of OrganizationService.create_employee.
+
+    Rows are validated in one pass without touching the DB, the phone numbers are
+    resolved with a single IN query and the writes go through bulk_create/bulk_update
+    in chunks. Invitations are queued in the same transaction, skipped rows get none.
+    """
+
+    UPDATE_FIELDS = ['organization', 'name', 'email', 'updated_at']
+
+    def __init__(self, organization: UserData, batch_size: int = None, max_rows: int = None):
+        self.organization = organization
+        self.batch_size = batch_size or getattr(settings, 'EMPLOYEE_IMPORT_BATCH_SIZE', 500)
+        self.max_rows = max_rows or getattr(settings, 'EMPLOYEE_IMPORT_MAX_ROWS', 5000)
+
+    def run(self, rows: list, dry_run: bool = False) -> dict:
+        if len(rows) > self.max_rows:
+            raise EmployeeImportError(f"Too many rows: {len(rows)}, the limit is {self.max_rows}")
+
+        report = [{'row': index, 'status': None} for index in range(1, len(rows) + 1)]
+        valid = self.validate(rows, report)
+
+        existing = {
+            employee.phone_number: employee
+            for employee in UserData.objects.filter(phone_number__in=list(valid)).only(
+                'uuid', 'phone_number', 'name', 'email', 'user_type', 'organization'
+            )
+        }
+
+        to_create, to_update = [], []
+        now = timezone.now()
+        for phone_number, (entry, data) in valid.items():
+            employee = existing.get(phone_number)
+            if employee is None:
+                employee = UserData(
+                    phone_number=phone_number,
+                    user_type='employee',
+                    organization=self.organization,
+                    name=data.get('name') or None,
+                    email=data.get('email') or None,
+                    is_profile_complete=False
+                )
+                to_create.append(employee)
+                entry['status'] = 'created'
+            elif employee.user_type == 'organization':
+                entry['status'] = 'error'
+                entry['errors'] = {'phone_number': ["This number belongs to an organization account."]}
+                continue
+            elif employee.organization_id == self.organization.uuid:
+                entry['status'] = 'skipped'
+                entry['message'] = "This number has already been added as an employee."
+            else:
+                employee.organization = self.organization
+                if data.get('name'):
+                    employee.name = data['name']
+                if data.get('email'):
+                    employee.email = data['email']
+                employee.updated_at = now
+                to_update.append(employee)
+                entry['status'] = 'updated'
+            entry['uuid'] = str(employee.uuid)
+
+        if not dry_run:
+            self.save(to_create, to_update)
+
+        summary = {status: 0 for status in ('created', 'updated', 'skipped', 'error')}
+        for entry in report:
+            summary[entry['status']] += 1
+
+        return {
+            'dry_run': dry_run,
+            'total': len(rows),
+            'created': summary['created'],
+            'updated': summary['updated'],
+            'skipped': summary['skipped'],
+            'errors': summary['error'],
+            'rows': report,
+        }
+
+    def validate(self, rows: list, report: list) -> dict:
+        """Returns {phone_number: (report entry, validated data)} for the valid rows, first row wins"""
+        valid = {}
+        for row, entry in zip(rows, report):
+            if not isinstance(row, dict):
+                entry['status'] = 'error'
+                entry['errors'] = {'non_field_errors': ["Expected an object with phone_number, name, email."]}
+                continue
+
+            serializer = EmployeeRowSerializer(data=row)
+            entry['phone_number'] = row.get('phone_number')
+            if not serializer.is_valid():
+                entry['status'] = 'error'
+                entry['errors'] = serializer.errors
+                continue
+
+            phone_number = serializer.validated_data['phone_number']
+            if phone_number in valid:
+                entry['status'] = 'error'
+                entry['errors'] = {
+                    'phone_number': [f"Duplicate of row {valid[phone_number][0]['row']}."]
+                }
+                continue
+            valid[phone_number] = (entry, serializer.validated_data)
+        return valid
+
+    def save(self, to_create: list, to_update: list):
+        with transaction.atomic():
+            UserData.objects.bulk_create(to_create, batch_size=self.batch_size)
+            UserData.objects.bulk_update(to_update, self.UPDATE_FIELDS, batch_size=self.batch_size)
+
+            # bulk_update bypasses post_save, so the cached snapshots are dropped here
+            updated = [employee.uuid for employee in to_update]
+            transaction.on_commit(lambda: SessionCache.invalidate_users(updated))
+
+            # the queue is a table, so the invitations commit together with the employees
+            invited = to_create + to_update
+            if invited:
+                OrganizationService.queue_employee_invitations(invited, self.organization)
+                employees_added.send(sender=self.organization, employees=invited)
+
+        logger.info(
+            "Employee import for %s: %d created, %d updated",
+            self.organization.uuid, len(to_create), len(to_update)
+        )
@@ -0,0 +1,83 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+
+class HashingBusy(Exception):
+    """The password hashing queue is full; the caller should answer 503 and let the client retry"""
+
+
+class PasswordHasherPool:
+    """
+    Concurrency cap for password hashing.
+
+    The views are synchronous: run() blocks the request thread until the hash is done,
+    so nothing is offloaded. What the pool bounds is how many hashes a process runs at
+    once: PBKDF2 releases the GIL and would otherwise take one core per concurrent login,
+    PASSWORD_HASHING_WORKERS leaves the remaining cores to the other requests. At most
+    PASSWORD_HASHING_QUEUE logins may wait; beyond that submit() fails fast with
+    HashingBusy (a 503) instead of piling up request threads.
+    PASSWORD_HASHING_WORKERS = 0 hashes inline, without a cap.
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._executor is None:
+                workers = settings.PASSWORD_HASHING_WORKERS
+                self._slots = threading.BoundedSemaphore(workers + settings.PASSWORD_HASHING_QUEUE)
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+
+    def submit(self, fn, *args):
+        if self._executor is None:
+            self._start()
+
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn, *args):
+        if not getattr(settings, 'PASSWORD_HASHING_WORKERS', 0):
+            return fn(*args)
+        return self.submit(fn, *args).result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+
+password_pool = PasswordHasherPool()
+
+
+def verify_password(raw_password: str, encoded: str) -> tuple[bool, str | None]:
+    """
+    Checks the password and, if the stored hash uses outdated hasher settings,
+    returns a fresh hash to store: (is_correct, new_encoded or None).
+    Runs on the pool, so it must not touch the database.
+    """
+    upgraded = None
+
+    def setter(password):
+        nonlocal upgraded
+        upgraded = make_password(password)
+
+    return check_password(raw_password, encoded, setter), upgraded
+
+
+def hash_password(raw_password: str) -> str:
+    return make_password(raw_password)
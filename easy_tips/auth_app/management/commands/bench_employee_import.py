@@ -0,0 +1,73 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from auth_app.employee_import import EmployeeImporter
+from auth_app.models import UserData
+from auth_app.services import OrganizationService
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports N generated employees (a share of them already registered) once through "
+        "add_employee's per-row path and once through the bulk importer; the data is rolled back"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2000)
+        parser.add_argument('--existing', type=float, default=0.2, help="share of rows that are already users")
+
+    def handle(self, *args, **options):
+        rows = [
+            {'phone_number': f"+7999{index:07d}", 'name': f"Employee {index}", 'email': f"e{index}@example.com"}
+            for index in range(options['rows'])
+        ]
+        existing = int(len(rows) * options['existing'])
+
+        self.report('per row (create_employee)', *self.measure(rows, existing, self.per_row))
+        self.report('bulk (EmployeeImporter)', *self.measure(rows, existing, self.bulk))
+
+    def measure(self, rows, existing, strategy):
+        try:
+            with transaction.atomic():
+                organization = UserData.objects.create(user_type='organization', login='bench-import-org')
+                UserData.objects.bulk_create([
+                    UserData(phone_number=row['phone_number'], user_type='employee') for row in rows[:existing]
+                ])
+                # invitations are not part of the measurement
+                queue = OrganizationService.queue_employee_invitations
+                OrganizationService.queue_employee_invitations = staticmethod(lambda employees, org: None)
+                try:
+                    # counted with a wrapper, connection.queries is capped at 9000 entries
+                    queries = []
+                    with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+                        started = time.perf_counter()
+                        strategy(organization, rows)
+                        elapsed = time.perf_counter() - started
+                finally:
+                    OrganizationService.queue_employee_invitations = queue
+                imported = UserData.objects.filter(organization=organization).count()
+                raise _Rollback((elapsed, len(queries), imported))
+        except _Rollback as result:
+            return result.args[0]
+
+    @staticmethod
+    def per_row(organization, rows):
+        for row in rows:
+            if UserData.objects.filter(phone_number=row['phone_number'], organization=organization).exists():
+                continue
+            OrganizationService.create_employee(organization, row['phone_number'], row['name'], row['email'])
+
+    @staticmethod
+    def bulk(organization, rows):
+        EmployeeImporter(organization).run(rows)
+
+    def report(self, label, elapsed, queries, imported):
+        self.stdout.write(
+            f"{label:28s} {imported:6d} employees  {elapsed * 1000:9.1f} ms  {queries:6d} queries"
+        )
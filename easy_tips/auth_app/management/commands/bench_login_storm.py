@@ -0,0 +1,98 @@
+import os
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from auth_app.hashing import HashingBusy, PasswordHasherPool, hash_password, verify_password
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the same storm of concurrent organization password checks with hashing inline "
+        "and capped by the hashing pool, and measures the latency of an unrelated endpoint "
+        "(renew-auth) next to the login latency, throughput and 503s. The pool does not offload "
+        "anything: the request thread waits for its hash, only the number of hashes running at "
+        "once is capped"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=os.cpu_count() * 2,
+                            help="concurrent login request threads, the same in every run")
+        parser.add_argument('--duration', type=float, default=5.0)
+        parser.add_argument('--workers', type=int, default=settings.PASSWORD_HASHING_WORKERS)
+        parser.add_argument('--queue', type=int, default=settings.PASSWORD_HASHING_QUEUE)
+
+    def handle(self, *args, **options):
+        encoded = hash_password('storm-password')
+
+        self.report('idle', self.measure(None, encoded, options))
+        with override_settings(PASSWORD_HASHING_WORKERS=0):
+            pool = PasswordHasherPool()
+            self.report(f"{options['logins']} logins, inline hashing", self.measure(pool, encoded, options))
+        with override_settings(PASSWORD_HASHING_WORKERS=options['workers'], PASSWORD_HASHING_QUEUE=options['queue']):
+            pool = PasswordHasherPool()
+            self.report(
+                f"{options['logins']} logins, capped at {options['workers']} hashes "
+                f"(queue {options['queue']})",
+                self.measure(pool, encoded, options)
+            )
+            pool.shutdown()
+
+    def measure(self, pool, encoded, options):
+        stop = threading.Event()
+        lock = threading.Lock()
+        login_latencies = []
+        busy = [0]
+
+        def login():
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    pool.run(verify_password, 'storm-password', encoded)
+                except HashingBusy:
+                    with lock:
+                        busy[0] += 1
+                    # a rejected client backs off before retrying
+                    time.sleep(0.05)
+                    continue
+                with lock:
+                    login_latencies.append((time.perf_counter() - started) * 1000)
+
+        threads = []
+        if pool is not None:
+            threads = [threading.Thread(target=login) for _ in range(options['logins'])]
+            for thread in threads:
+                thread.start()
+
+        client = Client()
+        latencies = []
+        deadline = time.monotonic() + options['duration']
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            client.get('/api/auth/renew-auth/')
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return latencies, login_latencies, busy[0], options['duration']
+
+    def report(self, label, result):
+        latencies, login_latencies, busy, duration = result
+        line = f"{label}: renew-auth p50 {statistics.median(latencies):.2f} ms, p99 {self.p99(latencies):.2f} ms"
+        if login_latencies:
+            line += (
+                f"; logins {len(login_latencies) / duration:.1f}/s, "
+                f"p50 {statistics.median(login_latencies):.0f} ms, p99 {self.p99(login_latencies):.0f} ms, "
+                f"{busy / duration:.1f} 503s/s"
+            )
+        self.stdout.write(line)
+
+    @staticmethod
+    def p99(latencies):
+        latencies = sorted(latencies)
+        return latencies[max(int(len(latencies) * 0.99) - 1, 0)]
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from auth_app.messaging import FakeProvider, MessageQueue, MessageWorker
+from auth_app.models import OutboundMessage
+
+
+class Command(BaseCommand):
+    help = (
+        "End-to-end send throughput against the local fake provider: enqueue N messages, "
+        "drain them with the worker, report messages/s; the rows are deleted afterwards"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000)
+        parser.add_argument('--latency', type=float, default=0.05, help="seconds per provider call")
+        parser.add_argument('--failure-rate', type=float, default=0.0)
+        parser.add_argument('--concurrency', type=int, action='append', default=None,
+                            help="provider concurrency to measure (repeatable)")
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        for concurrency in options['concurrency'] or [1, 4, 16, 64]:
+            provider = FakeProvider('bench', {
+                'CONCURRENCY': concurrency,
+                'LATENCY': options['latency'],
+                'FAILURE_RATE': options['failure_rate'],
+            })
+            MessageQueue.enqueue_many(
+                'employee_invitation',
+                ((f"+7999{index:07d}", "bench") for index in range(options['messages'])),
+                provider='bench'
+            )
+
+            worker = MessageWorker({'bench': provider}, batch_size=options['batch_size'])
+            # retries are due immediately, the backoff itself is not what is measured
+            worker.base_delay = 0
+            started = time.perf_counter()
+            totals = {'sent': 0, 'retried': 0, 'dead': 0}
+            try:
+                while True:
+                    stats = worker.run_once()
+                    if not any(stats.values()):
+                        break
+                    for key, value in stats.items():
+                        totals[key] += value
+            finally:
+                worker.shutdown()
+                elapsed = time.perf_counter() - started
+                OutboundMessage.objects.filter(provider='bench').delete()
+
+            self.stdout.write(
+                f"concurrency {concurrency:3d}: {totals['sent']} sent, {totals['retried']} retries, "
+                f"{totals['dead']} dead in {elapsed:.2f}s  ({totals['sent'] / elapsed:.0f} msg/s)"
+            )
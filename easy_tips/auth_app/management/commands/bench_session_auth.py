@@ -0,0 +1,68 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.client import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from auth_app.authentication import SessionAuthentication
+from auth_app.models import Session, UserData
+from auth_app.services import AuthService
+from auth_app.session_cache import SessionCache
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures DB queries and latency of SessionAuthentication on a cache miss and a cache hit, "
+        "against the uncached Session lookup. Every query on the connection is counted, the cache "
+        "table ones included: with the DatabaseCache a hit is no cheaper than the lookup, the saving "
+        "needs a shared tier outside the database (REDIS_URL)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = options['requests']
+
+        with transaction.atomic():
+            user_data = UserData.objects.create(phone_number=None, user_type='employee', name='bench')
+            session = AuthService.create_employee_session(user_data)
+            session_id = str(session.uuid)
+
+            request = RequestFactory().get('/api/profile/')
+            request.COOKIES['session_id'] = session_id
+            authenticator = SessionAuthentication()
+
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as baseline_queries:
+                for _ in range(total):
+                    Session.objects.select_related('user_data').get(uuid=session_id, is_active=True)
+            self.report('uncached lookup', baseline_queries.captured_queries, total, time.perf_counter() - started)
+
+            SessionCache.invalidate(session_id)
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as miss_queries:
+                authenticator.authenticate(request)
+            self.report('cache miss', miss_queries.captured_queries, 1, time.perf_counter() - started)
+
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as hit_queries:
+                for _ in range(total):
+                    authenticator.authenticate(request)
+            self.report('cache hit', hit_queries.captured_queries, total, time.perf_counter() - started)
+
+            transaction.set_rollback(True)
+
+    def report(self, label, queries, requests, elapsed):
+        cache_tables = {
+            cache['LOCATION'] for cache in settings.CACHES.values()
+            if cache['BACKEND'] == 'django.core.cache.backends.db.DatabaseCache'
+        }
+        cache_queries = [q for q in queries if any(table in q['sql'] for table in cache_tables)]
+        self.stdout.write(
+            f"{label}: {len(queries) / requests:.2f} queries/request "
+            f"({len(cache_queries) / requests:.2f} on the cache table), "
+            f"avg latency {elapsed / requests * 1000:.3f} ms"
+        )
@@ -0,0 +1,102 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.exceptions import Throttled
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from auth_app.views import send_code
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the throttle check of the send_code view for legitimate users alone and interleaved with an "
+        "attack burst (one IP spraying phone numbers, many IPs hammering one phone) and compares the outcomes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--attack', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.factory = APIRequestFactory()
+        # the view's own check_throttles, as DRF runs it for every request
+        self.view = send_code.cls()
+        self.run_id = random.randint(100, 999)
+
+        legit = [self.make_request(f'10.{self.run_id % 250}.1.{i % 250}', self.phone(1, i))
+                 for i in range(options['users'])]
+        baseline = self.run(legit)
+
+        legit = [self.make_request(f'10.{self.run_id % 250}.2.{i % 250}', self.phone(2, i))
+                 for i in range(options['users'])]
+        attack = []
+        for i in range(options['attack']):
+            if i % 2:
+                attack.append(self.make_request('192.0.2.1', self.phone(3, i)))
+            else:
+                attack.append(self.make_request(f'198.51.{i // 250 % 250}.{i % 250}', self.phone(4, 0)))
+
+        mixed = legit + attack
+        random.shuffle(mixed)
+        under_attack = self.run(mixed, legit_ids={id(request) for request in legit})
+
+        self.stdout.write(
+            f"baseline: {baseline['legit_allowed']}/{len(legit)} legitimate requests allowed, "
+            f"{baseline['checks_per_second']:.0f} checks/s"
+        )
+        self.stdout.write(
+            f"under attack: {under_attack['legit_allowed']}/{len(legit)} legitimate requests allowed, "
+            f"{under_attack['attack_allowed']}/{len(attack)} attack requests allowed, "
+            f"{under_attack['checks_per_second']:.0f} checks/s"
+        )
+        self.stdout.write(
+            f"avg check latency: accepted {under_attack['accepted_ms']:.3f} ms, "
+            f"rejected {under_attack['rejected_ms']:.3f} ms"
+        )
+
+    def phone(self, group, i):
+        return f'+7{self.run_id}{group}{i:07d}'
+
+    def make_request(self, ip, phone_number):
+        request = self.factory.post('/api/auth/send-code/', {'phone_number': phone_number},
+                                    format='json', REMOTE_ADDR=ip)
+        return Request(request, parsers=[JSONParser()])
+
+    def run(self, requests, legit_ids=None):
+        legit_allowed = attack_allowed = 0
+        accepted_time = rejected_time = 0.0
+        accepted = rejected = 0
+
+        started = time.perf_counter()
+        for request in requests:
+            check_started = time.perf_counter()
+            try:
+                self.view.check_throttles(request)
+                allowed = True
+            except Throttled:
+                allowed = False
+            elapsed = time.perf_counter() - check_started
+
+            if allowed:
+                accepted += 1
+                accepted_time += elapsed
+            else:
+                rejected += 1
+                rejected_time += elapsed
+
+            if legit_ids is None or id(request) in legit_ids:
+                legit_allowed += allowed
+            else:
+                attack_allowed += allowed
+        total = time.perf_counter() - started
+
+        return {
+            'legit_allowed': legit_allowed,
+            'attack_allowed': attack_allowed,
+            'checks_per_second': len(requests) / total,
+            'accepted_ms': accepted_time / accepted * 1000 if accepted else 0.0,
+            'rejected_ms': rejected_time / rejected * 1000 if rejected else 0.0,
+        }
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from auth_app.session_reaper import SessionReaper
+
+
+class Command(BaseCommand):
+    help = "Deletes expired and inactive sessions in bounded batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retention-days', type=int, default=None,
+                            help="Keep expired/inactive sessions for this many days (SESSION_RETENTION_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Rows per DELETE (SESSION_REAPER_BATCH_SIZE)")
+        parser.add_argument('--pause', type=float, default=0,
+                            help="Seconds to sleep between batches")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Only report what would be deleted")
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            report = SessionReaper.report(options['retention_days'])
+            self.stdout.write(f"Cutoff: {report['cutoff'].isoformat()}")
+            self.stdout.write(f"Expired sessions: {report['expired_sessions']}")
+            self.stdout.write(f"Inactive sessions: {report['inactive_sessions']}")
+            self.stdout.write(f"Expired revocation entries: {report['revoked_entries']}")
+            return
+
+        stats = SessionReaper.purge(
+            retention_days=options['retention_days'],
+            batch_size=options['batch_size'],
+            pause=options['pause']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {stats['sessions_deleted']} sessions and {stats['revoked_deleted']} revocation entries "
+            f"in {stats['batches']} batches, {stats['elapsed']:.2f}s ({stats['rows_per_second']:.0f} rows/s)"
+        ))
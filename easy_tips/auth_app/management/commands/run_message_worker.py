@@ -0,0 +1,42 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from auth_app.messaging import MessageWorker, get_providers
+
+
+class Command(BaseCommand):
+    help = "Sends queued SMS (verification codes, employee invitations) until stopped"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--provider', action='append', default=None,
+                            help="Only serve this provider (repeatable), all of MESSAGE_PROVIDERS by default")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Messages claimed per provider and round (MESSAGE_BATCH_SIZE)")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to wait when the queue is empty")
+        parser.add_argument('--once', action='store_true',
+                            help="Send one batch and exit")
+
+    def handle(self, *args, **options):
+        providers = get_providers()
+        if options['provider']:
+            providers = {name: providers[name] for name in options['provider']}
+
+        worker = MessageWorker(providers, batch_size=options['batch_size'])
+        try:
+            if options['once']:
+                stats = worker.run_once()
+                self.stdout.write(self.style.SUCCESS(
+                    f"Sent {stats['sent']}, retried {stats['retried']}, dead {stats['dead']}"
+                ))
+                return
+
+            stop = threading.Event()
+            signal.signal(signal.SIGTERM, lambda *_: stop.set())
+            signal.signal(signal.SIGINT, lambda *_: stop.set())
+            self.stdout.write(f"Message worker started for: {', '.join(providers)}")
+            worker.run(poll_interval=options['poll_interval'], stop=stop)
+        finally:
+            worker.shutdown()
@@ -0,0 +1,221 @@
+"""
+Durable outbound SMS queue.
+
+Requests only insert OutboundMessage rows (MessageQueue.enqueue); the worker
+(`manage.py run_message_worker`) claims due messages in batches with
+SELECT ... FOR UPDATE SKIP LOCKED, sends them through the configured provider
+with at most CONCURRENCY calls in flight per provider, and reschedules failures
+with exponential backoff until MESSAGE_MAX_ATTEMPTS, after which they are dead.
+
+    MESSAGE_PROVIDERS = {
+        'console': {'BACKEND': 'auth_app.messaging.ConsoleProvider', 'CONCURRENCY': 1},
+        'fake': {'BACKEND': 'auth_app.messaging.FakeProvider', 'CONCURRENCY': 16, 'LATENCY': 0.05},
+    }
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboundMessage
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderError(Exception):
+    """Temporary failure, the message is retried"""
+
+
+class PermanentProviderError(ProviderError):
+    """The provider rejected the message (bad number, ...), retrying won't help"""
+
+
+class BaseProvider:
+    def __init__(self, name, options):
+        self.name = name
+        self.options = options
+        self.concurrency = options.get('CONCURRENCY', 1)
+
+    def send(self, recipient: str, body: str):
+        raise NotImplementedError
+
+
+class ConsoleProvider(BaseProvider):
+    """Development provider: prints the message, until a real SMS gateway is wired in"""
+
+    def send(self, recipient: str, body: str):
+        print(f"SMS для {recipient}: {body}")
+
+
+class FakeProvider(BaseProvider):
+    """Simulates a network provider (latency + random failures) for benchmarks"""
+
+    def __init__(self, name, options):
+        super().__init__(name, options)
+        self.latency = options.get('LATENCY', 0.05)
+        self.failure_rate = options.get('FAILURE_RATE', 0.0)
+        self.lock = threading.Lock()
+        self.sent = 0
+
+    def send(self, recipient: str, body: str):
+        time.sleep(self.latency)
+        if random.random() < self.failure_rate:
+            raise ProviderError("fake provider failure")
+        with self.lock:
+            self.sent += 1
+
+
+def get_providers() -> dict:
+    return {
+        name: import_string(options['BACKEND'])(name, options)
+        for name, options in getattr(settings, 'MESSAGE_PROVIDERS', {}).items()
+    }
+
+
+def default_provider() -> str:
+    return getattr(settings, 'MESSAGE_DEFAULT_PROVIDER', 'console')
+
+
+class MessageQueue:
+    @staticmethod
+    def enqueue(kind: str, recipient: str, body: str, expires_in: int = None, provider: str = None):
+        return MessageQueue.enqueue_many(kind, [(recipient, body)], expires_in=expires_in, provider=provider)[0]
+
+    @staticmethod
+    def enqueue_many(kind: str, messages, expires_in: int = None, provider: str = None) -> list:
+        """messages: iterable of (recipient, body); one INSERT for all of them"""
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=expires_in) if expires_in else None
+        return OutboundMessage.objects.bulk_create([
+            OutboundMessage(
+                kind=kind,
+                provider=provider or default_provider(),
+                recipient=recipient,
+                body=body,
+                next_attempt_at=now,
+                expires_at=expires_at,
+            )
+            for recipient, body in messages
+        ])
+
+
+class MessageWorker:
+    # bodies that must not stay in the database once they are of no use
+    SENSITIVE_KINDS = {'verification_code'}
+
+    def __init__(self, providers: dict = None, batch_size: int = None):
+        self.providers = providers if providers is not None else get_providers()
+        self.batch_size = batch_size or getattr(settings, 'MESSAGE_BATCH_SIZE', 100)
+        self.max_attempts = getattr(settings, 'MESSAGE_MAX_ATTEMPTS', 5)
+        self.base_delay = getattr(settings, 'MESSAGE_RETRY_BASE_DELAY', 5)
+        self.max_delay = getattr(settings, 'MESSAGE_RETRY_MAX_DELAY', 600)
+        self.lease = getattr(settings, 'MESSAGE_LEASE', 60)
+        self.pools = {
+            name: ThreadPoolExecutor(max_workers=provider.concurrency, thread_name_prefix=f'sms-{name}')
+            for name, provider in self.providers.items()
+        }
+
+    def claim(self, provider: str) -> list:
+        """Reserves up to batch_size due messages; stale 'sending' rows of a crashed worker are due too"""
+        now = timezone.now()
+        with transaction.atomic():
+            messages = list(
+                OutboundMessage.objects.select_for_update(skip_locked=True).filter(
+                    provider=provider,
+                    status__in=['pending', 'sending'],
+                    next_attempt_at__lte=now,
+                ).order_by('next_attempt_at')[:self.batch_size]
+            )
+            if messages:
+                OutboundMessage.objects.filter(pk__in=[message.pk for message in messages]).update(
+                    status='sending',
+                    next_attempt_at=now + timedelta(seconds=self.lease),
+                )
+        return messages
+
+    def run_once(self) -> dict:
+        """One batch per provider, sent concurrently; returns {'sent', 'retried', 'dead'}"""
+        stats = {'sent': 0, 'retried': 0, 'dead': 0}
+        claimed = {name: self.claim(name) for name in self.providers}
+
+        futures = []
+        for name, messages in claimed.items():
+            for message in messages:
+                futures.append((message, self.pools[name].submit(self.deliver, self.providers[name], message)))
+
+        now = timezone.now()
+        finished = []
+        for message, future in futures:
+            error = future.result()
+            message.attempts += 1
+            if error is None:
+                message.status = 'sent'
+                message.sent_at = now
+                message.last_error = ''
+                stats['sent'] += 1
+            elif isinstance(error, PermanentProviderError) or message.attempts >= self.max_attempts \
+                    or self.expired(message, now):
+                message.status = 'dead'
+                message.last_error = str(error)
+                stats['dead'] += 1
+            else:
+                message.status = 'pending'
+                message.next_attempt_at = now + timedelta(seconds=self.backoff(message.attempts))
+                message.last_error = str(error)
+                stats['retried'] += 1
+
+            if message.status != 'pending' and message.kind in self.SENSITIVE_KINDS:
+                message.body = ''
+            finished.append(message)
+
+        if finished:
+            OutboundMessage.objects.bulk_update(
+                finished,
+                ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at', 'body'],
+                batch_size=500
+            )
+        if stats['retried'] or stats['dead']:
+            logger.warning("Outbound messages: %(sent)d sent, %(retried)d retried, %(dead)d dead", stats)
+        return stats
+
+    def deliver(self, provider: BaseProvider, message: OutboundMessage):
+        """Runs on the provider pool; returns the error or None"""
+        if self.expired(message, timezone.now()):
+            return PermanentProviderError("expired before it could be sent")
+        try:
+            provider.send(message.recipient, message.body)
+        except ProviderError as e:
+            return e
+        except Exception as e:
+            logger.exception("Provider %s failed on message %s", provider.name, message.pk)
+            return ProviderError(repr(e))
+        return None
+
+    @staticmethod
+    def expired(message: OutboundMessage, now) -> bool:
+        return message.expires_at is not None and message.expires_at <= now
+
+    def backoff(self, attempts: int) -> float:
+        """Exponential with full jitter in the upper half: base * 2^(n-1), capped"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay / 2 + random.random() * delay / 2
+
+    def run(self, poll_interval: float = 1.0, stop: threading.Event = None):
+        """Worker loop: drains batches back to back, sleeps poll_interval when idle"""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            close_old_connections()
+            stats = self.run_once()
+            if not any(stats.values()):
+                stop.wait(poll_interval)
+
+    def shutdown(self):
+        for pool in self.pools.values():
+            pool.shutdown(wait=True)
@@ -1,41 +1,46 @@
-from django.utils import timezone
-from datetime import timedelta
 from django.conf import settings
-from .models import Session
+
+from .session_reaper import start_periodic_reaper
+from .session_refresh import SessionRefresher
+
 
 class RefreshSessionMiddleware:
     """
-    Automatically extends session and cookie expiration on each request if the user is logged in.
+    Extends session and cookie expiration for requests authenticated by SessionAuthentication.
+
+    The session is not looked up again: SessionAuthentication leaves the resolved
+    SessionContext on the request. The row is only written when the remaining lifetime
+    falls below SESSION_REFRESH_THRESHOLD; anonymous and error responses are left untouched.
     """
     def __init__(self, get_response):
         self.get_response = get_response
+        start_periodic_reaper()
 
     def __call__(self, request):
+        request.session_context = None
         response = self.get_response(request)
 
-        session_id = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
-        if not session_id:
+        context = request.session_context
+        if context is None or response.status_code >= 400:
+            return response
+
+        # login/logout views manage the cookie themselves
+        if settings.SESSION_COOKIE_NAME in response.cookies:
             return response
 
-        try:
-            session = Session.objects.get(uuid=session_id, is_active=True)
-        except Session.DoesNotExist:
+        # lazy guests have no row to extend, their token keeps its expiry
+        if not context.lazy_guest and SessionRefresher.needs_refresh(context) \
+                and not SessionRefresher.extend(context):
             return response
 
-        now = timezone.now()
-        if session.expires_at > now:
-            # Extending the session
-            session.expires_at += timedelta(seconds=settings.SESSION_COOKIE_AGE)
-            session.save(update_fields=["expires_at"])
-
-            # We update the cookie with a new expiration date.
-            response.set_cookie(
-                settings.SESSION_COOKIE_NAME,
-                str(session.uuid),
-                httponly=True,
-                secure=settings.SESSION_COOKIE_SECURE,
-                samesite=settings.SESSION_COOKIE_SAMESITE,
-                max_age=settings.SESSION_COOKIE_AGE
-            )
+        # We update the cookie with a new expiration date.
+        response.set_cookie(
+            settings.SESSION_COOKIE_NAME,
+            context.cookie_value(),
+            httponly=True,
+            secure=settings.SESSION_COOKIE_SECURE,
+            samesite=settings.SESSION_COOKIE_SAMESITE,
+            max_age=settings.SESSION_COOKIE_AGE
+        )
 
         return response
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-17 23:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0009_userdata_description_userdata_login_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedSession',
+            fields=[
+                ('session_uuid', models.UUIDField(primary_key=True, serialize=False)),
+                ('expires_at', models.DateTimeField()),
+                ('revoked_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='userdata',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, upload_to='avatars/'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-17 23:17
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the indexes are built without locking writes to the sessions table
+    atomic = False
+
+    dependencies = [
+        ('auth_app', '0010_revokedsession_userdata_avatar'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='session',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['user_data', 'expires_at'], name='session_active_user_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='session',
+            index=models.Index(fields=['expires_at'], name='session_expires_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-17 23:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0012_outboundmessage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userdata',
+            index=models.Index(fields=['organization', 'created_at', 'uuid'], name='userdata_org_created_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.7 on 2026-10-18 00:18
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def start_retention_now(apps, schema_editor):
+    """Sessions logged out before this migration have no deactivation time; they get a full retention from now"""
+    Session = apps.get_model('auth_app', 'Session')
+    Session.objects.filter(is_active=False, deactivated_at__isnull=True).update(deactivated_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0013_userdata_org_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='deactivated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(start_retention_now, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 import uuid
 from django.db import models
+from django.utils import timezone
 
 class UserData(models.Model):
     USER_TYPES = [
@@ -37,6 +38,12 @@ class UserData(models.Model):
                                    null=True, blank=True,
                                    related_name='employees')
 
+    class Meta:
+        indexes = [
+            # organization_employees pages through an organization's staff by (created_at, uuid)
+            models.Index(fields=['organization', 'created_at', 'uuid'], name='userdata_org_created_idx'),
+        ]
+
     @property
     def avatar_link(self):
         if self.avatar and hasattr(self.avatar, 'url'):
@@ -97,6 +104,70 @@ class Session(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
     is_active = models.BooleanField(default=True)
+    # set with is_active=False, the reaper keeps logged-out sessions SESSION_RETENTION_DAYS from here
+    deactivated_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # "active sessions of a user": deactivate_other_sessions, employee is_active flags
+            models.Index(
+                fields=['user_data', 'expires_at'],
+                condition=models.Q(is_active=True),
+                name='session_active_user_idx'
+            ),
+            # SessionReaper
+            models.Index(fields=['expires_at'], name='session_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"Session {self.uuid} for {self.user_data.phone_number}"
+
+class RevokedSession(models.Model):
+    """Sessions ended before their expiry; consulted when authenticating signed session tokens"""
+    session_uuid = models.UUIDField(primary_key=True)
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"Revoked session {self.session_uuid}"
+
+class OutboundMessage(models.Model):
+    """SMS waiting for / sent by the delivery worker (auth_app/messaging.py)"""
+    KINDS = [
+        ('verification_code', 'Код подтверждения'),
+        ('employee_invitation', 'Приглашение сотрудника'),
+    ]
+    STATUSES = [
+        ('pending', 'Ожидает'),
+        ('sending', 'Отправляется'),
+        ('sent', 'Отправлено'),
+        ('dead', 'Не доставлено'),
+    ]
+
+    kind = models.CharField(max_length=32, choices=KINDS)
+    provider = models.CharField(max_length=32)
+    recipient = models.CharField(max_length=32)
+    body = models.TextField(blank=True)
+
+    status = models.CharField(max_length=16, choices=STATUSES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # for a 'sending' message this is the end of the worker's lease, after that it is picked up again
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    # messages that are useless after a while (verification codes) are not sent late
+    expires_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['provider', 'next_attempt_at'],
+                name='outbound_due_idx',
+                condition=models.Q(status__in=['pending', 'sending']),
+            ),
+        ]
 
     def __str__(self):
-        return f"Session {self.uuid} for {self.user_data.phone_number}"
\ No newline at end of file
+        return f"{self.kind} to {self.recipient} ({self.status})"
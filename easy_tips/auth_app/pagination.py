@@ -0,0 +1,121 @@
+import base64
+import json
+import uuid
+from datetime import datetime
+
+from django.db import connections
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class KeysetPaginator:
+    """
+    Keyset ("seek") pagination over a unique sort key, e.g. ('created_at', 'uuid').
+
+    The page is fetched with WHERE (a, b) > (last a, last b) ORDER BY a, b LIMIT n + 1
+    instead of OFFSET, so every page costs the same however deep it is, and rows
+    inserted meanwhile neither shift nor duplicate entries. The last field must be
+    unique to make the order stable. Fields prefixed with '-' are descending.
+    """
+
+    def __init__(self, ordering, page_size=50, max_page_size=200):
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+
+    def get_page_size(self, value) -> int:
+        if value in (None, ''):
+            return self.page_size
+        try:
+            page_size = int(value)
+        except (TypeError, ValueError):
+            raise InvalidCursor("page_size must be a positive integer")
+        if page_size < 1:
+            raise InvalidCursor("page_size must be a positive integer")
+        return min(page_size, self.max_page_size)
+
+    def paginate(self, queryset, cursor=None, page_size=None):
+        """Returns (rows, next cursor or None)"""
+        page_size = self.get_page_size(page_size)
+        queryset = queryset.order_by(*self.ordering)
+        if cursor:
+            queryset = queryset.filter(self.after(self.decode(cursor)))
+
+        rows = list(queryset[:page_size + 1])
+        if len(rows) <= page_size:
+            return rows, None
+        rows = rows[:page_size]
+        return rows, self.encode([getattr(rows[-1], field) for field in self.fields])
+
+    def after(self, values) -> Q:
+        """
+        (a > x) OR (a = x AND b > y) OR ..., with < for descending fields.
+
+        The redundant a >= x in front lets the database use it as an index range bound.
+        """
+        condition = Q()
+        equal = Q()
+        for ordering, field, value in zip(self.ordering, self.fields, values):
+            lookup = 'lt' if ordering.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+
+        leading = 'lte' if self.ordering[0].startswith('-') else 'gte'
+        return Q(**{f'{self.fields[0]}__{leading}': values[0]}) & condition
+
+    def encode(self, values) -> str:
+        payload = json.dumps([self._dump(value) for value in values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode(self, cursor: str) -> list:
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            return [self._load(value) for value in values]
+        except (ValueError, TypeError, UnicodeDecodeError):
+            raise InvalidCursor("Invalid cursor")
+
+    @staticmethod
+    def _dump(value):
+        if isinstance(value, datetime):
+            return {'dt': value.isoformat()}
+        if isinstance(value, uuid.UUID):
+            return {'uuid': str(value)}
+        return value
+
+    @staticmethod
+    def _load(value):
+        if isinstance(value, dict):
+            if 'dt' in value:
+                return datetime.fromisoformat(value['dt'])
+            if 'uuid' in value:
+                return uuid.UUID(value['uuid'])
+            raise ValueError
+        return value
+
+
+def approximate_count(queryset, threshold=1000):
+    """
+    Row estimate of the planner instead of a COUNT(*) scan on PostgreSQL.
+
+    Returns (count, exact). Small results (estimate below threshold) and other
+    databases are counted exactly, where the estimate is least reliable anyway.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        try:
+            plan = json.loads(queryset.explain(format='json'))
+            if isinstance(plan, list):
+                plan = plan[0]
+            estimate = int(plan['Plan']['Plan Rows'])
+        except (ValueError, KeyError, IndexError, TypeError):
+            estimate = None
+        if estimate is not None and estimate >= threshold:
+            return estimate, False
+    return queryset.count(), True
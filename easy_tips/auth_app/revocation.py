@@ -0,0 +1,74 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import RevokedSession
+
+
+class RevocationList:
+    """
+    In-memory set of revoked session uuids backed by the RevokedSession table.
+
+    Every worker re-reads only the rows revoked since its last refresh, at most once
+    per SESSION_REVOCATION_REFRESH seconds, so checking a token costs no SQL in between.
+    """
+
+    # re-read a little of the past to catch rows committed after the previous refresh
+    OVERLAP = timedelta(seconds=5)
+
+    def __init__(self):
+        self._revoked = {}
+        self._lock = threading.Lock()
+        self._cursor = None
+        self._refreshed_at = None
+
+    def is_revoked(self, session_id: str) -> bool:
+        self.maybe_refresh()
+        return session_id in self._revoked
+
+    def revoke(self, sessions):
+        """sessions: iterable of (session uuid, expires_at)"""
+        rows = [
+            RevokedSession(session_uuid=session_uuid, expires_at=expires_at)
+            for session_uuid, expires_at in sessions
+        ]
+        if not rows:
+            return
+
+        RevokedSession.objects.bulk_create(rows, ignore_conflicts=True)
+        with self._lock:
+            for row in rows:
+                self._revoked[str(row.session_uuid)] = row.expires_at
+
+    def maybe_refresh(self):
+        interval = getattr(settings, 'SESSION_REVOCATION_REFRESH', 5)
+        now = time.monotonic()
+        if self._refreshed_at is not None and now - self._refreshed_at < interval:
+            return
+
+        with self._lock:
+            if self._refreshed_at is not None and now - self._refreshed_at < interval:
+                return
+            self._refreshed_at = now
+            self.refresh()
+
+    def refresh(self):
+        now = timezone.now()
+        rows = RevokedSession.objects.filter(expires_at__gt=now)
+        if self._cursor is not None:
+            rows = rows.filter(revoked_at__gte=self._cursor - self.OVERLAP)
+
+        for session_uuid, expires_at in rows.values_list('session_uuid', 'expires_at'):
+            self._revoked[str(session_uuid)] = expires_at
+
+        # tokens past their expiry are rejected anyway
+        self._revoked = {
+            session_id: expires_at for session_id, expires_at in self._revoked.items() if expires_at > now
+        }
+        self._cursor = now
+
+
+revocation_list = RevocationList()
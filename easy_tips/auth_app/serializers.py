@@ -1,11 +1,27 @@
 from rest_framework import serializers
+from .hashing import hash_password, password_pool
 from .models import UserData
 import re
 
 from .utils import generate_avatar_url, generate_random_name
 
 
-class UserDataSerializer(serializers.ModelSerializer):
+class UpdateFieldsMixin:
+    """
+    ModelSerializer.update that saves only the submitted columns. The instance is usually
+    request.user, a cached snapshot of the row: a full save would write back its stale
+    balance over credits booked since.
+    """
+
+    def update(self, instance, validated_data):
+        serializers.raise_errors_on_nested_writes('update', self, validated_data)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
+
+class UserDataSerializer(UpdateFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = UserData
         fields = [
@@ -65,6 +81,14 @@ class UserDataSerializer(serializers.ModelSerializer):
         return instance
 
 
+
+class OrganizationEmployeeSerializer(UserDataSerializer):
+    """An employee row of organization_employees; is_active comes from the queryset annotation"""
+    is_active = serializers.BooleanField(read_only=True)
+
+    class Meta(UserDataSerializer.Meta):
+        fields = UserDataSerializer.Meta.fields + ['is_active']
+
 class OrganizationUserDataSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserData
@@ -103,12 +127,13 @@ class OrganizationRegisterSerializer(serializers.ModelSerializer):
         validated_data.pop('password_confirm')
         password = validated_data.pop('password')
 
+        # hashed on the bounded pool (may raise HashingBusy) and stored with the INSERT
         organization = UserData.objects.create(
             **validated_data,
+            password=password_pool.run(hash_password, password),
             user_type='organization',
             is_profile_complete=False
         )
-        organization.set_password(password)
         return organization
 
 
@@ -117,7 +142,7 @@ class OrganizationLoginSerializer(serializers.Serializer):
     password = serializers.CharField()
 
 
-class OrganizationProfileSerializer(serializers.ModelSerializer):
+class OrganizationProfileSerializer(UpdateFieldsMixin, serializers.ModelSerializer):
     avatar_link = serializers.ReadOnlyField()
 
     class Meta:
@@ -159,10 +184,11 @@ class OrganizationProfileSerializer(serializers.ModelSerializer):
         return instance
 
 
-class AddEmployeeSerializer(serializers.Serializer):
+class EmployeeRowSerializer(serializers.Serializer):
+    """One employee row without DB checks, used as is by the bulk import"""
     phone_number = serializers.CharField()
-    name = serializers.CharField(required=False)
-    email = serializers.EmailField(required=False)
+    name = serializers.CharField(required=False, allow_blank=True, max_length=100)
+    email = serializers.EmailField(required=False, allow_blank=True)
 
     def validate_phone_number(self, value):
         pattern = r'^\+?\d{9,15}$'
@@ -170,6 +196,15 @@ class AddEmployeeSerializer(serializers.Serializer):
             raise serializers.ValidationError(
                 "Please enter a valid phone number (9 to 15 digits, including '+')."
             )
+        return value
+
+
+class AddEmployeeSerializer(EmployeeRowSerializer):
+    name = serializers.CharField(required=False)
+    email = serializers.EmailField(required=False)
+
+    def validate_phone_number(self, value):
+        value = super().validate_phone_number(value)
 
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
@@ -4,8 +4,15 @@ import hashlib
 from django.conf import settings
 from django.core.cache import cache
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
+from .hashing import password_pool, verify_password
+from .messaging import MessageQueue
 from .models import UserData, Session
+from .revocation import revocation_list
+from .session_cache import SessionCache
+from .session_refresh import SessionRefresher
+from .signals import employees_added
+from .tokens import GuestToken, SessionToken
 
 
 class AuthService:
@@ -23,8 +30,8 @@ class AuthService:
         code = AuthService.generate_verification_code()
         code_hash = AuthService._hash_code(code)
         cache.set(f"verification_code_{phone_number}", code_hash, 300)
-        # You can integrate the SMS service here
-        print(f"Код для {phone_number}: {code}")
+        # Delivered by the message worker, a code that is not sent in time is dropped
+        MessageQueue.enqueue('verification_code', phone_number, f"Код: {code}", expires_in=300)
         return True
 
     @staticmethod
@@ -88,6 +95,36 @@ class AuthService:
         session = AuthService.create_session(guest_user, session_type='guest', days=7)
         return guest_user, session
 
+    @staticmethod
+    def create_lazy_guest(days: int = 7) -> tuple[UserData, str, datetime]:
+        """
+        A guest identity without any DB writes: an unsaved UserData and a signed GuestToken.
+        The row is only created by persist_guest() once the guest does something that needs it.
+        """
+        guest_user = UserData(user_type='guest', is_profile_complete=False)
+        expires_at = timezone.now() + timedelta(days=days)
+        return guest_user, GuestToken.issue(guest_user.uuid, expires_at), expires_at
+
+    @staticmethod
+    def is_lazy_guest(user_data) -> bool:
+        return isinstance(user_data, UserData) and user_data.user_type == 'guest' and user_data._state.adding
+
+    @staticmethod
+    def persist_guest(user_data: UserData) -> tuple[UserData, Session | None]:
+        """
+        Makes a lazy guest real: creates the UserData row and a guest session,
+        whose cookie the caller must set. Other users are returned unchanged.
+        """
+        if not AuthService.is_lazy_guest(user_data):
+            return user_data, None
+
+        guest_user, _ = UserData.objects.get_or_create(
+            uuid=user_data.uuid,
+            defaults={'user_type': 'guest', 'is_profile_complete': False}
+        )
+        session = AuthService.create_session(guest_user, session_type='guest', days=7)
+        return guest_user, session
+
     @staticmethod
     def create_employee_session(user_data: UserData) -> Session:
         return AuthService.create_session(user_data, session_type='employee', days=30)
@@ -99,19 +136,88 @@ class AuthService:
     def create_organization_session(user_data: UserData, days: int = 30) -> Session:
         return AuthService.create_session(user_data, session_type='organization', days=days)
 
+    @staticmethod
+    def deactivate_other_sessions(user_data: UserData, current_session: Session) -> int:
+        """Deactivates every other active session of the user and drops them from the session cache"""
+        sessions = Session.objects.filter(
+            user_data=user_data,
+            is_active=True
+        ).exclude(uuid=current_session.uuid)
+
+        stale = list(sessions.values_list('uuid', 'expires_at'))
+        if not stale:
+            return 0
+
+        stale_ids = [session_uuid for session_uuid, _ in stale]
+        updated = Session.objects.filter(uuid__in=stale_ids).update(is_active=False, deactivated_at=timezone.now())
+        SessionCache.invalidate_many(stale_ids)
+        revocation_list.revoke([
+            (session_uuid, AuthService.revocation_expiry(session_uuid, expires_at))
+            for session_uuid, expires_at in stale
+        ])
+        return updated
+
+    @staticmethod
+    def revocation_expiry(session_id, expires_at, token_expires_at=None):
+        """
+        The latest expiry a signed token of the session can carry, which is how long it must stay revoked.
+        In deferred refresh mode a reissued token runs ahead of the row's expires_at until the
+        buffered bump is flushed, by up to SESSION_COOKIE_AGE.
+        """
+        latest = max(
+            SessionRefresher.effective_expiry(str(session_id), expires_at),
+            expires_at + timedelta(seconds=settings.SESSION_COOKIE_AGE)
+        )
+        if token_expires_at is not None and token_expires_at > latest:
+            latest = token_expires_at
+        return latest
+
+    @staticmethod
+    def end_lazy_guest(guest_uuid: str, expires_at):
+        revocation_list.revoke([(guest_uuid, expires_at)])
+
+    @staticmethod
+    def end_session(session_id: str, token_expires_at=None) -> bool:
+        """
+        Logs a session out: deactivates the row and revokes any signed token issued for it.
+        token_expires_at is the expiry of the token the request came with, if any.
+        """
+        try:
+            session = Session.objects.get(uuid=session_id, is_active=True)
+        except Session.DoesNotExist:
+            return False
+
+        session.is_active = False
+        session.deactivated_at = timezone.now()
+        session.save(update_fields=["is_active", "deactivated_at"])
+        revocation_list.revoke([
+            (session.uuid, AuthService.revocation_expiry(session.uuid, session.expires_at, token_expires_at))
+        ])
+        return True
+
 class OrganizationService:
     @staticmethod
     def authenticate_organization(login: str, password: str) -> UserData:
+        """
+        Hashing runs on the bounded password pool and may raise HashingBusy.
+        Hashes made with outdated hasher settings are upgraded on a successful login.
+        """
         try:
             organization = UserData.objects.get(
                 login=login,
                 user_type='organization'
             )
-            if organization.check_password(password):
-                return organization
         except UserData.DoesNotExist:
-            pass
-        return None
+            return None
+
+        is_correct, upgraded = password_pool.run(verify_password, password, organization.password)
+        if not is_correct:
+            return None
+
+        if upgraded:
+            organization.password = upgraded
+            organization.save(update_fields=["password"])
+        return organization
 
     @staticmethod
     def create_employee(organization: UserData, phone_number: str, name: str = None, email: str = None) -> UserData:
@@ -129,27 +235,50 @@ class OrganizationService:
 
         if not created:
             employee.organization = organization
+            update_fields = ['organization']
             if name:
                 employee.name = name
+                update_fields.append('name')
             if email:
                 employee.email = email
-            employee.save()
+                update_fields.append('email')
+            # only the edited columns: the balance may have changed since the row was read
+            employee.save(update_fields=update_fields)
 
         # We send an SMS with an invitation
-        OrganizationService._send_employee_invitation(employee, organization)
+        OrganizationService.queue_employee_invitations([employee], organization)
+        employees_added.send(sender=organization, employees=[employee])
 
         return employee
 
     @staticmethod
-    def _send_employee_invitation(employee: UserData, organization: UserData):
-        """Sends an SMS with an invitation to an employee"""
-        # Integrate with your SMS service
-        message = f"You have been added to the organization {organization.name}. Use your phone number to log in."
-        print(f"SMS для {employee.phone_number}: {message}")
+    def queue_employee_invitations(employees, organization: UserData):
+        """Queues the invitation SMS for the employees instead of sending them inline"""
+        message = OrganizationService._employee_invitation_text(organization)
+        MessageQueue.enqueue_many(
+            'employee_invitation',
+            [(employee.phone_number, message) for employee in employees]
+        )
+
+    @staticmethod
+    def _employee_invitation_text(organization: UserData) -> str:
+        return f"You have been added to the organization {organization.name}. Use your phone number to log in."
 
 
-def set_session_cookie(response, session_id):
+def set_session_cookie(response, session: Session):
     """A generic function for setting the session_id cookie"""
+    return set_cookie_value(
+        response,
+        SessionToken.cookie_value(session.uuid, session.user_data_id, session.session_type, session.expires_at)
+    )
+
+
+def set_guest_cookie(response, guest_token: str):
+    """Sets the session_id cookie to a lazy guest token"""
+    return set_cookie_value(response, guest_token)
+
+
+def set_cookie_value(response, session_id: str):
     response.delete_cookie(
         'session_id',
         path='/',
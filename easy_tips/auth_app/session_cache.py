@@ -0,0 +1,124 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .models import Session, UserData
+
+SESSION_KEY = "session_resolve:{}"
+USER_KEY = "session_user:{}"
+
+
+def _cache():
+    return caches[getattr(settings, 'SESSION_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'SESSION_CACHE_TIMEOUT', 300)
+
+
+def normalize_session_id(session_id):
+    """Returns the canonical string form of a session uuid or None if it is malformed"""
+    try:
+        return str(uuid.UUID(str(session_id)))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class SessionCache:
+    """
+    Cache for resolving the session cookie into (session, user) without hitting the DB.
+
+    Two kinds of entries are kept:
+      session_resolve:<session uuid> -> {'user_uuid', 'session_type', 'expires_at', 'user'}
+      session_user:<user uuid>       -> compact snapshot of the UserData row, for signed tokens
+    The session entry carries its own copy of the user snapshot, so a hit is a single cache
+    read; a profile update therefore invalidates the entries of every active session of the user.
+
+    A read costs a query on the DatabaseCache, as much as the Session lookup it replaces;
+    the DB saving only exists with a shared tier outside the database (REDIS_URL).
+    """
+
+    @staticmethod
+    def snapshot_user(user_data: UserData) -> dict:
+        return {field.attname: getattr(user_data, field.attname) for field in UserData._meta.concrete_fields}
+
+    @staticmethod
+    def restore_user(snapshot: dict) -> UserData:
+        field_names = [field.attname for field in UserData._meta.concrete_fields]
+        return UserData.from_db('default', field_names, [snapshot.get(name) for name in field_names])
+
+    @staticmethod
+    def get(session_id: str):
+        """Returns (user_data, session_type, expires_at) or None on a miss"""
+        cache = _cache()
+        entry = cache.get(SESSION_KEY.format(session_id))
+        if entry is None:
+            return None
+
+        if entry['expires_at'] <= timezone.now():
+            cache.delete(SESSION_KEY.format(session_id))
+            return None
+
+        return SessionCache.restore_user(entry['user']), entry['session_type'], entry['expires_at']
+
+    @staticmethod
+    def get_user(user_uuid):
+        snapshot = _cache().get(USER_KEY.format(user_uuid))
+        if snapshot is None:
+            return None
+        return SessionCache.restore_user(snapshot)
+
+    @staticmethod
+    def store(session_id: str, user_data: UserData, session_type: str, expires_at):
+        """Stores the session entry with the user snapshot; it never outlives the session itself"""
+        remaining = int((expires_at - timezone.now()).total_seconds())
+        if remaining <= 0:
+            _cache().delete(SESSION_KEY.format(session_id))
+            return
+
+        _cache().set(
+            SESSION_KEY.format(session_id),
+            {
+                'user_uuid': str(user_data.uuid),
+                'session_type': session_type,
+                'expires_at': expires_at,
+                'user': SessionCache.snapshot_user(user_data),
+            },
+            min(_timeout(), remaining)
+        )
+
+    @staticmethod
+    def store_user(user_data: UserData):
+        _cache().set(USER_KEY.format(user_data.uuid), SessionCache.snapshot_user(user_data), _timeout())
+
+    @staticmethod
+    def invalidate(session_id):
+        SessionCache.invalidate_many([session_id])
+
+    @staticmethod
+    def invalidate_many(session_ids):
+        keys = [SESSION_KEY.format(session_id) for session_id in session_ids]
+        if keys:
+            _cache().delete_many(keys)
+
+    @staticmethod
+    def invalidate_user(user_uuid):
+        SessionCache.invalidate_users([user_uuid])
+
+    @staticmethod
+    def invalidate_users(user_uuids):
+        """Drops the user snapshots and the entries of the active sessions that embed them"""
+        user_uuids = list(user_uuids)
+        if not user_uuids:
+            return
+
+        session_ids = Session.objects.filter(
+            user_data__in=user_uuids,
+            is_active=True
+        ).values_list('uuid', flat=True)
+        _cache().delete_many(
+            [USER_KEY.format(user_uuid) for user_uuid in user_uuids]
+            + [SESSION_KEY.format(session_id) for session_id in session_ids]
+        )
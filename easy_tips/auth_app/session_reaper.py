@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import RevokedSession, Session
+
+logger = logging.getLogger(__name__)
+
+
+class SessionReaper:
+    """
+    Deletes sessions that expired, or were deactivated, more than SESSION_RETENTION_DAYS ago,
+    in bounded batches.
+
+    Rows are walked by primary key (keyset iteration) and every batch is its own
+    short DELETE, so no statement holds locks on a large part of the table.
+    """
+
+    @staticmethod
+    def retention_days() -> int:
+        return getattr(settings, 'SESSION_RETENTION_DAYS', 7)
+
+    @staticmethod
+    def stale_sessions(cutoff):
+        return Session.objects.filter(
+            Q(expires_at__lt=cutoff) | Q(is_active=False, deactivated_at__lt=cutoff)
+        )
+
+    @staticmethod
+    def report(retention_days: int = None) -> dict:
+        """Dry run: what purge() would delete"""
+        if retention_days is None:
+            retention_days = SessionReaper.retention_days()
+        now = timezone.now()
+        cutoff = now - timedelta(days=retention_days)
+
+        return {
+            'cutoff': cutoff,
+            'expired_sessions': Session.objects.filter(expires_at__lt=cutoff).count(),
+            'inactive_sessions': Session.objects.filter(
+                is_active=False, deactivated_at__lt=cutoff, expires_at__gte=cutoff
+            ).count(),
+            'revoked_entries': RevokedSession.objects.filter(expires_at__lt=now).count(),
+        }
+
+    @staticmethod
+    def purge(retention_days: int = None, batch_size: int = None, pause: float = 0) -> dict:
+        if retention_days is None:
+            retention_days = SessionReaper.retention_days()
+        if batch_size is None:
+            batch_size = getattr(settings, 'SESSION_REAPER_BATCH_SIZE', 1000)
+
+        started = time.monotonic()
+        now = timezone.now()
+        cutoff = now - timedelta(days=retention_days)
+
+        sessions_deleted, session_batches = SessionReaper._delete_in_batches(
+            SessionReaper.stale_sessions(cutoff), 'uuid', batch_size, pause
+        )
+        # revocations only matter until the token itself expires
+        revoked_deleted, revoked_batches = SessionReaper._delete_in_batches(
+            RevokedSession.objects.filter(expires_at__lt=now), 'session_uuid', batch_size, pause
+        )
+
+        elapsed = time.monotonic() - started
+        stats = {
+            'sessions_deleted': sessions_deleted,
+            'revoked_deleted': revoked_deleted,
+            'batches': session_batches + revoked_batches,
+            'elapsed': elapsed,
+            'rows_per_second': (sessions_deleted + revoked_deleted) / elapsed if elapsed else 0.0,
+        }
+        logger.info(
+            "Session reaper: deleted %(sessions_deleted)s sessions and %(revoked_deleted)s revocations "
+            "in %(batches)s batches, %(elapsed).2fs (%(rows_per_second).0f rows/s)",
+            stats
+        )
+        return stats
+
+    @staticmethod
+    def _delete_in_batches(queryset, key: str, batch_size: int, pause: float):
+        deleted = 0
+        batches = 0
+        last_key = None
+
+        while True:
+            page = queryset.order_by(key)
+            if last_key is not None:
+                page = page.filter(**{f'{key}__gt': last_key})
+            keys = list(page.values_list(key, flat=True)[:batch_size])
+            if not keys:
+                break
+
+            count, _ = queryset.model.objects.filter(**{f'{key}__in': keys}).delete()
+            deleted += count
+            batches += 1
+            last_key = keys[-1]
+
+            if len(keys) < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+
+        return deleted, batches
+
+
+_reaper_thread = None
+_reaper_lock = threading.Lock()
+
+
+def start_periodic_reaper():
+    """
+    Starts the in-process reaper thread if SESSION_REAPER_INTERVAL is set.
+    Workers coordinate through a cache lock, so one of them purges per interval.
+    """
+    global _reaper_thread
+
+    interval = getattr(settings, 'SESSION_REAPER_INTERVAL', None)
+    if not interval:
+        return
+
+    with _reaper_lock:
+        if _reaper_thread is not None:
+            return
+        _reaper_thread = threading.Thread(
+            target=_run_periodic_reaper, args=(interval,), name='session-reaper', daemon=True
+        )
+        _reaper_thread.start()
+
+
+def _run_periodic_reaper(interval):
+    while True:
+        time.sleep(interval)
+        if not cache.add('session_reaper_lock', 1, interval):
+            continue
+
+        close_old_connections()
+        try:
+            SessionReaper.purge()
+        except Exception:
+            logger.exception("Session reaper run failed")
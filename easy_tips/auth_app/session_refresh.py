@@ -0,0 +1,142 @@
+import atexit
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Case, DateTimeField, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Session
+from .session_cache import SessionCache
+
+logger = logging.getLogger(__name__)
+
+
+class SessionExpiryBuffer:
+    """
+    Write-behind buffer of pending session expiry bumps.
+
+    Bumps are kept in process and written by a background thread in one bulk
+    UPDATE per SESSION_REFRESH_FLUSH_INTERVAL; whatever is left is flushed when
+    the worker exits. The UPDATE never moves expires_at backwards.
+    """
+
+    CHUNK_SIZE = 500
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def schedule(self, session_id: str, expires_at):
+        with self._lock:
+            current = self._pending.get(session_id)
+            if current is None or expires_at > current:
+                self._pending[session_id] = expires_at
+        self._ensure_started()
+
+    def pending_expiry(self, session_id: str):
+        return self._pending.get(session_id)
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if not pending:
+            return 0
+
+        items = list(pending.items())
+        updated = 0
+        try:
+            for start in range(0, len(items), self.CHUNK_SIZE):
+                chunk = items[start:start + self.CHUNK_SIZE]
+                new_expiry = Case(
+                    *[When(uuid=session_id, then=Value(expires_at)) for session_id, expires_at in chunk],
+                    output_field=DateTimeField()
+                )
+                updated += Session.objects.filter(
+                    uuid__in=[session_id for session_id, _ in chunk],
+                    is_active=True
+                ).update(expires_at=Greatest(F('expires_at'), new_expiry))
+        except Exception:
+            logger.exception("Failed to flush %s session expiry bumps, will retry", len(pending))
+            with self._lock:
+                for session_id, expires_at in pending.items():
+                    current = self._pending.get(session_id)
+                    if current is None or expires_at > current:
+                        self._pending[session_id] = expires_at
+            return 0
+
+        logger.debug("Flushed %s session expiry bumps (%s rows updated)", len(pending), updated)
+        return updated
+
+    def stop(self):
+        self._stopped.set()
+        self.flush()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='session-expiry-flush', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def _run(self):
+        interval = getattr(settings, 'SESSION_REFRESH_FLUSH_INTERVAL', 30)
+        while not self._stopped.wait(interval):
+            close_old_connections()
+            self.flush()
+
+
+expiry_buffer = SessionExpiryBuffer()
+
+
+class SessionRefresher:
+    """Sliding expiration of sessions, driven by SESSION_REFRESH_THRESHOLD"""
+
+    @staticmethod
+    def effective_expiry(session_id: str, expires_at):
+        """The newest of the stored expiry and a bump still waiting in the write-behind buffer"""
+        pending = expiry_buffer.pending_expiry(session_id)
+        if pending is not None and pending > expires_at:
+            return pending
+        return expires_at
+
+    @staticmethod
+    def needs_refresh(context, now=None) -> bool:
+        threshold = getattr(settings, 'SESSION_REFRESH_THRESHOLD', None)
+        if threshold is None:
+            return True
+
+        now = now or timezone.now()
+        return context.expires_at - now < timedelta(seconds=threshold)
+
+    @staticmethod
+    def extend(context) -> bool:
+        """Extends the session by SESSION_COOKIE_AGE, returns False if it is no longer active"""
+        expires_at = context.expires_at + timedelta(seconds=settings.SESSION_COOKIE_AGE)
+
+        if getattr(settings, 'SESSION_REFRESH_MODE', 'sync') == 'deferred':
+            expiry_buffer.schedule(context.session_id, expires_at)
+        else:
+            updated = Session.objects.filter(
+                uuid=context.session_id,
+                is_active=True
+            ).update(expires_at=expires_at)
+            if not updated:
+                SessionCache.invalidate(context.session_id)
+                return False
+
+        context.expires_at = expires_at
+        # dropped rather than rewritten: request.user may hold fields the view has just changed
+        # in the row, the next request stores a fresh snapshot along with the new expiry
+        SessionCache.invalidate(context.session_id)
+        return True
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .models import Session, UserData
+from .session_cache import SessionCache
+
+# sent with sender=<organization UserData> and employees=[UserData, ...] once employees joined it
+employees_added = Signal()
+
+
+@receiver(post_save, sender=UserData)
+@receiver(post_delete, sender=UserData)
+def invalidate_user_snapshot(sender, instance, **kwargs):
+    """Any write to the UserData row makes the cached snapshot stale"""
+    SessionCache.invalidate_user(instance.uuid)
+
+
+# No post_delete receiver: only expired or deactivated sessions are deleted (SessionReaper),
+# and those are already out of the cache. Without receivers Django deletes them in one query.
+@receiver(post_save, sender=Session)
+def invalidate_session_entry(sender, instance, created=False, **kwargs):
+    if not created:
+        SessionCache.invalidate(instance.uuid)
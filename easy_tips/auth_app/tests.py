@@ -1,3 +1,223 @@
-from django.test import TestCase
+import random
+from datetime import timedelta
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import Session, UserData
+from .services import AuthService
+from .session_reaper import SessionReaper
+
+
+@override_settings(AUTH_RATE_LIMITS={'send_code_phone': '3/10m', 'send_code_ip': '2/h', 'send_code_global': '5/m'})
+class SendCodeThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def send_code(self, ip, phone_number):
+        return self.client.post(
+            '/api/auth/send-code/', {'phone_number': phone_number}, content_type='application/json', REMOTE_ADDR=ip
+        )
+
+    def test_rejected_requests_do_not_use_up_other_limits(self):
+        statuses = [self.send_code('192.0.2.1', f'+7900000{i:04d}').status_code for i in range(20)]
+        self.assertEqual(statuses.count(429), 18)
+
+        # the eighteen requests the IP limit rejected left no hits in the global limit
+        for i in range(3):
+            self.assertNotEqual(self.send_code(f'198.51.100.{i}', f'+7911000{i:04d}').status_code, 429)
+        self.assertEqual(self.send_code('198.51.100.9', '+79110009999').status_code, 429)
+
+
+class SessionReaperTests(TestCase):
+    def test_inactive_sessions_are_kept_from_their_deactivation(self):
+        employee = UserData.objects.create(user_type='employee', name='reaper')
+        now = timezone.now()
+        old = now - timedelta(days=SessionReaper.retention_days() + 1)
+        just_logged_out, _, active = Session.objects.bulk_create([
+            Session(user_data=employee, expires_at=now + timedelta(days=1), is_active=False, deactivated_at=now),
+            Session(user_data=employee, expires_at=now + timedelta(days=1), is_active=False, deactivated_at=old),
+            Session(user_data=employee, expires_at=now + timedelta(days=1)),
+        ])
+        Session.objects.update(created_at=old)
+
+        self.assertEqual(SessionReaper.report()['inactive_sessions'], 1)
+        self.assertEqual(SessionReaper.purge()['sessions_deleted'], 1)
+        self.assertEqual(set(Session.objects.values_list('uuid', flat=True)), {just_logged_out.uuid, active.uuid})
+
+    def test_logout_records_the_deactivation(self):
+        employee = UserData.objects.create(user_type='employee', name='reaper')
+        session = AuthService.create_employee_session(employee)
+
+        AuthService.end_session(session.uuid)
+
+        session.refresh_from_db()
+        self.assertFalse(session.is_active)
+        self.assertIsNotNone(session.deactivated_at)
+
+
+# a shared cache tier outside the database, so that only the view's own queries are counted
+@override_settings(CACHES={**settings.CACHES, 'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class OrganizationEmployeesQueryTests(TestCase):
+    """organization/employees/ runs the same queries whatever the size of the organization, and lists it right"""
+    # the page with is_active as an Exists subquery, and the count
+    QUERIES_PER_PAGE = 2
+
+    def seed(self, size):
+        """Returns {employee uuid: expected is_active}; every other employee has a live session"""
+        organization = UserData.objects.create(user_type='organization', login=f'queries-{size}')
+        employees = UserData.objects.bulk_create([
+            UserData(
+                phone_number=f"+7998{size:03d}{index:05d}",
+                name=f"Employee {index}",
+                user_type='employee',
+                organization=organization
+            )
+            for index in range(size)
+        ])
+        now = timezone.now()
+        sessions = []
+        for index, employee in enumerate(employees):
+            if index % 2 == 0:
+                sessions.append(Session(user_data=employee, expires_at=now + timedelta(days=1)))
+            elif index % 4 == 1:
+                # expired without being deactivated
+                sessions.append(Session(user_data=employee, expires_at=now - timedelta(minutes=1)))
+            else:
+                sessions.append(Session(user_data=employee, expires_at=now + timedelta(days=1), is_active=False))
+        Session.objects.bulk_create(sessions)
+        # an employee of another organization is never listed
+        UserData.objects.create(user_type='employee', name='Employee 1 elsewhere',
+                                organization=UserData.objects.create(user_type='organization'))
+
+        self.client.cookies['session_id'] = str(AuthService.create_organization_session(organization).uuid)
+        # warm the session cache, authentication is not what is measured
+        self.client.get('/api/auth/organization/employees/', {'page_size': 1})
+        return {str(employee.uuid): index % 2 == 0 for index, employee in enumerate(employees)}, employees
+
+    def page(self, params):
+        with self.assertNumQueries(self.QUERIES_PER_PAGE):
+            response = self.client.get('/api/auth/organization/employees/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def walk(self, params, page_size):
+        """Every row of every page, following next_cursor"""
+        rows, cursor = [], None
+        while True:
+            data = self.page({**params, 'page_size': page_size, **({'cursor': cursor} if cursor else {})})
+            self.assertLessEqual(len(data['employees']), page_size)
+            rows += data['employees']
+            cursor = data['next_cursor']
+            if cursor is None:
+                return rows, data['count']
+
+    def test_query_count_does_not_depend_on_employee_count(self):
+        for size in (10, 100, 1000):
+            with self.subTest(size=size):
+                expected, employees = self.seed(size)
+                active = {uuid for uuid, is_active in expected.items() if is_active}
+                named = {str(employee.uuid) for employee in employees if employee.name.startswith('Employee 1')}
+
+                for params, uuids in (
+                    ({}, set(expected)),
+                    ({'active': 'true'}, active),
+                    ({'active': 'false'}, set(expected) - active),
+                    ({'name': 'employee 1'}, named),
+                ):
+                    with self.subTest(params=params):
+                        data = self.page(params)
+                        self.assertEqual(data['count'], len(uuids))
+                        for row in data['employees']:
+                            self.assertIn(row['uuid'], uuids)
+                            self.assertIs(row['is_active'], expected[row['uuid']])
+
+                        # a complete walk: every employee once, in (created_at, uuid) order
+                        rows, count = self.walk(params, page_size=37)
+                        self.assertEqual(count, len(uuids))
+                        self.assertEqual(len(rows), len(uuids))
+                        self.assertEqual({row['uuid'] for row in rows}, uuids)
+                        self.assertEqual([row['uuid'] for row in rows], [
+                            str(employee.uuid) for employee in
+                            sorted(employees, key=lambda employee: (employee.created_at, str(employee.uuid)))
+                            if str(employee.uuid) in uuids
+                        ])
+
+
+# EXPLAIN checks need the PostgreSQL planner and are skipped on any other database; run them against
+# the docker-compose Postgres: docker compose run --rm web python manage.py test auth_app.tests user_profile.tests
+@skipUnless(connection.vendor == 'postgresql', "Index checks need the PostgreSQL planner")
+class SessionIndexTests(TestCase):
+    """EXPLAINs the Session queries the services and views actually run, on a seeded table"""
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.organization = UserData.objects.create(user_type='organization', name='organization')
+        employees = UserData.objects.bulk_create([
+            UserData(user_type='employee', name=f'employee {i}', organization=cls.organization) for i in range(200)
+        ])
+        cls.employee = employees[0]
+
+        sessions = []
+        for i in range(50000):
+            expired = i % 10 == 0
+            sessions.append(Session(
+                user_data=random.choice(employees),
+                expires_at=now - timedelta(days=60) if expired else now + timedelta(days=random.randint(1, 30)),
+                is_active=not expired and i % 3 != 0
+            ))
+        Session.objects.bulk_create(sessions, batch_size=5000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE auth_app_session')
+
+        cls.current = Session.objects.create(
+            user_data=cls.employee, session_type='employee', expires_at=now + timedelta(days=1)
+        )
+        cls.organization_session = Session.objects.create(
+            user_data=cls.organization, session_type='organization', expires_at=now + timedelta(days=1)
+        )
+
+    def assertUsesIndex(self, run, index_name, only=''):
+        """
+        Every Session query run() makes is planned with index_name; lookups by primary key
+        are left out, and so are the queries that do not contain `only`.
+        """
+        with CaptureQueriesContext(connection) as context:
+            run()
+
+        plans = []
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'auth_app_session' not in sql or only not in sql:
+                    continue
+                cursor.execute('EXPLAIN ' + sql)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+                if 'auth_app_session_pkey' not in plan:
+                    plans.append(plan)
+
+        self.assertTrue(plans, "No Session query was run")
+        for plan in plans:
+            self.assertIn(index_name, plan)
+
+    def test_deactivate_other_sessions(self):
+        self.assertUsesIndex(
+            lambda: AuthService.deactivate_other_sessions(self.employee, self.current), 'session_active_user_idx'
+        )
+
+    def test_organization_employees_activity(self):
+        self.client.cookies['session_id'] = str(self.organization_session.uuid)
+        self.assertUsesIndex(
+            lambda: self.client.get('/api/auth/organization/employees/', {'active': 'true'}),
+            'session_active_user_idx'
+        )
+
+    def test_reaper_report(self):
+        # the expired sessions count, the one query of the report that filters on expires_at alone
+        self.assertUsesIndex(SessionReaper.report, 'session_expires_idx', only='"auth_app_session"."expires_at" <')
@@ -0,0 +1,210 @@
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+RATE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+RATE_REGEX = re.compile(r'^(\d+)/(\d*)([smhd])$')
+
+
+def parse_rate(rate: str) -> tuple[int, int]:
+    """'5/10m' -> (5, 600)"""
+    match = RATE_REGEX.match(rate)
+    if not match:
+        raise ValueError(f"Invalid rate: {rate}")
+    limit, multiplier, unit = match.groups()
+    return int(limit), int(multiplier or 1) * RATE_UNITS[unit]
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding-window counter backed by the cache.
+
+    Keeps one counter per fixed window and estimates the sliding window as
+    current + previous * (part of the previous window still inside it).
+    A check is one get_many; only accepted hits write (add/incr), rejections write nothing.
+    check() and record() are separate so that CompositeThrottle can check several
+    limiters before recording a hit in any of them.
+    """
+
+    def __init__(self, key: str, limit: int, window: int):
+        self.key = key
+        self.limit = limit
+        self.window = window
+
+    def keys(self, now: float) -> list[str]:
+        """Counters of the previous and the current window"""
+        index = int(now // self.window)
+        return [f"ratelimit:{self.key}:{index - 1}", f"ratelimit:{self.key}:{index}"]
+
+    def check(self, counts: dict, now: float) -> tuple[bool, float]:
+        """(allowed, seconds to wait) from the counters read with get_many(keys(now)); writes nothing"""
+        previous_key, current_key = self.keys(now)
+        previous = counts.get(previous_key, 0)
+        current = counts.get(current_key, 0)
+        elapsed = (now % self.window) / self.window
+
+        if previous * (1 - elapsed) + current >= self.limit:
+            return False, self._wait(previous, current, elapsed)
+        return True, 0.0
+
+    def record(self, now: float):
+        """Counts an accepted hit in the current window"""
+        current_key = self.keys(now)[1]
+        if not cache.add(current_key, 1, timeout=self.window * 2):
+            try:
+                cache.incr(current_key)
+            except ValueError:
+                cache.set(current_key, 1, timeout=self.window * 2)
+
+    def hit(self, now: float = None) -> tuple[bool, float]:
+        """Returns (allowed, seconds to wait)"""
+        now = time.time() if now is None else now
+        allowed, wait = self.check(cache.get_many(self.keys(now)), now)
+        if allowed:
+            self.record(now)
+        return allowed, wait
+
+    def _wait(self, previous, current, elapsed) -> float:
+        if current >= self.limit or not previous:
+            return (1 - elapsed) * self.window
+        # the previous window's weight has to drop below what is left of the limit
+        needed = 1 - (self.limit - current) / previous
+        return max(needed - elapsed, 0) * self.window
+
+
+class SlidingWindowThrottle(BaseThrottle):
+    """
+    DRF throttle over SlidingWindowLimiter. The rate comes from AUTH_RATE_LIMITS[scope];
+    subclasses say what is limited by implementing get_limit_key().
+    """
+    scope = None
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def get_limit_key(self, request) -> str | None:
+        raise NotImplementedError
+
+    def get_limiter(self, request) -> SlidingWindowLimiter | None:
+        """The limiter this request counts against, None when the throttle does not apply"""
+        rate = getattr(settings, 'AUTH_RATE_LIMITS', {}).get(self.scope)
+        if not rate:
+            return None
+
+        key = self.get_limit_key(request)
+        if key is None:
+            return None
+
+        limit, window = parse_rate(rate)
+        return SlidingWindowLimiter(f"{self.scope}:{key}", limit, window)
+
+    def allow_request(self, request, view):
+        limiter = self.get_limiter(request)
+        if limiter is None:
+            return True
+
+        allowed, self.wait_seconds = limiter.hit()
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class CompositeThrottle(BaseThrottle):
+    """
+    Several SlidingWindowThrottles as one throttle of a view.
+
+    DRF asks every throttle of a view, so separate throttles would each record a
+    hit even when another one rejects the request: the requests of one abusive IP
+    that its own limit rejects would still use up the global limit. Here all the
+    limits are checked first (one get_many) and hits are recorded only when every
+    one of them allows the request.
+    """
+    throttles = ()
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def allow_request(self, request, view):
+        now = time.time()
+        limiters = [
+            limiter for limiter in (throttle().get_limiter(request) for throttle in self.throttles)
+            if limiter is not None
+        ]
+        if not limiters:
+            return True
+
+        counts = cache.get_many([key for limiter in limiters for key in limiter.keys(now)])
+        waits = [wait for allowed, wait in (limiter.check(counts, now) for limiter in limiters) if not allowed]
+        if waits:
+            self.wait_seconds = max(waits)
+            return False
+
+        for limiter in limiters:
+            limiter.record(now)
+        self.wait_seconds = 0.0
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class PhoneRateThrottle(SlidingWindowThrottle):
+    def get_limit_key(self, request):
+        phone_number = request.data.get('phone_number')
+        if not isinstance(phone_number, str) or not phone_number.strip():
+            return None
+        return re.sub(r'[^\d+]', '', phone_number)
+
+
+class IPRateThrottle(SlidingWindowThrottle):
+    def get_limit_key(self, request):
+        return self.get_ident(request)
+
+
+class GlobalRateThrottle(SlidingWindowThrottle):
+    def get_limit_key(self, request):
+        return 'all'
+
+
+class SendCodePhoneThrottle(PhoneRateThrottle):
+    scope = 'send_code_phone'
+
+
+class SendCodeIPThrottle(IPRateThrottle):
+    scope = 'send_code_ip'
+
+
+class SendCodeGlobalThrottle(GlobalRateThrottle):
+    scope = 'send_code_global'
+
+
+class VerifyCodePhoneThrottle(PhoneRateThrottle):
+    scope = 'verify_code_phone'
+
+
+class VerifyCodeIPThrottle(IPRateThrottle):
+    scope = 'verify_code_ip'
+
+
+class GuestLoginIPThrottle(IPRateThrottle):
+    scope = 'guest_login_ip'
+
+
+class GuestLoginGlobalThrottle(GlobalRateThrottle):
+    scope = 'guest_login_global'
+
+
+class SendCodeThrottle(CompositeThrottle):
+    throttles = (SendCodePhoneThrottle, SendCodeIPThrottle, SendCodeGlobalThrottle)
+
+
+class VerifyCodeThrottle(CompositeThrottle):
+    throttles = (VerifyCodePhoneThrottle, VerifyCodeIPThrottle)
+
+
+class GuestLoginThrottle(CompositeThrottle):
+    throttles = (GuestLoginIPThrottle, GuestLoginGlobalThrottle)
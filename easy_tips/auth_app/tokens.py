@@ -0,0 +1,77 @@
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+
+
+class SessionToken:
+    """
+    HMAC-signed session tokens (django.core.signing, keyed by SECRET_KEY).
+
+    The token carries [session uuid, user uuid, session_type, expiry timestamp],
+    so that SessionAuthentication can verify it without reading the Session table.
+    """
+
+    SALT = 'auth_app.session'
+
+    @staticmethod
+    def enabled() -> bool:
+        return getattr(settings, 'SESSION_TOKEN_MODE', False)
+
+    @staticmethod
+    def issue(session_id, user_uuid, session_type: str, expires_at) -> str:
+        payload = [
+            uuid.UUID(str(session_id)).hex,
+            uuid.UUID(str(user_uuid)).hex,
+            session_type,
+            int(expires_at.timestamp()),
+        ]
+        return signing.dumps(payload, salt=SessionToken.SALT)
+
+    @staticmethod
+    def parse(token: str):
+        """Returns (session_id, user_uuid, session_type, expires_at) or None if the token is invalid"""
+        try:
+            session_hex, user_hex, session_type, expires_ts = signing.loads(token, salt=SessionToken.SALT)
+            return (
+                str(uuid.UUID(session_hex)),
+                str(uuid.UUID(user_hex)),
+                session_type,
+                datetime.fromtimestamp(expires_ts, tz=dt_timezone.utc),
+            )
+        except (signing.BadSignature, TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def cookie_value(session_id, user_uuid, session_type: str, expires_at) -> str:
+        """The session_id cookie value: a signed token in token mode, the bare session uuid otherwise"""
+        if SessionToken.enabled():
+            return SessionToken.issue(session_id, user_uuid, session_type, expires_at)
+        return str(session_id)
+
+
+class GuestToken:
+    """
+    Signed, DB-free identity of a guest who has not done anything that needs a UserData row yet.
+    Carries [guest uuid, expiry timestamp].
+    """
+
+    SALT = 'auth_app.guest'
+
+    @staticmethod
+    def enabled() -> bool:
+        return getattr(settings, 'GUEST_LAZY_IDENTITY', False)
+
+    @staticmethod
+    def issue(guest_uuid, expires_at) -> str:
+        return signing.dumps([uuid.UUID(str(guest_uuid)).hex, int(expires_at.timestamp())], salt=GuestToken.SALT)
+
+    @staticmethod
+    def parse(token: str):
+        """Returns (guest_uuid, expires_at) or None if the token is invalid"""
+        try:
+            guest_hex, expires_ts = signing.loads(token, salt=GuestToken.SALT)
+            return str(uuid.UUID(guest_hex)), datetime.fromtimestamp(expires_ts, tz=dt_timezone.utc)
+        except (signing.BadSignature, TypeError, ValueError):
+            return None
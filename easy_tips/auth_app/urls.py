@@ -19,5 +19,6 @@ urlpatterns = [
     path('organization/profile/', views.organization_profile, name='organization_profile'),
     path("organization/profile-update/", views.organization_update_profile, name="organization-update-profile"),
     path('organization/add-employee/', views.add_employee, name='add_employee'),
+    path('organization/employees/import/', views.import_employees, name='import_employees'),
     path('organization/employees/', views.organization_employees, name='organization_employees'),
 ]
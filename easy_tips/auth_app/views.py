@@ -1,22 +1,33 @@
+from django.db import IntegrityError
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, parser_classes, permission_classes, throttle_classes
+from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from django.core.cache import cache
-from .services import AuthService, OrganizationService, set_session_cookie
+from .employee_import import CSVTextParser, EmployeeImporter, EmployeeImportError, rows_from_request
+from .hashing import HashingBusy
+from .pagination import InvalidCursor, KeysetPaginator
+from .services import AuthService, OrganizationService, set_guest_cookie, set_session_cookie
 from .models import Session, UserData
 from .serializers import UserDataSerializer, AddEmployeeSerializer, OrganizationProfileSerializer, \
-    OrganizationLoginSerializer, OrganizationRegisterSerializer, OrganizationUserDataSerializer
+    OrganizationLoginSerializer, OrganizationRegisterSerializer, OrganizationUserDataSerializer, \
+    OrganizationEmployeeSerializer
 from .permissions import IsAuthenticatedUserData
+from .tokens import GuestToken
+from .throttling import SendCodeThrottle, VerifyCodeThrottle, GuestLoginThrottle
 import re
 
 from .utils import generate_avatar_url
 
 PHONE_REGEX = re.compile(r'^\+?\d{10,15}$')
 
+EMPLOYEES_PAGINATOR = KeysetPaginator(ordering=('created_at', 'uuid'))
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([SendCodeThrottle])
 def send_code(request):
     phone_number = request.data.get('phone_number')
 
@@ -33,8 +44,6 @@ def send_code(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    cache.delete(f"verification_attempts_{phone_number}")
-
     # Send the code
     AuthService.send_verification_code(phone_number)
 
@@ -43,6 +52,7 @@ def send_code(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([VerifyCodeThrottle])
 def verify_code(request):
     phone_number = request.data.get('phone_number')
     code = request.data.get('code')
@@ -67,10 +77,7 @@ def verify_code(request):
     session = AuthService.create_session(user_data)
 
     # Deactivate previous sessions
-    Session.objects.filter(
-        user_data=user_data,
-        is_active=True
-    ).exclude(uuid=session.uuid).update(is_active=False)
+    AuthService.deactivate_other_sessions(user_data, session)
 
     user_serializer = UserDataSerializer(user_data)
 
@@ -82,7 +89,7 @@ def verify_code(request):
     }
 
     response = Response(response_data)
-    response = set_session_cookie(response, str(session.uuid))
+    response = set_session_cookie(response, session)
     print(f"🍪 EMPLOYEE LOGIN - Setting new cookie: {session.uuid}")
     return response
 
@@ -102,13 +109,18 @@ def complete_profile(request):
 
     serializer = UserDataSerializer(user_data, data=request.data, partial=True)
     if serializer.is_valid():
+        user_data, guest_session = AuthService.persist_guest(user_data)
+        serializer.instance = user_data
         serializer.save()
-        return Response({
+        response = Response({
             'success': True,
             'profile_complete': user_data.is_profile_complete,
             'user_data': serializer.data,
             'message': 'Profile updated successfully'
         })
+        if guest_session:
+            set_session_cookie(response, guest_session)
+        return response
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -131,15 +143,12 @@ def profile_status(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticatedUserData])
 def logout(request):
-    session_id = request.COOKIES.get('session_id')
-
-    if session_id:
-        try:
-            session = Session.objects.get(uuid=session_id, is_active=True)
-            session.is_active = False
-            session.save(update_fields=["is_active"])
-        except Session.DoesNotExist:
-            pass
+    # request.auth is the SessionContext, the cookie may hold a signed token rather than the uuid
+    if request.auth is not None:
+        if request.auth.lazy_guest:
+            AuthService.end_lazy_guest(request.auth.session_id, request.auth.expires_at)
+        else:
+            AuthService.end_session(request.auth.session_id, request.auth.expires_at)
 
     response = Response({'message': 'Logged out successfully'})
     response.delete_cookie('session_id')
@@ -147,10 +156,25 @@ def logout(request):
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes([GuestLoginThrottle])
 def guest_login(request):
     """
     Creates a guest session without registration
     """
+    if GuestToken.enabled():
+        # Nothing is written until the guest needs a row (AuthService.persist_guest)
+        user, guest_token, expires_at = AuthService.create_lazy_guest()
+
+        response = Response({
+            'session_id': str(user.uuid),
+            'user_data': {
+                'uuid': str(user.uuid),
+                'user_type': user.user_type
+            },
+            'expires_at': expires_at
+        })
+        return set_guest_cookie(response, guest_token)
+
     user, session = AuthService.create_guest_session()
 
     response = Response({
@@ -162,7 +186,7 @@ def guest_login(request):
         'expires_at': session.expires_at
     })
 
-    response = set_session_cookie(response, str(session.uuid))
+    response = set_session_cookie(response, session)
     print(f"🍪 GUEST LOGIN - Setting new cookie: {session.uuid}")
 
     return response
@@ -178,13 +202,26 @@ def renew_auth(request):
     return Response(status=status.HTTP_200_OK)
 
 
+def login_busy_response():
+    """Too many password checks are queued already: ask the client to retry shortly"""
+    response = Response(
+        {'error': 'Too many login attempts right now, please retry'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+    response['Retry-After'] = '1'
+    return response
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def organization_register(request):
     """Registering an organization using login and password"""
     serializer = OrganizationRegisterSerializer(data=request.data)
     if serializer.is_valid():
-        organization = serializer.save()
+        try:
+            organization = serializer.save()
+        except HashingBusy:
+            return login_busy_response()
 
         if not organization.avatar_url:
             organization.avatar_url = generate_avatar_url(seed=str(organization.uuid))
@@ -202,7 +239,7 @@ def organization_register(request):
         }
 
         response = Response(response_data)
-        response = set_session_cookie(response, str(session.uuid))
+        response = set_session_cookie(response, session)
         return response
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -214,10 +251,13 @@ def organization_login(request):
     serializer = OrganizationLoginSerializer(data=request.data)
     print(f"🔐 ORGANIZATION LOGIN - Current cookie: {request.COOKIES.get('session_id')}")
     if serializer.is_valid():
-        organization = OrganizationService.authenticate_organization(
-            serializer.validated_data['login'],
-            serializer.validated_data['password']
-        )
+        try:
+            organization = OrganizationService.authenticate_organization(
+                serializer.validated_data['login'],
+                serializer.validated_data['password']
+            )
+        except HashingBusy:
+            return login_busy_response()
 
         if organization:
             if not organization.avatar_url:
@@ -228,10 +268,7 @@ def organization_login(request):
 
             user_data_serializer = OrganizationUserDataSerializer(organization)
 
-            Session.objects.filter(
-                user_data=organization,
-                is_active=True
-            ).exclude(uuid=session.uuid).update(is_active=False)
+            AuthService.deactivate_other_sessions(organization, session)
 
             response_data = {
                 'session_id': str(session.uuid),
@@ -241,7 +278,7 @@ def organization_login(request):
             }
 
             response = Response(response_data)
-            response = set_session_cookie(response, str(session.uuid))
+            response = set_session_cookie(response, session)
             print(f"🍪 ORGANIZATION LOGIN - Setting new cookie: {session.uuid}")
             return response
 
@@ -320,10 +357,43 @@ def add_employee(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([JSONParser, MultiPartParser, CSVTextParser])
+def import_employees(request):
+    """Bulk adding of employees from JSON or CSV, returns a per-row report"""
+    if request.user.user_type != 'organization':
+        return Response(
+            {'error': 'Only organizations can add employees'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    dry_run = request.query_params.get('dry_run') in ('1', 'true')
+
+    try:
+        rows = rows_from_request(request)
+        report = EmployeeImporter(request.user).run(rows, dry_run=dry_run)
+    except EmployeeImportError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except IntegrityError:
+        # the same phone number was added concurrently, a retry resolves it as an update
+        return Response(
+            {'error': 'Employees were modified concurrently, please retry the import'},
+            status=status.HTTP_409_CONFLICT
+        )
+
+    return Response({'success': report['errors'] == 0, **report})
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def organization_employees(request):
-    """Obtaining a list of employees of an organization"""
+    """
+    Obtaining a list of employees of an organization.
+
+    Keyset-paginated by (created_at, uuid): pass the returned next_cursor as ?cursor=.
+    Filters: ?active=true|false, ?name=<prefix>; ?page_size= up to 200.
+    """
     if request.user.user_type != 'organization':
         return Response(
             {'error': 'Only organizations can view employees'},
@@ -333,23 +403,37 @@ def organization_employees(request):
     employees = UserData.objects.filter(
         organization=request.user,
         user_type='employee'
-    )
-
-    employees_data = []
-    for employee in employees:
-        has_active_session = Session.objects.filter(
-            user_data=employee,
+    ).annotate(
+        is_active=Exists(Session.objects.filter(
+            user_data=OuterRef('pk'),
             is_active=True,
             expires_at__gt=timezone.now()
-        ).exists()
+        ))
+    )
 
-        employee_data = UserDataSerializer(employee).data
-        employee_data['is_active'] = has_active_session
-        employees_data.append(employee_data)
+    active = request.query_params.get('active')
+    if active in ('true', '1'):
+        employees = employees.filter(is_active=True)
+    elif active in ('false', '0'):
+        employees = employees.filter(is_active=False)
+
+    name = request.query_params.get('name', '').strip()
+    if name:
+        employees = employees.filter(name__istartswith=name)
+
+    try:
+        page, next_cursor = EMPLOYEES_PAGINATOR.paginate(
+            employees,
+            cursor=request.query_params.get('cursor'),
+            page_size=request.query_params.get('page_size')
+        )
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     return Response({
-        'employees': employees_data,
-        'count': employees.count()
+        'employees': OrganizationEmployeeSerializer(page, many=True).data,
+        'count': employees.count(),
+        'next_cursor': next_cursor
     })
 
 
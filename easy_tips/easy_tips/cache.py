@@ -0,0 +1,289 @@
+"""
+Two-tier cache backend.
+
+Tier one is a bounded per-process LRU with TTL, tier two is a shared cache alias
+(the database cache or Redis). Writes go through to the shared tier, reads are
+served locally while the local copy is fresh. Per-key-prefix policies decide how
+long a key may live locally (0 = never, e.g. verification codes that any worker
+may have to check) and whether it is shared at all.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'easy_tips.cache.TieredCache',
+            'LOCATION': 'tiered',
+            'OPTIONS': {
+                'SHARED_ALIAS': 'shared',
+                'LOCAL_MAX_ENTRIES': 10000,
+                'LOCAL_TIMEOUT': 30,
+                'POLICIES': {
+                    'verification_code_': {'local_timeout': 0},
+                    'qr:': {'local_timeout': 3600},
+                },
+            },
+        },
+        'shared': {...},
+    }
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+
+# one local tier per LOCATION, shared by all threads of the process
+# (Django creates a cache instance per thread)
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+
+
+class LocalTier:
+    """Thread-safe LRU of key -> (value, expires_at monotonic or None)"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.entries[key]
+                return _MISSING
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        expires_at = None if timeout is None else time.monotonic() + timeout
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            return self.entries.pop(key, None) is not None
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def count(self, policy, counter, amount=1):
+        with self.lock:
+            policy_counters = self.counters.setdefault(policy, {})
+            policy_counters[counter] = policy_counters.get(counter, 0) + amount
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED_ALIAS', 'shared')
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 30)
+        # longest prefix wins
+        self._policies = sorted(options.get('POLICIES', {}).items(), key=lambda item: -len(item[0]))
+
+        with _local_tiers_lock:
+            if location not in _local_tiers:
+                _local_tiers[location] = LocalTier(options.get('LOCAL_MAX_ENTRIES', 10000))
+            self._local = _local_tiers[location]
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _policy(self, key):
+        for prefix, policy in self._policies:
+            if key.startswith(prefix):
+                return prefix, policy
+        return 'default', {}
+
+    def _local_ttl(self, policy, timeout):
+        """Seconds the value may live in the local tier: 0 to skip it, None for no expiry"""
+        if self._is_shared(policy):
+            local_timeout = policy.get('local_timeout', self._local_timeout)
+        else:
+            # the local tier is the only copy
+            local_timeout = policy.get('local_timeout')
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        if timeout is None:
+            return local_timeout
+        if local_timeout is None:
+            return max(timeout, 0)
+        return max(min(timeout, local_timeout), 0)
+
+    def _is_shared(self, policy):
+        return policy.get('shared', True)
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        name, policy = self._policy(key)
+
+        value = self._local.get(local_key)
+        if value is not _MISSING:
+            self._local.count(name, 'local_hits')
+            return value
+
+        if self._is_shared(policy):
+            value = self.shared.get(key, _MISSING, version=version)
+            if value is not _MISSING:
+                self._local.count(name, 'shared_hits')
+                ttl = self._local_ttl(policy, DEFAULT_TIMEOUT)
+                if ttl != 0:
+                    self._local.set(local_key, value, ttl)
+                return value
+
+        self._local.count(name, 'misses')
+        return default
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        name, policy = self._policy(key)
+
+        if self._is_shared(policy):
+            self.shared.set(key, value, timeout, version=version)
+
+        ttl = self._local_ttl(policy, timeout)
+        if ttl != 0:
+            self._local.set(local_key, value, ttl)
+        else:
+            self._local.delete(local_key)
+        self._local.count(name, 'sets')
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        name, policy = self._policy(key)
+
+        if self._is_shared(policy):
+            added = self.shared.add(key, value, timeout, version=version)
+        else:
+            added = self._local.get(local_key) is _MISSING
+
+        if added:
+            ttl = self._local_ttl(policy, timeout)
+            if ttl != 0:
+                self._local.set(local_key, value, ttl)
+            self._local.count(name, 'sets')
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        _, policy = self._policy(key)
+
+        if not self._is_shared(policy):
+            value = self._local.get(local_key)
+            if value is _MISSING:
+                return False
+            self._local.set(local_key, value, self._local_ttl(policy, timeout))
+            return True
+
+        # the local copy keeps its own (shorter) expiry
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        _, policy = self._policy(key)
+
+        deleted = self._local.delete(local_key)
+        if self._is_shared(policy):
+            deleted = self.shared.delete(key, version=version) or deleted
+        return deleted
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remote_keys = []
+        for key in keys:
+            local_key = self.make_and_validate_key(key, version=version)
+            name, policy = self._policy(key)
+            value = self._local.get(local_key)
+            if value is not _MISSING:
+                self._local.count(name, 'local_hits')
+                found[key] = value
+            elif self._is_shared(policy):
+                remote_keys.append(key)
+            else:
+                self._local.count(name, 'misses')
+
+        if remote_keys:
+            remote = self.shared.get_many(remote_keys, version=version)
+            for key in remote_keys:
+                name, policy = self._policy(key)
+                if key not in remote:
+                    self._local.count(name, 'misses')
+                    continue
+                self._local.count(name, 'shared_hits')
+                found[key] = remote[key]
+                ttl = self._local_ttl(policy, DEFAULT_TIMEOUT)
+                if ttl != 0:
+                    self._local.set(self.make_and_validate_key(key, version=version), remote[key], ttl)
+
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        shared_data = {}
+        for key, value in data.items():
+            local_key = self.make_and_validate_key(key, version=version)
+            name, policy = self._policy(key)
+            if self._is_shared(policy):
+                shared_data[key] = value
+            ttl = self._local_ttl(policy, timeout)
+            if ttl != 0:
+                self._local.set(local_key, value, ttl)
+            else:
+                self._local.delete(local_key)
+            self._local.count(name, 'sets')
+
+        if shared_data:
+            return self.shared.set_many(shared_data, timeout, version=version)
+        return []
+
+    def delete_many(self, keys, version=None):
+        shared_keys = []
+        for key in keys:
+            self._local.delete(self.make_and_validate_key(key, version=version))
+            if self._is_shared(self._policy(key)[1]):
+                shared_keys.append(key)
+
+        if shared_keys:
+            self.shared.delete_many(shared_keys, version=version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, _MISSING, version=version) is not _MISSING
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        _, policy = self._policy(key)
+
+        if not self._is_shared(policy):
+            value = self._local.get(local_key)
+            if value is _MISSING:
+                raise ValueError("Key '%s' not found" % key)
+            self._local.set(local_key, value + delta, self._local_ttl(policy, DEFAULT_TIMEOUT))
+            return value + delta
+
+        # counters live in the shared tier only
+        self._local.delete(local_key)
+        return self.shared.incr(key, delta, version=version)
+
+    def clear(self):
+        self._local.clear()
+        self.shared.clear()
+
+    def stats(self) -> dict:
+        """Per-policy hit/miss counters of this process, plus the local tier size"""
+        with self._local.lock:
+            policies = {name: dict(counters) for name, counters in self._local.counters.items()}
+            size = len(self._local.entries)
+        return {
+            'local_entries': size,
+            'local_max_entries': self._local.max_entries,
+            'policies': policies,
+        }
@@ -90,13 +90,56 @@ DATABASES = {
     }
 }
 
+# 'default' is a per-process LRU in front of the shared cache (easy_tips/cache.py).
+# local_timeout bounds how stale a worker's copy may be after another worker changes the key;
+# 0 keeps the key in the shared tier only
 CACHES = {
     'default': {
+        'BACKEND': 'easy_tips.cache.TieredCache',
+        'LOCATION': 'tiered',
+        'OPTIONS': {
+            'SHARED_ALIAS': 'shared',
+            'LOCAL_MAX_ENTRIES': 10000,
+            'LOCAL_TIMEOUT': 30,
+            'POLICIES': {
+                'verification_code_': {'local_timeout': 0},
+                # invalidation only reaches the shared tier and the calling process:
+                # a local copy would keep a logged-out session alive in the other workers.
+                # So every authenticated request reads the shared tier: one query on the
+                # DatabaseCache, none on the database only with REDIS_URL
+                'session_resolve:': {'local_timeout': 0},
+                'session_user:': {'local_timeout': 0},
+                'ratelimit:': {'local_timeout': 0},
+                'webhook_count:': {'local_timeout': 0},
+                # every worker must see a bump at once, the versioned entries themselves are immutable
+                'org_stats_version:': {'local_timeout': 0},
+                # rendered QR codes never change under their content hash
+                'qr:': {'local_timeout': 3600},
+                # public employee cards: a renamed employee shows up everywhere within seconds
+                'employee_card:': {'local_timeout': 5},
+                'organization_card:': {'local_timeout': 5},
+                # unknown card uuids: per worker only, a new employee's card may 404 there for 30s
+                'missing_card:': {'shared': False, 'local_timeout': 30},
+            },
+        },
+    },
+    'shared': {
         'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
         'LOCATION': 'my_cache_table',
-    }
+        # the default of 300 entries culls rate limit counters and session entries under load
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
 }
 
+if os.getenv('REDIS_URL'):
+    CACHES['shared'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
+
+# addresses allowed to read the counters at /metrics/cache/ and /metrics/webhooks/
+INTERNAL_IPS = ['127.0.0.1']
+
 
 
 # Password validation
@@ -118,6 +161,20 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# PBKDF2 work factor; hashes with another count are upgraded on the next login
+PASSWORD_HASHERS = [
+    'auth_app.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+PASSWORD_PBKDF2_ITERATIONS = 870000
+
+# at most this many organization password hashes run at once per process (the login request
+# waits for its turn), with at most PASSWORD_HASHING_QUEUE waiting before logins get a 503
+# (0 workers = inline, no cap)
+PASSWORD_HASHING_WORKERS = 2
+PASSWORD_HASHING_QUEUE = 16
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -152,6 +209,17 @@ REST_FRAMEWORK = {
     ],
 }
 
+# sliding-window limits for the public auth endpoints (auth_app/throttling.py), "<count>/<n><s|m|h|d>"
+AUTH_RATE_LIMITS = {
+    'send_code_phone': '3/10m',
+    'send_code_ip': '20/h',
+    'send_code_global': '600/m',
+    'verify_code_phone': '10/10m',
+    'verify_code_ip': '60/h',
+    'guest_login_ip': '30/m',
+    'guest_login_global': '1200/m',
+}
+
 # Settings for the payment system (stubs)
 PAYMENT_SERVICE = {
     'API_KEY': 'your_payment_service_api_key',
@@ -174,10 +242,87 @@ SESSION_COOKIE_SAMESITE = "Lax"
 # if None, we'll extend it on every request (not recommended for heavily loaded systems)
 SESSION_REFRESH_THRESHOLD = 60 * 15
 
+# 'sync' writes the extended expiry inside the request,
+# 'deferred' collects bumps in process and flushes them in one bulk UPDATE per interval (seconds)
+SESSION_REFRESH_MODE = 'sync'
+SESSION_REFRESH_FLUSH_INTERVAL = 30
+
+# issue HMAC-signed session tokens in the session_id cookie, verified without a Session lookup;
+# revoked sessions are re-read by every worker at most once per SESSION_REVOCATION_REFRESH seconds
+SESSION_TOKEN_MODE = False
+SESSION_REVOCATION_REFRESH = 5
+
+# organization/employees/import/: rows per request and rows per bulk_create/bulk_update statement
+EMPLOYEE_IMPORT_MAX_ROWS = 5000
+EMPLOYEE_IMPORT_BATCH_SIZE = 500
+
+# outbound SMS queue (auth_app/messaging.py), drained by `manage.py run_message_worker`;
+# CONCURRENCY is the number of provider calls in flight per worker process
+MESSAGE_PROVIDERS = {
+    'console': {'BACKEND': 'auth_app.messaging.ConsoleProvider', 'CONCURRENCY': 1},
+    'fake': {'BACKEND': 'auth_app.messaging.FakeProvider', 'CONCURRENCY': 16, 'LATENCY': 0.05},
+}
+MESSAGE_DEFAULT_PROVIDER = os.getenv('MESSAGE_PROVIDER', 'console')
+MESSAGE_BATCH_SIZE = 100
+MESSAGE_MAX_ATTEMPTS = 5
+MESSAGE_RETRY_BASE_DELAY = 5  # seconds, doubled on every attempt
+MESSAGE_RETRY_MAX_DELAY = 600  # seconds
+MESSAGE_LEASE = 60  # seconds a claimed message is reserved for one worker
+
+# organization statistics read the daily TipRollup buckets instead of raw transactions; migration
+# user_profile 0010 fills them from the existing transactions, `manage.py backfill_tip_rollups` rebuilds them
+STATISTICS_USE_ROLLUPS = True
+# seconds an organization_statistics result is reused; tips and new employees invalidate it earlier
+ORGANIZATION_STATS_CACHE_TIMEOUT = 60
+
+# rendered QR codes are cached by a hash of payload + render parameters (user_profile/qr_codes.py);
+# QR_CODE_MAX_AGE is the browser Cache-Control max-age of the raw image responses
+QR_CODE_CACHE_TIMEOUT = 30 * 86400  # seconds
+QR_CODE_MAX_AGE = 7 * 86400  # seconds
+# organization QR exports render in a pool of spawned processes (0 = render in the request);
+# at most QR_EXPORT_WINDOW codes are rendered ahead of the streamed response
+QR_EXPORT_WORKERS = 2
+QR_EXPORT_WINDOW = 32
+
+# public employee card of the tip form (get_employee_info), dropped on name/avatar changes;
+# the max-age/stale-while-revalidate pair lets a CDN or reverse proxy absorb bursts of scans
+EMPLOYEE_CARD_CACHE_TIMEOUT = 3600  # seconds
+EMPLOYEE_CARD_MAX_AGE = 30  # seconds
+EMPLOYEE_CARD_STALE_WHILE_REVALIDATE = 300  # seconds
+
+# preset amounts of the tip page (tip-page bootstrap): percentiles of the employee's last
+# TIP_PRESET_SAMPLE_SIZE completed tips, TIP_PRESET_AMOUNTS until there are TIP_PRESET_MIN_SAMPLES of them
+TIP_PRESET_AMOUNTS = ['3', '5', '10']
+TIP_PRESET_SAMPLE_SIZE = 100
+TIP_PRESET_MIN_SAMPLES = 5
+TIP_PRESETS_CACHE_TIMEOUT = 3600  # seconds
+
+# guest_login hands out a signed guest identity instead of inserting UserData + Session rows;
+# the rows are created once the guest pays or edits a profile
+GUEST_LAZY_IDENTITY = True
+
+# expired/inactive sessions are kept this many days before the reaper deletes them;
+# SESSION_REAPER_INTERVAL (seconds) runs the reaper inside the workers, None leaves it to `manage.py purge_sessions`
+SESSION_RETENTION_DAYS = 7
+SESSION_REAPER_BATCH_SIZE = 1000
+SESSION_REAPER_INTERVAL = None
+
+# cache alias and lifetime (seconds) of the resolved session_id -> session/user snapshot entries
+SESSION_CACHE_ALIAS = 'default'
+SESSION_CACHE_TIMEOUT = 60 * 5
+
 # Stripe Settings
 STRIPE_TEST_MODE = True
 STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY', 'pk_test_51SDnMDHyBFLETxWaBIxoOc7biRTQFk8WxkL8MUZx5jpGpU4juUDydi3VXNXj3D5fQ3dLJktaPv1EVZrIbAZt6L4v00cTeXyY0Y')
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY')
+# the webhook only verifies and stores Stripe events, `manage.py process_stripe_events` applies them;
+# False processes every event inside the webhook request as before
+STRIPE_WEBHOOK_ASYNC = True
+STRIPE_EVENT_BATCH_SIZE = 100
+STRIPE_EVENT_MAX_ATTEMPTS = 8
+STRIPE_EVENT_RETRY_BASE_DELAY = 5  # seconds, doubled on every attempt
+STRIPE_EVENT_RETRY_MAX_DELAY = 900  # seconds
+STRIPE_EVENT_LEASE = 60  # seconds a claimed event is reserved for one worker
 # Currency settings
 DEFAULT_CURRENCY = 'usd'
 
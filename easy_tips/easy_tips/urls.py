@@ -2,10 +2,14 @@ from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
+from . import views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('auth_app.urls')),
     path('api/profile/', include('user_profile.urls')),
+    path('metrics/cache/', views.cache_metrics, name='cache_metrics'),
+    path('metrics/webhooks/', views.webhook_metrics, name='webhook_metrics'),
 ]
 
 if settings.DEBUG:
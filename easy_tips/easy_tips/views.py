@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.http import Http404, JsonResponse
+
+
+def cache_metrics(request):
+    """Hit/miss counters of the tiered caches in this worker process"""
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS:
+        raise Http404
+
+    metrics = {}
+    for alias in settings.CACHES:
+        cache = caches[alias]
+        if hasattr(cache, 'stats'):
+            metrics[alias] = cache.stats()
+
+    return JsonResponse(metrics)
+
+
+def webhook_metrics(request):
+    """Stripe event counters of all workers: received, duplicate, redundant, applied"""
+    if request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS:
+        raise Http404
+
+    from user_profile.webhooks import counters
+    return JsonResponse(counters())
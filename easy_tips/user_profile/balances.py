@@ -0,0 +1,87 @@
+"""
+Balance accounting.
+
+Every change of UserData.balance is a BalanceEntry row plus an atomic F()
+update of the balance, both inside the caller's DB transaction, so concurrent
+tips for the same employee never overwrite each other and the ledger always
+sums up to the balance. Withdrawals are a conditional update that only matches
+while the balance covers them.
+
+The queryset updates send no post_save, so the cached session snapshot of the
+user is dropped here once the transaction commits.
+"""
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from auth_app.models import UserData
+from auth_app.session_cache import SessionCache
+from .models import BalanceEntry, Transaction
+
+
+class InsufficientFunds(ValueError):
+    pass
+
+
+class BalanceLedger:
+    @staticmethod
+    def credit(user_id, amount, kind: str, transaction: Transaction = None) -> BalanceEntry:
+        """Adds amount to the balance; call inside the transaction that makes it due"""
+        entry = BalanceEntry.objects.create(user_id=user_id, amount=amount, kind=kind, transaction=transaction)
+        UserData.objects.filter(pk=user_id).update(balance=F('balance') + amount)
+        BalanceLedger._invalidate(user_id)
+        return entry
+
+    @staticmethod
+    def debit(user_id, amount, kind: str, transaction: Transaction = None) -> BalanceEntry:
+        """Takes amount off the balance or raises InsufficientFunds; call inside a transaction"""
+        withdrawn = UserData.objects.filter(pk=user_id, balance__gte=amount).update(balance=F('balance') - amount)
+        if not withdrawn:
+            raise InsufficientFunds("Insufficient funds")
+        entry = BalanceEntry.objects.create(user_id=user_id, amount=-amount, kind=kind, transaction=transaction)
+        BalanceLedger._invalidate(user_id)
+        return entry
+
+    @staticmethod
+    def _invalidate(user_id):
+        db_transaction.on_commit(lambda: SessionCache.invalidate_user(user_id))
+
+    # --- reconciliation ---------------------------------------------------
+
+    @staticmethod
+    def mismatches(user_ids=None) -> list:
+        """
+        [(user uuid, balance, ledger sum)] of the users whose balance differs from their entries.
+        Both sides come from one statement, so a credit committing meanwhile is in both or in neither.
+        """
+        total = BalanceEntry.objects.filter(user=OuterRef('pk')).values('user').annotate(total=Sum('amount'))
+        users = UserData.objects.annotate(
+            ledger_total=Coalesce(Subquery(total.values('total')), Decimal(0))
+        ).exclude(balance=F('ledger_total'))
+        if user_ids:
+            users = users.filter(uuid__in=user_ids)
+        return list(users.values_list('uuid', 'balance', 'ledger_total').iterator(chunk_size=2000))
+
+    @staticmethod
+    def rebuild_balance(user_id):
+        """Resets the balance to the sum of the user's entries, the ledger being right"""
+        total = BalanceEntry.objects.filter(user=OuterRef('pk')).values('user').annotate(total=Sum('amount'))
+        # one statement, so a concurrent credit() is either in the sum or applied on top of it
+        UserData.objects.filter(pk=user_id).update(balance=Coalesce(Subquery(total.values('total')), Decimal(0)))
+        BalanceLedger._invalidate(user_id)
+
+    @staticmethod
+    def book_difference(user_id) -> BalanceEntry | None:
+        """
+        Records an 'adjustment' entry for a balance changed outside the ledger, the balance being right.
+        Both sides are read again under a lock of the user row, which credit() and debit() need too,
+        so the entry is only booked for a difference that is still there; returns None otherwise.
+        """
+        with db_transaction.atomic():
+            balance = UserData.objects.select_for_update().values_list('balance', flat=True).get(pk=user_id)
+            total = BalanceEntry.objects.filter(user=user_id).aggregate(total=Sum('amount'))['total'] or Decimal(0)
+            if balance == total:
+                return None
+            return BalanceEntry.objects.create(user_id=user_id, amount=balance - total, kind='adjustment')
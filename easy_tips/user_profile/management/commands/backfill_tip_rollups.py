@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from user_profile.rollups import TipRollupService
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily TipRollup buckets from the raw transactions (all days or the last N)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Only rebuild the last N days, including today")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start_day = None
+        if options['days']:
+            start_day = timezone.localdate() - timedelta(days=options['days'] - 1)
+
+        buckets = TipRollupService.rebuild(start_day=start_day, batch_size=options['batch_size'])
+        scope = f"since {start_day.isoformat()}" if start_day else "for all days"
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} rollup buckets {scope}"))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from auth_app.models import UserData
+from user_profile.public_cards import CARD_KEY
+
+
+class Command(BaseCommand):
+    help = "get_employee_info latency: card built from the DB, cached card, and 304 revalidation"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+
+    def handle(self, *args, **options):
+        employee = UserData.objects.create(user_type='employee', name='Bench employee', goal='x' * 2000)
+        url = f'/api/profile/employee/{employee.uuid}/info/'
+        client = Client()
+        etag = client.get(url)['ETag']
+
+        try:
+            for label, headers, forget in (
+                ('uncached', {}, True),
+                ('cached', {}, False),
+                ('304', {'HTTP_IF_NONE_MATCH': etag}, False),
+            ):
+                started = time.perf_counter()
+                for _ in range(options['requests']):
+                    if forget:
+                        cache.delete(CARD_KEY.format(employee.uuid))
+                    response = client.get(url, **headers)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{label:>8}: {elapsed * 1000 / options['requests']:6.3f} ms/request "
+                    f"(status {response.status_code}, {len(response.content)} bytes)"
+                )
+        finally:
+            employee.delete()
@@ -0,0 +1,79 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from auth_app.models import UserData
+from user_profile.models import Transaction
+from user_profile.payment_service import PaymentService
+from user_profile.rollups import TipRollupService
+
+PERIODS = ['all', '24h', 'yesterday', 'week', 'month']
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds organizations of growing size (rolled back afterwards) and reports the query count and "
+        "latency of get_organization_statistics per period, from raw transactions and from rollups"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 10000])
+        parser.add_argument('--tips-per-employee', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        query_counts = {}
+        for size in options['sizes']:
+            with transaction.atomic():
+                organization = self.seed(size, options['tips_per_employee'])
+                TipRollupService.rebuild()
+
+                for source, use_rollups in (('raw', False), ('rollups', True)):
+                    with override_settings(STATISTICS_USE_ROLLUPS=use_rollups):
+                        for period in PERIODS:
+                            queries, elapsed = self.measure(str(organization.uuid), period, options['repeat'])
+                            query_counts.setdefault((source, period), set()).add(queries)
+                            self.stdout.write(
+                                f"{size:6d} employees  {source:7s} {period:9s} {queries:3d} queries  {elapsed:8.1f} ms"
+                            )
+                transaction.set_rollback(True)
+
+        growing = [f"{source}/{period}" for (source, period), counts in query_counts.items() if len(counts) > 1]
+        if growing:
+            raise CommandError(f"Query count depends on the organization size: {', '.join(growing)}")
+        self.stdout.write(self.style.SUCCESS("Query count is independent of the number of employees"))
+
+    @staticmethod
+    def measure(organization_uuid, period, repeat):
+        queries = []
+        with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+            PaymentService.get_organization_statistics(organization_uuid, period)
+        started = time.perf_counter()
+        for _ in range(repeat):
+            PaymentService.get_organization_statistics(organization_uuid, period)
+        return len(queries), (time.perf_counter() - started) * 1000 / repeat
+
+    @staticmethod
+    def seed(size, tips_per_employee):
+        organization = UserData.objects.create(user_type='organization', name='bench statistics')
+        employees = UserData.objects.bulk_create([
+            UserData(user_type='employee', name=f'employee {i}', organization=organization) for i in range(size)
+        ], batch_size=2000)
+
+        now = timezone.now()
+        created = Transaction.objects.bulk_create([
+            Transaction(user=employee, employee=employee, transaction_type='tip', status='completed',
+                        amount=Decimal(random.randint(1, 50)), employee_rating=random.randint(1, 5))
+            for employee in employees for _ in range(tips_per_employee)
+        ], batch_size=2000)
+        # auto_now_add ignores the value passed to bulk_create, timestamps are spread afterwards
+        for tx in created:
+            tx.created_at = now - timedelta(seconds=random.randint(0, 40 * 86400))
+        Transaction.objects.bulk_update(created, ['created_at'], batch_size=2000)
+        return organization
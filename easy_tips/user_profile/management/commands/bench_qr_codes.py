@@ -0,0 +1,46 @@
+import time
+import uuid
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from user_profile.payment_service import PaymentService
+from user_profile.qr_codes import CACHE_KEY, qr_digest, payment_url
+
+
+class Command(BaseCommand):
+    help = "CPU time per get_employee_qr_code call: rendering every time vs. the content-addressed cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=20, help="calls per employee")
+
+    def handle(self, *args, **options):
+        employees = [str(uuid.uuid4()) for _ in range(options['employees'])]
+        calls = options['employees'] * options['requests']
+
+        for fmt in ('png', 'svg'):
+            self.forget(employees, fmt)
+            uncached = self.measure(employees, options['requests'], fmt, forget=True)
+            self.forget(employees, fmt)
+            cached = self.measure(employees, options['requests'], fmt, forget=False)
+            self.forget(employees, fmt)
+
+            self.stdout.write(
+                f"{fmt}: rendered {uncached * 1000 / calls:7.3f} ms CPU/request, "
+                f"cached {cached * 1000 / calls:7.3f} ms CPU/request "
+                f"({uncached / cached:.0f}x less CPU, {calls} requests)"
+            )
+
+    def measure(self, employees, requests, fmt, forget):
+        started = time.process_time()
+        for _ in range(requests):
+            for employee_uuid in employees:
+                if forget:
+                    self.forget([employee_uuid], fmt)
+                PaymentService.generate_employee_qr_code(employee_uuid, fmt)
+        return time.process_time() - started
+
+    @staticmethod
+    def forget(employees, fmt):
+        cache.delete_many([CACHE_KEY.format(qr_digest(payment_url(employee_uuid), fmt)) for employee_uuid in employees])
@@ -0,0 +1,50 @@
+import resource
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from user_profile import qr_export
+from user_profile.qr_codes import CACHE_KEY, qr_digest, payment_url
+
+
+class Command(BaseCommand):
+    help = "Organization QR export: time to first byte, total time and peak memory, cold QR cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=500)
+        parser.add_argument('--workers', type=int, nargs='+', default=[0, 2, 4])
+        parser.add_argument('--as', dest='output', choices=['zip', 'pdf'], default='zip')
+
+    def handle(self, *args, **options):
+        employees = [(uuid.uuid4(), f"Employee {number}") for number in range(options['employees'])]
+
+        for workers in options['workers']:
+            settings.QR_EXPORT_WORKERS = workers
+            pool = qr_export.get_pool()
+            if pool is not None:
+                # start the workers (and their django.setup()) outside the measurement
+                list(pool.map(abs, range(workers * 4)))
+            cache.delete_many([
+                CACHE_KEY.format(qr_digest(payment_url(str(employee_uuid)), 'png'))
+                for employee_uuid, _ in employees
+            ])
+
+            stream = qr_export.stream_pdf(employees) if options['output'] == 'pdf' else qr_export.stream_zip(employees)
+            started = time.perf_counter()
+            first_byte, size = None, 0
+            for chunk in stream:
+                if first_byte is None and chunk:
+                    first_byte = time.perf_counter() - started
+                size += len(chunk)
+            total = time.perf_counter() - started
+
+            self.stdout.write(
+                f"workers={workers}: first byte {first_byte * 1000:7.1f} ms, total {total:6.2f} s, "
+                f"{size / 1024:8.0f} KiB, peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MiB"
+            )
+            if pool is not None:
+                pool.shutdown()
+                qr_export._pool = None
@@ -0,0 +1,69 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from auth_app.models import UserData
+from user_profile.models import Transaction
+from user_profile.views import HISTORY_PAGINATOR
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds one employee with N tips (rolled back afterwards) and times the first and a deep "
+        "transaction_history page: keyset cursor vs. the OFFSET it replaces"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=200000)
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            employee = self.seed(options['transactions'])
+            tips = Transaction.objects.filter(employee=employee)
+            page_size = options['page_size']
+            depth = int(options['transactions'] * 0.9)
+
+            # the cursor a client would hold after paging down to `depth`
+            anchor = tips.order_by('-created_at', '-id').values_list('created_at', 'id')[depth - 1]
+            deep_cursor = HISTORY_PAGINATOR.encode(list(anchor))
+
+            timings = {
+                'keyset, first page': lambda: HISTORY_PAGINATOR.paginate(tips, None, page_size),
+                f'keyset, row {depth}': lambda: HISTORY_PAGINATOR.paginate(tips, deep_cursor, page_size),
+                'offset, first page': lambda: list(tips.order_by('-created_at', '-id')[:page_size]),
+                f'offset, row {depth}': lambda: list(tips.order_by('-created_at', '-id')[depth:depth + page_size]),
+                'exact count': lambda: tips.count(),
+            }
+            for label, query in timings.items():
+                self.stdout.write(f"{label:24s} {self.measure(query, options['repeat']):8.2f} ms")
+
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def measure(query, repeat):
+        query()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            query()
+        return (time.perf_counter() - started) * 1000 / repeat
+
+    @staticmethod
+    def seed(count):
+        employee = UserData.objects.create(user_type='employee', name='bench history')
+        now = timezone.now()
+        created = Transaction.objects.bulk_create([
+            Transaction(user=employee, employee=employee, transaction_type='tip', status='completed',
+                        amount=random.randint(1, 50))
+            for _ in range(count)
+        ], batch_size=5000)
+        # auto_now_add ignores the value passed to bulk_create, timestamps are spread afterwards
+        for tx in created:
+            tx.created_at = now - timedelta(seconds=random.randint(0, 365 * 86400))
+        Transaction.objects.bulk_update(created, ['created_at'], batch_size=5000)
+        return employee
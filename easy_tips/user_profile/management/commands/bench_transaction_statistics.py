@@ -0,0 +1,97 @@
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from auth_app.models import UserData
+from user_profile.models import Transaction
+from user_profile.payment_service import PaymentService
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds an account with N transactions over two years (rolled back afterwards) and compares "
+        "transaction_statistics' former per-figure queries with the single-pass aggregation"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = self.seed(options['transactions'])
+            transactions = user.transactions.all()
+            since = timezone.now() - timedelta(days=180)
+
+            legacy, legacy_ms, legacy_queries = self.measure(lambda: self.legacy(transactions, since), options['repeat'])
+            single, single_ms, single_queries = self.measure(
+                lambda: PaymentService.get_transaction_statistics(transactions, since), options['repeat']
+            )
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"separate queries   {legacy_ms:9.1f} ms  {legacy_queries} queries")
+        self.stdout.write(f"single pass        {single_ms:9.1f} ms  {single_queries} queries")
+        if legacy != single:
+            raise CommandError(f"Results differ:\n{legacy}\n{single}")
+        self.stdout.write(self.style.SUCCESS("Results match"))
+
+    @staticmethod
+    def measure(query, repeat):
+        queries = []
+        with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+            result = query()
+        started = time.perf_counter()
+        for _ in range(repeat):
+            query()
+        return result, (time.perf_counter() - started) * 1000 / repeat, len(queries)
+
+    @staticmethod
+    def legacy(transactions, since):
+        """The queries transaction_statistics used to run"""
+        tips = transactions.filter(transaction_type='tip')
+        payouts = transactions.filter(transaction_type='payout')
+        summary = {
+            'total_transactions': transactions.count(),
+            'tips_count': tips.count(),
+            'payouts_count': payouts.count(),
+            'tips_amount': tips.aggregate(Sum('amount'))['amount__sum'] or 0,
+            'payouts_amount': payouts.aggregate(Sum('amount'))['amount__sum'] or 0,
+        }
+        monthly = list(
+            transactions.filter(created_at__gte=since)
+            .annotate(month=TruncMonth('created_at'))
+            .values('month')
+            .annotate(
+                tips_count=Count('id', filter=Q(transaction_type='tip')),
+                tips_amount=Sum('amount', filter=Q(transaction_type='tip')),
+                payouts_count=Count('id', filter=Q(transaction_type='payout')),
+                payouts_amount=Sum('amount', filter=Q(transaction_type='payout')),
+            )
+            .order_by('month')
+        )
+        return summary, monthly
+
+    def seed(self, count):
+        user = UserData.objects.create(user_type='employee', name='bench statistics')
+        now = timezone.now()
+        batch_size = 10000
+        for offset in range(0, count, batch_size):
+            created = Transaction.objects.bulk_create([
+                Transaction(user=user, employee=user,
+                            transaction_type='payout' if i % 10 == 0 else 'tip',
+                            status='completed', amount=random.randint(1, 50))
+                for i in range(offset, min(offset + batch_size, count))
+            ])
+            # auto_now_add ignores the value passed to bulk_create, timestamps are spread afterwards
+            for tx in created:
+                tx.created_at = now - timedelta(seconds=random.randint(0, 2 * 365 * 86400))
+            Transaction.objects.bulk_update(created, ['created_at'])
+            self.stdout.write(f"seeded {offset + len(created)}/{count}", ending='\r')
+        self.stdout.write('')
+        return user
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from user_profile.rollups import COUNTERS, TipRollupService
+
+
+class Command(BaseCommand):
+    help = "Compares the TipRollup buckets with aggregates of the raw transactions and reports differences"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Only check the last N days, including today")
+        parser.add_argument('--show', type=int, default=20, help="Mismatches to print")
+
+    def handle(self, *args, **options):
+        start_day = None
+        if options['days']:
+            start_day = timezone.localdate() - timedelta(days=options['days'] - 1)
+
+        expected = TipRollupService.compute(start_day=start_day)
+        stored = TipRollupService.stored(start_day=start_day)
+        empty = dict.fromkeys(COUNTERS, 0)
+
+        mismatches = []
+        for key in expected.keys() | stored.keys():
+            want, have = expected.get(key, empty), stored.get(key, empty)
+            if any(want[field] != have[field] for field in COUNTERS):
+                mismatches.append((key, want, have))
+
+        self.stdout.write(f"Checked {len(expected.keys() | stored.keys())} buckets")
+        for (scope, owner, day), want, have in sorted(mismatches, key=lambda item: item[0][2])[:options['show']]:
+            diff = ", ".join(
+                f"{field} {have[field]} != {want[field]}" for field in COUNTERS if want[field] != have[field]
+            )
+            self.stdout.write(f"{day} {scope} {owner}: {diff}")
+
+        if mismatches:
+            raise CommandError(
+                f"{len(mismatches)} buckets differ from the transactions, `manage.py backfill_tip_rollups` rebuilds them"
+            )
+        self.stdout.write(self.style.SUCCESS("Rollups match the transactions"))
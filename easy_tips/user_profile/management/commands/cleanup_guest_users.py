@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from auth_app.models import Session, UserData
+from user_profile.models import Transaction
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes guest UserData rows left behind by guest_login: guests older than the cutoff "
+        "without a live session and never referenced by a payment (guest_session_id)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=7)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        cutoff = now - timedelta(days=options['older_than_days'])
+        guests = UserData.objects.filter(user_type='guest', created_at__lt=cutoff).order_by('uuid')
+
+        deleted = kept = 0
+        last_uuid = None
+        while True:
+            page = guests if last_uuid is None else guests.filter(uuid__gt=last_uuid)
+            batch = list(page.values_list('uuid', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            last_uuid = batch[-1]
+
+            keep = set()
+            references = {str(guest_uuid): guest_uuid for guest_uuid in batch}
+            for session_uuid, user_uuid, is_active, expires_at in Session.objects.filter(
+                user_data__in=batch
+            ).values_list('uuid', 'user_data', 'is_active', 'expires_at'):
+                if is_active and expires_at > now:
+                    keep.add(user_uuid)
+                references[str(session_uuid)] = user_uuid
+
+            # payments of guests carry either the guest uuid or the (old) guest session uuid
+            for guest_session_id in Transaction.objects.filter(
+                guest_session_id__in=list(references)
+            ).values_list('guest_session_id', flat=True):
+                keep.add(references[guest_session_id])
+
+            removable = [guest_uuid for guest_uuid in batch if guest_uuid not in keep]
+            kept += len(batch) - len(removable)
+            if removable and not options['dry_run']:
+                UserData.objects.filter(uuid__in=removable).delete()
+            deleted += len(removable)
+
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {deleted} guest users, kept {kept}"))
@@ -0,0 +1,149 @@
+import hashlib
+import hmac
+import json
+import random
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from auth_app.models import UserData
+from user_profile.models import StripeEvent, Transaction
+from user_profile.webhooks import StripeEventWorker, counters
+
+
+def sign(payload: bytes, secret: str) -> str:
+    """Stripe-Signature header for the payload, as Stripe computes it"""
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Fires locally signed Stripe events (checkout.session.completed, payment_intent.succeeded and "
+        "charge.succeeded per payment, plus redeliveries) at the webhook and reports the acknowledgement latency"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payments', type=int, default=200)
+        parser.add_argument('--redeliveries', type=float, default=0.2,
+                            help="Share of events delivered a second time")
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--sync', action='store_true',
+                            help="Process inside the webhook request (STRIPE_WEBHOOK_ASYNC=False) for comparison")
+        parser.add_argument('--process', action='store_true',
+                            help="Run the worker afterwards and check every payment was settled exactly once")
+
+    def handle(self, *args, **options):
+        secret = settings.STRIPE_WEBHOOK_SECRET
+        run_id = uuid.uuid4().hex[:8]
+        employee = UserData.objects.create(user_type='employee', name=f'Webhook load test {run_id}')
+        amount = Decimal('5.00')
+
+        deliveries = []
+        transactions = []
+        for number in range(options['payments']):
+            intent, session = f"pi_load_{run_id}_{number}", f"cs_load_{run_id}_{number}"
+            transactions.append(Transaction(
+                user=employee, employee=employee, transaction_type='tip', amount=amount, status='pending',
+                stripe_payment_intent_id=intent, stripe_checkout_session_id=session,
+            ))
+            created = int(time.time())
+            objects = [
+                ('checkout.session.completed', {'id': session, 'payment_intent': intent, 'metadata': {}}),
+                ('payment_intent.succeeded', {'id': intent}),
+                ('charge.succeeded', {'id': f"ch_load_{run_id}_{number}", 'payment_intent': intent}),
+            ]
+            for offset, (event_type, data) in enumerate(objects):
+                deliveries.append(json.dumps({
+                    'id': f"evt_load_{run_id}_{number}_{offset}", 'object': 'event', 'type': event_type,
+                    'created': created + offset, 'data': {'object': data},
+                }).encode())
+        Transaction.objects.bulk_create(transactions)
+
+        deliveries += random.sample(deliveries, int(len(deliveries) * options['redeliveries']))
+        random.shuffle(deliveries)
+
+        url = reverse('stripe_webhook')
+        local = threading.local()
+
+        def deliver(payload):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+            started = time.perf_counter()
+            response = local.client.post(
+                url, payload, content_type='application/json', HTTP_STRIPE_SIGNATURE=sign(payload, secret)
+            )
+            return time.perf_counter() - started, response.status_code
+
+        def run(payload):
+            try:
+                return deliver(payload)
+            finally:
+                connections.close_all()
+
+        before = counters()
+        with override_settings(STRIPE_WEBHOOK_ASYNC=not options['sync']):
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                results = list(pool.map(run, deliveries))
+            elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        failures = sum(1 for _, status_code in results if status_code != 200)
+        percentile = lambda share: latencies[min(len(latencies) - 1, int(share * len(latencies)))]
+        self.stdout.write(
+            f"{len(deliveries)} deliveries ({'sync' if options['sync'] else 'async'}, "
+            f"concurrency {options['concurrency']}): {len(deliveries) / elapsed:.0f} events/s, "
+            f"ack p50 {statistics.median(latencies):.1f} ms, p95 {percentile(0.95):.1f} ms, "
+            f"p99 {percentile(0.99):.1f} ms, max {latencies[-1]:.1f} ms, {failures} non-200"
+        )
+
+        after = counters()
+        self.stdout.write("webhook counters: " + ", ".join(
+            f"{name} {after.get(name, 0) - before.get(name, 0)}" for name in ('received', 'duplicate', 'redundant', 'applied')
+        ))
+
+        events = StripeEvent.objects.filter(event_id__startswith=f"evt_load_{run_id}_")
+        if not options['sync']:
+            self.stdout.write(f"stored {events.count()} unique events of {len(deliveries)} deliveries")
+
+        if options['process'] and not options['sync']:
+            worker = StripeEventWorker()
+            started = time.perf_counter()
+            processed = redundant = 0
+            while True:
+                stats = worker.run_once()
+                if not any(stats.values()):
+                    break
+                processed += stats['processed']
+                redundant += stats['redundant']
+            self.stdout.write(
+                f"worker drained the log in {time.perf_counter() - started:.2f} s: "
+                f"{processed} events, {redundant} of them redundant"
+            )
+
+        if options['process'] or options['sync']:
+            employee.refresh_from_db()
+            settled = Transaction.objects.filter(employee=employee, status='completed').count()
+            expected = amount * options['payments']
+            verdict = self.style.SUCCESS('OK') if settled == options['payments'] and employee.balance == expected \
+                else self.style.ERROR('MISMATCH')
+            self.stdout.write(
+                f"{verdict}: {settled}/{options['payments']} payments settled, "
+                f"balance {employee.balance} (expected {expected}), "
+                f"{events.filter(status='dead').count()} dead events"
+            )
+
+        events.delete()
+        employee.delete()
@@ -0,0 +1,34 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from user_profile.webhooks import StripeEventWorker
+
+
+class Command(BaseCommand):
+    help = "Applies the Stripe webhook events stored by the webhook view until stopped"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Events claimed per round (STRIPE_EVENT_BATCH_SIZE)")
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help="Seconds to wait when there is nothing to process")
+        parser.add_argument('--once', action='store_true',
+                            help="Process one batch and exit")
+
+    def handle(self, *args, **options):
+        worker = StripeEventWorker(batch_size=options['batch_size'])
+        if options['once']:
+            stats = worker.run_once()
+            self.stdout.write(self.style.SUCCESS(
+                f"Processed {stats['processed']} ({stats['redundant']} redundant), "
+                f"retried {stats['retried']}, dead {stats['dead']}"
+            ))
+            return
+
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+        self.stdout.write("Stripe event worker started")
+        worker.run(poll_interval=options['poll_interval'], stop=stop)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from user_profile.balances import BalanceLedger
+
+
+class Command(BaseCommand):
+    help = "Compares every UserData.balance with the sum of its BalanceEntry rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', default=None, help="Only this user uuid (repeatable)")
+        parser.add_argument('--fix', choices=['balance', 'ledger'], default=None,
+                            help="'balance' resets balances to the ledger sum, "
+                                 "'ledger' books adjustment entries for balances changed outside the ledger")
+
+    def handle(self, *args, **options):
+        mismatches = BalanceLedger.mismatches(options['user'])
+        fixed = 0
+        for user_id, balance, total in mismatches:
+            self.stdout.write(f"{user_id}: balance {balance}, ledger {total} (difference {balance - total})")
+
+            if options['fix'] == 'balance':
+                BalanceLedger.rebuild_balance(user_id)
+                fixed += 1
+            elif options['fix'] == 'ledger':
+                # None when the difference is gone by the time the user row is locked
+                fixed += BalanceLedger.book_difference(user_id) is not None
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("All balances match the ledger"))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"Fixed {fixed} balances ({options['fix']})"))
+        else:
+            self.stdout.write(self.style.ERROR(f"{len(mismatches)} balances differ from the ledger"))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from user_profile.models import StripeEvent
+from user_profile.webhooks import StripeEventWorker
+
+
+class Command(BaseCommand):
+    help = "Queues stored Stripe events for processing again (dead ones by default)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--event', action='append', default=None,
+                            help="Stripe event id to replay (repeatable), whatever its status")
+        parser.add_argument('--status', choices=['dead', 'processed', 'all'], default='dead',
+                            help="Events to replay when no --event is given")
+        parser.add_argument('--type', help="Only events of this type, e.g. checkout.session.completed")
+        parser.add_argument('--since', help="Only events Stripe created at or after this ISO datetime")
+        parser.add_argument('--process', action='store_true',
+                            help="Process the replayed events right away instead of leaving them to the worker")
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        events = StripeEvent.objects.all()
+        if options['event']:
+            events = events.filter(event_id__in=options['event'])
+        elif options['status'] != 'all':
+            events = events.filter(status=options['status'])
+        else:
+            events = events.filter(status__in=['dead', 'processed'])
+
+        if options['type']:
+            events = events.filter(event_type=options['type'])
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f"Invalid --since '{options['since']}'")
+            events = events.filter(stripe_created__gte=since)
+
+        if options['dry_run']:
+            for event_id, event_type, status in events.order_by('stripe_created').values_list(
+                'event_id', 'event_type', 'status'
+            ):
+                self.stdout.write(f"{event_id} {event_type} ({status})")
+            self.stdout.write(f"{events.count()} events would be replayed")
+            return
+
+        replayed = StripeEventWorker.replay(events)
+        self.stdout.write(self.style.SUCCESS(f"{replayed} events queued again"))
+
+        if options['process'] and replayed:
+            worker = StripeEventWorker()
+            totals = {'processed': 0, 'retried': 0, 'dead': 0, 'redundant': 0}
+            while True:
+                stats = worker.run_once()
+                if not any(stats.values()):
+                    break
+                for key, value in stats.items():
+                    totals[key] += value
+            self.stdout.write(
+                f"Processed {totals['processed']} ({totals['redundant']} redundant), "
+                f"retried {totals['retried']}, dead {totals['dead']}"
+            )
@@ -0,0 +1,90 @@
+import contextlib
+import io
+import random
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Sum
+
+from auth_app.models import UserData
+from user_profile.balances import InsufficientFunds
+from user_profile.models import BalanceEntry, Transaction
+from user_profile.payment_service import PaymentService
+
+
+class Command(BaseCommand):
+    help = (
+        "Fires concurrent tip confirmations (each delivered twice) and withdrawals at one employee "
+        "and checks that the balance and the ledger are exact. Writes into the configured database; "
+        "the employee and everything booked for it are deleted afterwards"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--confirmations', type=int, default=2000)
+        parser.add_argument('--withdrawals', type=int, default=200)
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--amount', type=Decimal, default=Decimal('1.00'))
+        parser.add_argument('--min-throughput', type=float, default=None,
+                            help="Fail when fewer operations per second than this are completed")
+
+    def handle(self, *args, **options):
+        amount = options['amount']
+        run_id = uuid.uuid4().hex[:8]
+        employee = UserData.objects.create(user_type='employee', name=f'Balance stress {run_id}')
+        try:
+            Transaction.objects.bulk_create([
+                Transaction(user=employee, employee=employee, transaction_type='tip', amount=amount,
+                            status='pending', stripe_payment_intent_id=f"pi_stress_{run_id}_{number}")
+                for number in range(options['confirmations'])
+            ])
+
+            jobs = [('tip', f"pi_stress_{run_id}_{number}") for number in range(options['confirmations'])] * 2
+            jobs += [('withdraw', None)] * options['withdrawals']
+            random.shuffle(jobs)
+
+            def run(job):
+                kind, payment_intent_id = job
+                try:
+                    if kind == 'tip':
+                        PaymentService.confirm_tip_payment(payment_intent_id)
+                        return 'tip'
+                    user = UserData.objects.get(pk=employee.pk)
+                    PaymentService.process_withdrawal(user, amount, 'card', {})
+                    return 'withdrawn'
+                except InsufficientFunds:
+                    return 'refused'
+                finally:
+                    connections.close_all()
+
+            started = time.perf_counter()
+            # confirm_tip_payment reports every step with print()
+            with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                outcomes = list(pool.map(run, jobs))
+            elapsed = time.perf_counter() - started
+
+            employee.refresh_from_db()
+            withdrawn = outcomes.count('withdrawn')
+            expected = amount * (options['confirmations'] - withdrawn)
+            ledger = BalanceEntry.objects.filter(user=employee).aggregate(total=Sum('amount'))['total'] or 0
+            settled = Transaction.objects.filter(employee=employee, transaction_type='tip', status='completed').count()
+
+            self.stdout.write(
+                f"{len(jobs)} operations on {options['threads']} threads in {elapsed:.2f} s "
+                f"({len(jobs) / elapsed:.0f}/s): {settled} tips settled, {withdrawn} withdrawals, "
+                f"{outcomes.count('refused')} refused for insufficient funds"
+            )
+            summary = f"balance {employee.balance}, ledger {ledger}, expected {expected}"
+            if not (employee.balance == expected == ledger and settled == options['confirmations']):
+                raise CommandError(f"MISMATCH: {summary}, {settled} of {options['confirmations']} tips settled")
+            if options['min_throughput'] and len(jobs) / elapsed < options['min_throughput']:
+                raise CommandError(
+                    f"Throughput {len(jobs) / elapsed:.0f}/s is below --min-throughput {options['min_throughput']:.0f}/s"
+                )
+            self.stdout.write(self.style.SUCCESS(f"OK: {summary}"))
+        finally:
+            # cascades to its transactions, ledger entries and rollup buckets
+            employee.delete()
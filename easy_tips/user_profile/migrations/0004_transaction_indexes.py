@@ -0,0 +1,41 @@
+# Generated by Django 5.1.7 on 2026-10-17 23:17
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the indexes are built without locking writes to the transactions table
+    atomic = False
+
+    dependencies = [
+        ('user_profile', '0003_transaction_employee_transaction_guest_session_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='stripe_checkout_session_id',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(fields=['employee', 'transaction_type', 'status', 'created_at'], name='tx_employee_type_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('status', 'completed'), ('transaction_type', 'tip')), fields=['employee', 'created_at'], name='tx_completed_tip_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'created_at'], name='tx_user_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('stripe_payment_intent_id__isnull', False)), fields=['stripe_payment_intent_id'], name='tx_payment_intent_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(condition=models.Q(('stripe_checkout_session_id__isnull', False)), fields=['stripe_checkout_session_id'], name='tx_checkout_session_idx'),
+        ),
+    ]
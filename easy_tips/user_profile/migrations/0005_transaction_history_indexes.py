@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-17 23:31
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # the indexes are built without locking writes to the transactions table
+    atomic = False
+
+    dependencies = [
+        ('auth_app', '0013_userdata_org_created_idx'),
+        ('user_profile', '0004_transaction_indexes'),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='transaction',
+            name='tx_user_created_idx',
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'created_at', 'id'], name='tx_user_created_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='transaction',
+            index=models.Index(fields=['employee', 'created_at', 'id'], name='tx_employee_created_idx'),
+        ),
+    ]
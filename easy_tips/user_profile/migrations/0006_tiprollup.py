@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-17 23:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0013_userdata_org_created_idx'),
+        ('user_profile', '0005_transaction_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TipRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('employee', 'Сотрудник'), ('organization', 'Организация')], max_length=12)),
+                ('day', models.DateField()),
+                ('tip_count', models.PositiveIntegerField(default=0)),
+                ('tip_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_count', models.PositiveIntegerField(default=0)),
+                ('payout_count', models.PositiveIntegerField(default=0)),
+                ('payout_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tip_rollups', to='auth_app.userdata')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('scope', 'owner', 'day'), name='tip_rollup_bucket_uniq')],
+            },
+        ),
+    ]
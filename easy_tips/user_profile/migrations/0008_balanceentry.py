@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-17 23:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0013_userdata_org_created_idx'),
+        ('user_profile', '0007_stripeevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('kind', models.CharField(choices=[('opening', 'Начальный остаток'), ('tip', 'Чаевые'), ('payout', 'Вывод средств'), ('adjustment', 'Корректировка')], max_length=16)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='balance_entries', to='user_profile.transaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_entries', to='auth_app.userdata')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'created_at'], name='balance_entry_user_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('transaction__isnull', False)), fields=('transaction',), name='balance_entry_tx_uniq')],
+            },
+        ),
+    ]
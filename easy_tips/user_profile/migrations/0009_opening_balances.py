@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def create_opening_entries(apps, schema_editor):
+    """Every existing non-zero balance becomes the user's first ledger entry"""
+    UserData = apps.get_model('auth_app', 'UserData')
+    BalanceEntry = apps.get_model('user_profile', 'BalanceEntry')
+
+    batch = []
+    for user_id, balance in UserData.objects.exclude(balance=0).values_list('uuid', 'balance').iterator(chunk_size=1000):
+        batch.append(BalanceEntry(user_id=user_id, amount=balance, kind='opening'))
+        if len(batch) >= 1000:
+            BalanceEntry.objects.bulk_create(batch)
+            batch = []
+    BalanceEntry.objects.bulk_create(batch)
+
+
+def delete_opening_entries(apps, schema_editor):
+    apps.get_model('user_profile', 'BalanceEntry').objects.filter(kind='opening').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0008_balanceentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_opening_entries, delete_opening_entries),
+    ]
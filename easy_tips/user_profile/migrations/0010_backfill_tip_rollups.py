@@ -0,0 +1,61 @@
+# Generated by Django 5.1.7 on 2026-10-18 00:07
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+COUNTERS = ['tip_count', 'tip_amount', 'rating_sum', 'rating_count', 'payout_count', 'payout_amount']
+
+
+def backfill_rollups(apps, schema_editor):
+    """Replaces every bucket with one computed from the completed transactions, as TipRollupService.rebuild"""
+    Transaction = apps.get_model('user_profile', 'Transaction')
+    TipRollup = apps.get_model('user_profile', 'TipRollup')
+
+    if schema_editor.connection.vendor == 'postgresql':
+        # tips confirmed meanwhile wait and are added on top of the new buckets
+        schema_editor.execute(f'LOCK TABLE {TipRollup._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')
+
+    completed = Transaction.objects.filter(status='completed').annotate(day=TruncDate('created_at'))
+    buckets = {}
+
+    def add(owner_id, day, row):
+        bucket = buckets.setdefault((owner_id, day), dict.fromkeys(COUNTERS, 0))
+        for field in COUNTERS:
+            if row.get(field):
+                bucket[field] += row[field]
+
+    for row in completed.filter(transaction_type='tip', employee__isnull=False).values('employee', 'day').annotate(
+        tip_count=Count('id'),
+        tip_amount=Sum('amount'),
+        rating_sum=Sum('employee_rating'),
+        rating_count=Count('employee_rating'),
+    ).iterator(chunk_size=1000):
+        add(row['employee'], row['day'], row)
+    for row in completed.filter(transaction_type='payout').values('user', 'day').annotate(
+        payout_count=Count('id'),
+        payout_amount=Sum('amount'),
+    ).iterator(chunk_size=1000):
+        add(row['user'], row['day'], row)
+
+    TipRollup.objects.all().delete()
+    TipRollup.objects.bulk_create([
+        TipRollup(scope='employee', owner_id=owner_id, day=day, **counters)
+        for (owner_id, day), counters in buckets.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_profile', '0009_opening_balances'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tiprollup',
+            name='scope',
+            field=models.CharField(choices=[('employee', 'Сотрудник')], max_length=12),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,6 @@
 import uuid
 from django.db import models
+from django.utils import timezone
 from auth_app.models import UserData
 
 class Transaction(models.Model):
@@ -39,5 +40,142 @@ class Transaction(models.Model):
         help_text="The employee to whom the tip is intended"
     )
 
+    class Meta:
+        indexes = [
+            # employee statistics: tips of an employee by type/status over a date range
+            models.Index(
+                fields=['employee', 'transaction_type', 'status', 'created_at'],
+                name='tx_employee_type_status_idx'
+            ),
+            # organization statistics only ever read completed tips
+            models.Index(
+                fields=['employee', 'created_at'],
+                condition=models.Q(transaction_type='tip', status='completed'),
+                name='tx_completed_tip_idx'
+            ),
+            # history and statistics of the user's own transactions, id is the keyset tie-breaker
+            models.Index(fields=['user', 'created_at', 'id'], name='tx_user_created_idx'),
+            # history of the tips an employee received
+            models.Index(fields=['employee', 'created_at', 'id'], name='tx_employee_created_idx'),
+            # Stripe webhook lookups
+            models.Index(
+                fields=['stripe_payment_intent_id'],
+                condition=models.Q(stripe_payment_intent_id__isnull=False),
+                name='tx_payment_intent_idx'
+            ),
+            models.Index(
+                fields=['stripe_checkout_session_id'],
+                condition=models.Q(stripe_checkout_session_id__isnull=False),
+                name='tx_checkout_session_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.transaction_type} - {self.amount} - {self.status}"
+
+class TipRollup(models.Model):
+    """
+    Daily totals of completed transactions, maintained by user_profile/rollups.py.
+
+    One bucket per (scope, owner, day) with an employee's tips received and payouts;
+    organization figures are summed from the buckets of its current employees.
+    """
+    SCOPES = [
+        ('employee', 'Сотрудник'),
+    ]
+
+    scope = models.CharField(max_length=12, choices=SCOPES)
+    owner = models.ForeignKey(UserData, on_delete=models.CASCADE, related_name='tip_rollups')
+    day = models.DateField()
+
+    tip_count = models.PositiveIntegerField(default=0)
+    tip_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    payout_count = models.PositiveIntegerField(default=0)
+    payout_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'owner', 'day'], name='tip_rollup_bucket_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.owner_id} {self.day}: {self.tip_count} tips"
+
+
+class StripeEvent(models.Model):
+    """
+    Verified Stripe webhook events as received, processed by the worker in user_profile/webhooks.py.
+
+    Rows are only ever added (a redelivery of a stored event_id is ignored) and the
+    payload is never changed; the remaining columns track the processing.
+    """
+    STATUSES = [
+        ('pending', 'Ожидает'),
+        ('processing', 'Обрабатывается'),
+        ('processed', 'Обработано'),
+        ('dead', 'Ошибка'),
+    ]
+
+    event_id = models.CharField(max_length=255, unique=True)
+    event_type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    # Stripe's 'created' of the event, the processing order
+    stripe_created = models.DateTimeField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    status = models.CharField(max_length=16, choices=STATUSES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # for a 'processing' event this is the end of the worker's lease, after that it is picked up again
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['stripe_created', 'id'],
+                name='stripe_event_due_idx',
+                condition=models.Q(status__in=['pending', 'processing']),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.event_type} {self.event_id} ({self.status})"
+
+
+class BalanceEntry(models.Model):
+    """
+    Append-only ledger of balance changes, written by user_profile/balances.py in the
+    same DB transaction as the change of UserData.balance, which is their running sum.
+    """
+    KINDS = [
+        ('opening', 'Начальный остаток'),
+        ('tip', 'Чаевые'),
+        ('payout', 'Вывод средств'),
+        ('adjustment', 'Корректировка'),
+    ]
+
+    user = models.ForeignKey(UserData, on_delete=models.CASCADE, related_name='balance_entries')
+    # signed: credits are positive, debits negative
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    kind = models.CharField(max_length=16, choices=KINDS)
+    transaction = models.ForeignKey(
+        Transaction, on_delete=models.SET_NULL, null=True, blank=True, related_name='balance_entries'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='balance_entry_user_idx'),
+        ]
+        constraints = [
+            # a transaction moves a balance once
+            models.UniqueConstraint(
+                fields=['transaction'], condition=models.Q(transaction__isnull=False), name='balance_entry_tx_uniq'
+            ),
+        ]
+
     def __str__(self):
-        return f"{self.transaction_type} - {self.amount} - {self.status}"
\ No newline at end of file
+        return f"{self.kind} {self.amount} for {self.user_id}"
@@ -1,41 +1,47 @@
-import qrcode
 import base64
-from io import BytesIO
 from django.conf import settings
-from django.db.models import Sum, Count
+from django.db import transaction as db_transaction
+from django.db.models import Case, Count, DateTimeField, Q, Sum, When
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth
 from django.utils import timezone
 from datetime import datetime, timedelta
+from decimal import Decimal
 from django.core.exceptions import ValidationError
 
+from .balances import BalanceLedger
 from .models import Transaction, UserData
+from .qr_codes import FORMATS as QR_FORMATS, QRCodeCache, payment_url, qr_digest
+from .rollups import TipRollupService
+from .stats_cache import OrganizationStatsCache
 from .stripe_service import StripeService
 
 
 class PaymentService:
-    @staticmethod
-    def generate_employee_qr_code(employee_uuid: str):
-        """Generates a QR code for the employee that leads to the payment form"""
-        FRONTEND_URL = getattr(settings, "FRONTEND_URL", "http://194.87.202.132:3000/")
-        form_url = f"{FRONTEND_URL}/tip-form/?employee_id={employee_uuid}"
-
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4
-        )
-        qr.add_data(form_url)
-        qr.make(fit=True)
+    STATISTICS_PERIODS = ('all', '24h', 'yesterday', 'week', 'month')
 
-        img = qr.make_image(fill_color="black", back_color="white")
-        buffer = BytesIO()
-        img.save(buffer, format="PNG")
-        img_str = base64.b64encode(buffer.getvalue()).decode()
+    @staticmethod
+    def employee_qr_digest(employee_uuid: str, fmt: str = 'png') -> str:
+        """Digest of the employee's QR code, known without fetching or rendering the image"""
+        return qr_digest(payment_url(employee_uuid), fmt)
 
-        return {
-            "qr_code": f"data:image/png;base64,{img_str}",
-            "payment_url": form_url
+    @staticmethod
+    def generate_employee_qr_code(employee_uuid: str, fmt: str = 'png', data_uri: bool = True):
+        """
+        Generates a QR code for the employee that leads to the payment form.
+        The base64 data URI ("qr_code") is only built with data_uri.
+        """
+        form_url = payment_url(employee_uuid)
+        image, digest = QRCodeCache.get(form_url, fmt)
+
+        qr_data = {
+            "payment_url": form_url,
+            "image": image,
+            "content_type": QR_FORMATS[fmt],
+            "digest": digest
         }
+        if data_uri:
+            qr_data["qr_code"] = f"data:{QR_FORMATS[fmt]};base64,{base64.b64encode(image).decode()}"
+        return qr_data
 
     @staticmethod
     def create_guest_tip_payment(
@@ -135,57 +141,77 @@ class PaymentService:
             print(f"⚠️ Payment already completed for transaction {transaction.id}")
             return transaction
 
-        transaction.status = 'completed'
-        transaction.save(update_fields=['status'])
-        print(f"✅ Transaction {transaction.id} marked as completed")
-
         employee = transaction.employee
-        if employee:
-            old_balance = employee.balance
-            employee.balance += transaction.amount
-            employee.save(update_fields=['balance'])
-            print(f"💰 Employee {employee.uuid} balance updated from {old_balance} to {employee.balance}")
-            return transaction
-        else:
+        if not employee:
             print(f"❌ No employee found for transaction {transaction.id}")
             return None
 
+        with db_transaction.atomic():
+            # Only one of concurrent deliveries of the event completes the payment
+            completed = Transaction.objects.filter(pk=transaction.pk).exclude(status='completed').update(
+                status='completed', updated_at=timezone.now()
+            )
+            if not completed:
+                print(f"⚠️ Payment already completed for transaction {transaction.id}")
+                return transaction
+            transaction.status = 'completed'
+            print(f"✅ Transaction {transaction.id} marked as completed")
+
+            BalanceLedger.credit(employee.uuid, transaction.amount, 'tip', transaction)
+            TipRollupService.record(transaction)
+            if employee.organization_id:
+                OrganizationStatsCache.bump(employee.organization_id)
+        print(f"💰 Employee {employee.uuid} balance credited with {transaction.amount}")
+        return transaction
+
+    @staticmethod
+    def is_payment_settled(payment_intent_id) -> bool:
+        """One lookup on tx_payment_intent_idx, no locks"""
+        return Transaction.objects.filter(stripe_payment_intent_id=payment_intent_id, status='completed').exists()
+
     @staticmethod
     def process_tip_payment(user, amount, employee_rating=None, comment=None, payment_method='card'):
         """Direct processing of payments (without Stripe). Can be used for internal operations or testing"""
-        transaction = Transaction.objects.create(
-            user=user,
-            transaction_type='tip',
-            amount=amount,
-            status='completed',
-            employee_rating=employee_rating,
-            comment=comment,
-            payment_method=payment_method,
-            employee=user
-        )
-
-        user.balance += amount
-        user.save()
-
+        with db_transaction.atomic():
+            transaction = Transaction.objects.create(
+                user=user,
+                transaction_type='tip',
+                amount=amount,
+                status='completed',
+                employee_rating=employee_rating,
+                comment=comment,
+                payment_method=payment_method,
+                employee=user
+            )
+
+            BalanceLedger.credit(user.uuid, amount, 'tip', transaction)
+            TipRollupService.record(transaction)
+            if user.organization_id:
+                OrganizationStatsCache.bump(user.organization_id)
+
+        user.refresh_from_db(fields=['balance'])
         return transaction
 
     @staticmethod
     def process_withdrawal(user, amount, withdraw_type, details):
-        """Processes withdrawals. Will be integrated with Stripe Connect in the future"""
-        if user.balance < amount:
-            raise ValueError("Insufficient funds")
-
-        transaction = Transaction.objects.create(
-            user=user,
-            transaction_type='payout',
-            amount=amount,
-            status='completed',
-            payment_method=withdraw_type
-        )
-
-        user.balance -= amount
-        user.save()
-
+        """
+        Processes withdrawals. Will be integrated with Stripe Connect in the future.
+        Raises InsufficientFunds (a ValueError) when the balance does not cover the amount.
+        """
+        with db_transaction.atomic():
+            transaction = Transaction.objects.create(
+                user=user,
+                transaction_type='payout',
+                amount=amount,
+                status='completed',
+                payment_method=withdraw_type
+            )
+
+            # the payout row is rolled back with it if the balance does not cover the amount
+            BalanceLedger.debit(user.uuid, amount, 'payout', transaction)
+            TipRollupService.record(transaction)
+
+        user.refresh_from_db(fields=['balance'])
         return transaction
 
     @staticmethod
@@ -208,13 +234,60 @@ class PaymentService:
             raise ValidationError("Employee not found")
 
     @staticmethod
-    def get_employee_qr_code(employee_uuid: str):
+    def get_employee_qr_code(employee_uuid: str, fmt: str = 'png', data_uri: bool = True):
         """Returns a QR code for the employee"""
-        return PaymentService.generate_employee_qr_code(employee_uuid)
+        return PaymentService.generate_employee_qr_code(employee_uuid, fmt, data_uri)
+
+    @staticmethod
+    def get_transaction_statistics(transactions, monthly_since):
+        """
+        Summary and monthly series of a filtered transactions queryset in one query.
+
+        Rows are grouped by month, rows older than monthly_since all fall into one
+        NULL-month group: the summary adds up every group, the monthly series is the
+        non-NULL ones, and both are read from the same snapshot.
+        """
+        groups = (
+            transactions
+            .annotate(month=Case(
+                When(created_at__gte=monthly_since, then=TruncMonth('created_at')),
+                default=None,
+                output_field=DateTimeField(),
+            ))
+            .values('month')
+            .annotate(
+                tips_count=Count('id', filter=Q(transaction_type='tip')),
+                tips_amount=Sum('amount', filter=Q(transaction_type='tip')),
+                payouts_count=Count('id', filter=Q(transaction_type='payout')),
+                payouts_amount=Sum('amount', filter=Q(transaction_type='payout')),
+                transactions_count=Count('id'),
+            )
+            .order_by('month')
+        )
+
+        summary = {'total_transactions': 0, 'tips_count': 0, 'payouts_count': 0,
+                   'tips_amount': 0, 'payouts_amount': 0}
+        monthly = []
+        for group in groups:
+            summary['total_transactions'] += group.pop('transactions_count')
+            summary['tips_count'] += group['tips_count']
+            summary['payouts_count'] += group['payouts_count']
+            summary['tips_amount'] += group['tips_amount'] or 0
+            summary['payouts_amount'] += group['payouts_amount'] or 0
+            if group['month'] is not None:
+                monthly.append(group)
+
+        return summary, monthly
 
     @staticmethod
     def get_organization_statistics(organization_uuid: str, period: str = 'week'):
-        from django.db.models import Sum
+        """
+        Dashboard statistics of an organization for a period: 'all', '24h', 'yesterday', 'week' or 'month'.
+
+        Built from a fixed number of queries whatever the number of employees:
+        the period and today totals in one conditional aggregate, the daily trend
+        in one TruncDate group-by and the top five in one grouped, limited query.
+        """
         try:
             organization = UserData.objects.get(uuid=organization_uuid, user_type='organization')
         except UserData.DoesNotExist:
@@ -223,97 +296,82 @@ class PaymentService:
         employees = UserData.objects.filter(organization=organization, user_type='employee')
         now = timezone.now()
 
-        if period == 'all':
-            from django.db.models import Sum
-            employee_stats = []
-
-            for employee in employees:
-                total_tips = Transaction.objects.filter(
-                    employee=employee,
-                    transaction_type='tip',
-                    status='completed'
-                ).aggregate(total=Sum('amount'))['total'] or 0
-
-                employee_stats.append({
-                    'employee__name': employee.name,
-                    'employee__uuid': str(employee.uuid),
-                    'total_tips': float(total_tips),
-                    'transaction_count': Transaction.objects.filter(
-                        employee=employee,
-                        transaction_type='tip',
-                        status='completed'
-                    ).count()
-                })
+        if settings.STATISTICS_USE_ROLLUPS:
+            return PaymentService._organization_statistics_from_rollups(organization, employees, period, now)
 
-            employee_stats.sort(key=lambda x: x['total_tips'], reverse=True)
-            top_employees = employee_stats[:5]
+        completed_tips = Q(received_tips__transaction_type='tip', received_tips__status='completed')
 
-            total_all_time = sum(emp['total_tips'] for emp in employee_stats)
+        if period == 'all':
+            top_employees = employees.annotate(
+                total_tips=Coalesce(Sum('received_tips__amount', filter=completed_tips), Decimal(0)),
+                transaction_count=Count('received_tips', filter=completed_tips),
+            ).order_by('-total_tips').values('name', 'uuid', 'total_tips', 'transaction_count')[:5]
+
+            totals = Transaction.objects.filter(
+                employee__in=employees,
+                transaction_type='tip',
+                status='completed'
+            ).aggregate(total=Sum('amount'), count=Count('id'))
+            total_all_time = float(totals['total'] or 0)
 
             return {
                 'period': period,
                 'total_tips_period': total_all_time,
-                'tip_transactions_period': sum(emp['transaction_count'] for emp in employee_stats),
+                'tip_transactions_period': totals['count'],
                 'total_tips_today': 0,
                 'tip_transactions_today': 0,
                 'weekly_tips_trend': [{'date': now.date().isoformat(), 'amount': total_all_time}],
                 'total_employees': employees.count(),
-                'top_employees': top_employees
+                'top_employees': [
+                    {
+                        'employee__name': employee['name'],
+                        'employee__uuid': str(employee['uuid']),
+                        'total_tips': float(employee['total_tips']),
+                        'transaction_count': employee['transaction_count']
+                    }
+                    for employee in top_employees
+                ]
             }
 
-        if period == '24h':
-            start_date = now - timedelta(hours=24)
-        elif period == 'yesterday':
-            yesterday = now - timedelta(days=1)
-            start_date = yesterday.replace(hour=0, minute=0, second=0, microsecond=0)
-            end_date = yesterday.replace(hour=23, minute=59, second=59, microsecond=999999)
-        elif period == 'week':
-            start_date = now - timedelta(days=7)
-        elif period == 'month':
-            start_date = now - timedelta(days=30)
-        else:
-            start_date = now - timedelta(days=7)
-
+        start_date, end_date = PaymentService._period_window(period, now)
         transactions = Transaction.objects.filter(
             employee__in=employees,
             transaction_type='tip',
             status='completed'
         )
-
-        if start_date:
-            if period == 'yesterday':
-                transactions = transactions.filter(created_at__range=(start_date, end_date))
-            else:
-                transactions = transactions.filter(created_at__gte=start_date)
+        if end_date:
+            transactions = transactions.filter(created_at__range=(start_date, end_date))
+        else:
+            transactions = transactions.filter(created_at__gte=start_date)
 
         today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
         today_end = now.replace(hour=23, minute=59, second=59, microsecond=999999)
+        today = Q(created_at__range=(today_start, today_end))
 
-        today_stats = transactions.filter(
-            created_at__range=(today_start, today_end)
-        ).aggregate(
+        # Period and today in one pass
+        stats = transactions.aggregate(
             total_amount=Sum('amount'),
-            transaction_count=Count('id')
+            transaction_count=Count('id'),
+            today_amount=Sum('amount', filter=today),
+            today_count=Count('id', filter=today),
         )
 
-        weekly_trend = []
         if period == 'week':
+            daily = dict(
+                transactions.annotate(day=TruncDate('created_at'))
+                .values('day')
+                .annotate(total=Sum('amount'))
+                .values_list('day', 'total')
+            )
+            weekly_trend = []
             for i in range(6, -1, -1):
                 date = now.date() - timedelta(days=i)
-                day_start = timezone.make_aware(datetime.combine(date, datetime.min.time()))
-                day_end = timezone.make_aware(datetime.combine(date, datetime.max.time()))
-
-                day_amount = transactions.filter(
-                    created_at__range=(day_start, day_end)
-                ).aggregate(total=Sum('amount'))['total'] or 0
-
                 weekly_trend.append({
                     'date': date.isoformat(),
-                    'amount': float(day_amount)
+                    'amount': float(daily.get(date) or 0)
                 })
         else:
-            period_amount = transactions.aggregate(total=Sum('amount'))['total'] or 0
-            weekly_trend = [{'date': now.date().isoformat(), 'amount': float(period_amount)}]
+            weekly_trend = [{'date': now.date().isoformat(), 'amount': float(stats['total_amount'] or 0)}]
 
         top_employees_query = transactions.values(
             'employee__name', 'employee__uuid'
@@ -331,18 +389,109 @@ class PaymentService:
                 'transaction_count': emp['transaction_count']
             })
 
-        period_stats = transactions.aggregate(
-            total_amount=Sum('amount'),
-            transaction_count=Count('id')
-        )
-
         return {
             'period': period,
-            'total_tips_period': float(period_stats['total_amount'] or 0),
-            'tip_transactions_period': period_stats['transaction_count'] or 0,
-            'total_tips_today': float(today_stats['total_amount'] or 0),
-            'tip_transactions_today': today_stats['transaction_count'] or 0,
+            'total_tips_period': float(stats['total_amount'] or 0),
+            'tip_transactions_period': stats['transaction_count'] or 0,
+            'total_tips_today': float(stats['today_amount'] or 0),
+            'tip_transactions_today': stats['today_count'] or 0,
             'weekly_tips_trend': weekly_trend,
             'total_employees': employees.count(),
             'top_employees': top_employees
-        }
\ No newline at end of file
+        }
+
+    @staticmethod
+    def _period_window(period: str, now):
+        """(start, end) of a statistics period, end None meaning up to now; unknown periods are a week"""
+        if period == '24h':
+            return now - timedelta(hours=24), None
+        if period == 'yesterday':
+            yesterday = now - timedelta(days=1)
+            return (
+                yesterday.replace(hour=0, minute=0, second=0, microsecond=0),
+                yesterday.replace(hour=23, minute=59, second=59, microsecond=999999)
+            )
+        if period == 'month':
+            return now - timedelta(days=30), None
+        return now - timedelta(days=7), None
+
+    @staticmethod
+    def _organization_statistics_from_rollups(organization, employees, period, now):
+        """get_organization_statistics read from the daily TipRollup buckets, same structure"""
+        total_employees = employees.count()
+
+        if period == 'all':
+            top_employees = TipRollupService.top_employees(organization)
+            totals = TipRollupService.organization_buckets(organization).aggregate(
+                total=Sum('tip_amount'), count=Sum('tip_count')
+            )
+            if len(top_employees) < 5:
+                # employees without tips fill up the top like they did in the per-employee listing
+                ranked = {entry['employee__uuid'] for entry in top_employees}
+                for employee in employees.only('uuid', 'name')[:5 + len(ranked)]:
+                    if len(top_employees) == 5:
+                        break
+                    if employee.uuid not in ranked:
+                        top_employees.append({
+                            'employee__name': employee.name, 'employee__uuid': employee.uuid,
+                            'total_tips': 0, 'transaction_count': 0,
+                        })
+            total_all_time = float(totals['total'] or 0)
+
+            return {
+                'period': period,
+                'total_tips_period': total_all_time,
+                'tip_transactions_period': totals['count'] or 0,
+                'total_tips_today': 0,
+                'tip_transactions_today': 0,
+                'weekly_tips_trend': [{'date': now.date().isoformat(), 'amount': total_all_time}],
+                'total_employees': total_employees,
+                'top_employees': [
+                    {
+                        'employee__name': entry['employee__name'],
+                        'employee__uuid': str(entry['employee__uuid']),
+                        'total_tips': float(entry['total_tips']),
+                        'transaction_count': entry['transaction_count']
+                    }
+                    for entry in top_employees
+                ]
+            }
+
+        start_date, end_date = PaymentService._period_window(period, now)
+        period_stats = TipRollupService.organization_tips(organization, start_date, end_date)
+        if period == 'yesterday':
+            today_stats = {'total_amount': 0, 'transaction_count': 0}
+        else:
+            today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            today_stats = TipRollupService.organization_tips(organization, today_start)
+
+        if period == 'week':
+            first_day = now.date() - timedelta(days=6)
+            daily = TipRollupService.organization_daily(organization, first_day, now.date())
+            weekly_trend = [
+                {'date': day.isoformat(), 'amount': float(daily.get(day, 0))}
+                for day in (first_day + timedelta(days=i) for i in range(7))
+            ]
+        else:
+            weekly_trend = [{'date': now.date().isoformat(), 'amount': float(period_stats['total_amount'])}]
+
+        top_employees = [
+            {
+                'employee__name': entry['employee__name'],
+                'employee__uuid': entry['employee__uuid'],
+                'total_tips': float(entry['total_tips']),
+                'transaction_count': entry['transaction_count']
+            }
+            for entry in TipRollupService.top_employees(organization, start_date, end_date)
+        ]
+
+        return {
+            'period': period,
+            'total_tips_period': float(period_stats['total_amount']),
+            'tip_transactions_period': period_stats['transaction_count'],
+            'total_tips_today': float(today_stats['total_amount']),
+            'tip_transactions_today': today_stats['transaction_count'],
+            'weekly_tips_trend': weekly_trend,
+            'total_employees': total_employees,
+            'top_employees': top_employees
+        }
@@ -0,0 +1,118 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from auth_app.models import UserData
+
+CARD_KEY = "employee_card:{}"
+ORGANIZATION_CARD_KEY = "organization_card:{}"
+# marks an unknown uuid, in the local tier only (see the 'missing_card:' cache policy): scans of
+# a stale QR code do not reach the DB every time, and random uuids cannot fill the shared cache
+MISSING_KEY = "missing_card:{}"
+
+# the only UserData columns the public cards are built from
+CARD_FIELDS = ('uuid', 'name', 'phone_number', 'avatar_url', 'organization')
+ORGANIZATION_CARD_FIELDS = ('uuid', 'name', 'avatar', 'avatar_url')
+
+def _timeout():
+    return getattr(settings, 'EMPLOYEE_CARD_CACHE_TIMEOUT', 3600)
+
+
+def _etag(card: dict) -> str:
+    return hashlib.sha256(json.dumps(card, sort_keys=True).encode()).hexdigest()
+
+
+def _cached(key: str, build):
+    missing_key = MISSING_KEY.format(key)
+    if cache.get(missing_key):
+        return None
+
+    entry = cache.get(key)
+    if entry is None:
+        entry = build()
+        if entry is None:
+            cache.set(missing_key, True, _timeout())
+            return None
+        cache.set(key, entry, _timeout())
+    return entry
+
+
+def _invalidate(keys):
+    """Drops the entries once the current transaction commits"""
+    keys = keys + [MISSING_KEY.format(key) for key in keys]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class EmployeeCardCache:
+    """
+    Public card of an employee as shown on the tip form, cached per employee.
+
+    The entry holds the card, its ETag and the employee's organization id.
+    Receivers in user_profile/signals.py drop it when one of CARD_FIELDS changes,
+    when the employee is created or deleted, and after a bulk import.
+    """
+
+    @staticmethod
+    def get(employee_uuid):
+        """Returns {'card', 'etag', 'organization_id'} or None if there is no such employee"""
+        return _cached(CARD_KEY.format(employee_uuid), lambda: EmployeeCardCache.build(employee_uuid))
+
+    @staticmethod
+    def build(employee_uuid):
+        try:
+            employee = UserData.objects.only(*CARD_FIELDS).get(uuid=employee_uuid, user_type='employee')
+        except UserData.DoesNotExist:
+            return None
+
+        card = {
+            'uuid': str(employee.uuid),
+            'name': employee.name,
+            'phone_number': employee.phone_number,
+            'avatar_url': employee.avatar_url,
+        }
+        organization_id = str(employee.organization_id) if employee.organization_id else None
+        return {'card': card, 'etag': _etag(card), 'organization_id': organization_id}
+
+    @staticmethod
+    def invalidate(employee_uuids):
+        """Drops the cards once the current transaction commits"""
+        keys = [CARD_KEY.format(employee_uuid) for employee_uuid in employee_uuids]
+        if keys:
+            _invalidate(keys)
+
+
+class OrganizationCardCache:
+    """Name and avatar of an organization for the tip form, same lifecycle as EmployeeCardCache"""
+
+    @staticmethod
+    def get(organization_uuid):
+        """Returns {'card', 'etag'} or None if there is no such organization"""
+        return _cached(
+            ORGANIZATION_CARD_KEY.format(organization_uuid),
+            lambda: OrganizationCardCache.build(organization_uuid)
+        )
+
+    @staticmethod
+    def build(organization_uuid):
+        try:
+            organization = UserData.objects.only(*ORGANIZATION_CARD_FIELDS).get(
+                uuid=organization_uuid, user_type='organization'
+            )
+        except UserData.DoesNotExist:
+            return None
+
+        card = {
+            'uuid': str(organization.uuid),
+            'name': organization.name,
+            'avatar_url': organization.avatar_link,
+        }
+        return {'card': card, 'etag': _etag(card)}
+
+    @staticmethod
+    def invalidate(organization_uuids):
+        keys = [ORGANIZATION_CARD_KEY.format(organization_uuid) for organization_uuid in organization_uuids]
+        if keys:
+            _invalidate(keys)
@@ -0,0 +1,76 @@
+"""
+Content-addressed cache of rendered QR codes.
+
+A QR image depends only on its payload (the tip form URL) and the render
+parameters, so it is cached under the sha256 of both. The same digest is the
+strong ETag of the image: equal digests mean byte-identical images.
+"""
+import hashlib
+from importlib.metadata import PackageNotFoundError, version
+from io import BytesIO
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+from django.core.cache import cache
+
+CACHE_KEY = "qr:{}"
+
+FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+RENDER_PARAMS = {
+    'version': 1,
+    'error_correction': qrcode.constants.ERROR_CORRECT_L,
+    'box_size': 10,
+    'border': 4,
+}
+
+try:
+    _RENDERER_VERSION = version('qrcode')
+except PackageNotFoundError:
+    _RENDERER_VERSION = 'unknown'
+
+
+def payment_url(employee_uuid: str) -> str:
+    FRONTEND_URL = getattr(settings, "FRONTEND_URL", "http://194.87.202.132:3000/")
+    return f"{FRONTEND_URL}/tip-form/?employee_id={employee_uuid}"
+
+
+def render_qr(payload: str, fmt: str = 'png') -> bytes:
+    """Renders the QR code without any caching"""
+    qr = qrcode.QRCode(**RENDER_PARAMS)
+    qr.add_data(payload)
+    qr.make(fit=True)
+
+    if fmt == 'svg':
+        img = qr.make_image(image_factory=qrcode.image.svg.SvgPathImage)
+        buffer = BytesIO()
+        img.save(buffer)
+    else:
+        img = qr.make_image(fill_color="black", back_color="white")
+        buffer = BytesIO()
+        img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def qr_digest(payload: str, fmt: str = 'png') -> str:
+    params = ','.join(f'{name}={value}' for name, value in sorted(RENDER_PARAMS.items()))
+    return hashlib.sha256(f"{_RENDERER_VERSION}|{fmt}|{params}|{payload}".encode()).hexdigest()
+
+
+class QRCodeCache:
+    @staticmethod
+    def get(payload: str, fmt: str = 'png') -> tuple[bytes, str]:
+        """Returns (image bytes, digest), rendering only on a cache miss"""
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported QR format '{fmt}'")
+
+        digest = qr_digest(payload, fmt)
+        image = cache.get(CACHE_KEY.format(digest))
+        if image is None:
+            image = render_qr(payload, fmt)
+            cache.set(CACHE_KEY.format(digest), image, getattr(settings, 'QR_CODE_CACHE_TIMEOUT', 30 * 86400))
+        return image, digest
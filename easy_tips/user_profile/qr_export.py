@@ -0,0 +1,204 @@
+"""
+Organization-wide QR code export as a streamed ZIP or multi-page PDF.
+
+Codes are rendered by PaymentService.generate_employee_qr_code in a process
+pool (spawned workers that set up Django themselves, so they use the same QR
+cache). At most QR_EXPORT_WINDOW codes are in flight and every finished one is
+written to the response straight away: memory stays flat whatever the size of
+the organization and the download starts with the first code.
+"""
+import logging
+import threading
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from multiprocessing import get_context
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def render_export_item(employee_uuid: str, kind: str):
+    """
+    Runs in a pool worker. kind 'png'/'svg' returns the image file, 'pdf' returns
+    (width, height, Flate-compressed 1-bit pixels) ready to be embedded as a PDF image.
+    """
+    from PIL import Image
+    from .payment_service import PaymentService
+
+    if kind != 'pdf':
+        return PaymentService.generate_employee_qr_code(employee_uuid, kind, data_uri=False)['image']
+
+    png = PaymentService.generate_employee_qr_code(employee_uuid, 'png', data_uri=False)['image']
+    image = Image.open(BytesIO(png)).convert('1')
+    return image.width, image.height, zlib.compress(image.tobytes())
+
+
+def get_pool():
+    global _pool
+    workers = getattr(settings, 'QR_EXPORT_WORKERS', 2)
+    if not workers:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=get_context('spawn'), initializer=_init_worker
+            )
+        return _pool
+
+
+def render_in_order(employees, kind: str):
+    """Yields (uuid, name, rendered item) in the order of employees, a bounded window rendering ahead"""
+    pool = get_pool()
+    if pool is None:
+        for employee_uuid, name in employees:
+            yield employee_uuid, name, render_export_item(str(employee_uuid), kind)
+        return
+
+    window = getattr(settings, 'QR_EXPORT_WINDOW', 32)
+    in_flight = deque()
+    for employee_uuid, name in employees:
+        in_flight.append((employee_uuid, name, pool.submit(render_export_item, str(employee_uuid), kind)))
+        if len(in_flight) >= window:
+            employee_uuid, name, future = in_flight.popleft()
+            yield employee_uuid, name, future.result()
+    while in_flight:
+        employee_uuid, name, future = in_flight.popleft()
+        yield employee_uuid, name, future.result()
+
+
+class _ChunkSink:
+    """Write-only file object for zipfile: collects the bytes written since the last drain()"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(employees, image_format: str = 'png'):
+    """ZIP of <name>_<uuid>.<format> files, yielded file by file"""
+    sink = _ChunkSink()
+    # PNG is already compressed, SVG text is not
+    compression = zipfile.ZIP_STORED if image_format == 'png' else zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(sink, mode='w', compression=compression) as archive:
+        for employee_uuid, name, image in render_in_order(employees, image_format):
+            archive.writestr(f"{_file_stem(name, employee_uuid)}.{image_format}", image)
+            yield sink.drain()
+    yield sink.drain()
+
+
+# A6 portrait in points, one employee per page
+PAGE_WIDTH, PAGE_HEIGHT = 298, 420
+QR_SIZE = 230
+
+_CYRILLIC = dict(zip(
+    'абвгдеёжзийклмнопрстуфхцчшщъыьэюя',
+    ['a', 'b', 'v', 'g', 'd', 'e', 'e', 'zh', 'z', 'i', 'y', 'k', 'l', 'm', 'n', 'o', 'p', 'r', 's', 't',
+     'u', 'f', 'kh', 'ts', 'ch', 'sh', 'shch', '', 'y', '', 'e', 'yu', 'ya']
+))
+
+
+def _pdf_text(value: str) -> str:
+    """Caption for the built-in Helvetica font: Cyrillic transliterated, other non-Latin-1 dropped"""
+    letters = []
+    for char in value or '':
+        lower = char.lower()
+        if lower in _CYRILLIC:
+            latin = _CYRILLIC[lower]
+            letters.append(latin.capitalize() if char != lower else latin)
+        else:
+            letters.append(char)
+    text = ''.join(letters).encode('latin-1', 'ignore').decode('latin-1')
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def stream_pdf(employees, title: str = ''):
+    """Print-ready PDF, one A6 page per employee with the QR code and the name, yielded page by page"""
+    offsets = {}
+    position = 0
+    next_object = 4  # 1 catalog, 2 page tree, 3 font
+    page_objects = []
+
+    def emit(number, body: bytes) -> bytes:
+        nonlocal position
+        offsets[number] = position
+        data = f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+        position += len(data)
+        return data
+
+    header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+    position = len(header)
+    yield header + emit(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    for employee_uuid, name, (width, height, pixels) in render_in_order(employees, 'pdf'):
+        page, content, image = next_object, next_object + 1, next_object + 2
+        next_object += 3
+        page_objects.append(page)
+
+        x = (PAGE_WIDTH - QR_SIZE) / 2
+        y = PAGE_HEIGHT - QR_SIZE - 50
+        caption = _pdf_text(name or str(employee_uuid))
+        # roughly centered: Helvetica averages about half an em per character
+        caption_x = max(10, PAGE_WIDTH / 2 - len(caption) * 4)
+        drawing = (
+            f"q {QR_SIZE} 0 0 {QR_SIZE} {x:.1f} {y:.1f} cm /QR Do Q\n"
+            f"BT /F1 16 Tf {caption_x:.1f} {y - 30:.1f} Td ({caption}) Tj ET\n"
+            f"BT /F1 9 Tf 20 30 Td ({_pdf_text(title)}) Tj ET\n"
+        ).encode('latin-1')
+
+        yield b"".join([
+            emit(page, (
+                f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                f"/Resources << /Font << /F1 3 0 R >> /XObject << /QR {image} 0 R >> >> "
+                f"/Contents {content} 0 R >>"
+            ).encode()),
+            emit(content, f"<< /Length {len(drawing)} >>\nstream\n".encode() + drawing + b"\nendstream"),
+            emit(image, (
+                f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                f"/ColorSpace /DeviceGray /BitsPerComponent 1 /Filter /FlateDecode /Length {len(pixels)} >>\n"
+                f"stream\n"
+            ).encode() + pixels + b"\nendstream"),
+        ])
+
+    kids = ' '.join(f"{number} 0 R" for number in page_objects)
+    tail = emit(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_objects)} >>".encode())
+    tail += emit(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+    xref_at = position
+    xref = [f"xref\n0 {next_object}\n", "0000000000 65535 f \n"]
+    for number in range(1, next_object):
+        xref.append(f"{offsets[number]:010d} 00000 n \n")
+    xref.append(f"trailer\n<< /Size {next_object} /Root 1 0 R >>\nstartxref\n{xref_at}\n%%EOF\n")
+    yield tail + ''.join(xref).encode()
+
+
+def _file_stem(name, employee_uuid) -> str:
+    safe = ''.join(char if char.isalnum() or char in '-_' else '_' for char in (name or '').strip())
+    return f"{safe}_{employee_uuid}" if safe else str(employee_uuid)
@@ -0,0 +1,255 @@
+"""
+Daily tip rollups.
+
+Every completed tip and payout is added to its employee's TipRollup bucket in
+the same database transaction that completes it, so statistics read one row
+per employee and day instead of every transaction. Days are local dates
+(TIME_ZONE), the same as TruncDate in the backfill.
+
+Organization figures are the sums of the buckets of the organization's current
+employees, the same definition as the raw statistics and the edge-day queries:
+an employee who moves takes their tips to the new organization.
+
+Windows that do not start or end on a day boundary (the rolling '24h', 'week',
+'month' periods) are answered from the full days in the rollups plus the raw
+rows of the partial edge days.
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction as db_transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from auth_app.models import UserData
+from .models import TipRollup, Transaction
+
+COUNTERS = ['tip_count', 'tip_amount', 'rating_sum', 'rating_count', 'payout_count', 'payout_amount']
+
+
+def local_day(moment) -> date:
+    return timezone.localdate(moment)
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def day_end(day):
+    return timezone.make_aware(datetime.combine(day, time.max))
+
+
+class TipRollupService:
+    @staticmethod
+    def record(tx: Transaction):
+        """Adds a completed transaction to its bucket; call inside the transaction that completed it"""
+        if tx.transaction_type == 'tip':
+            if tx.employee_id is None:
+                return
+            deltas = {'tip_count': 1, 'tip_amount': tx.amount}
+            if tx.employee_rating is not None:
+                deltas.update(rating_sum=tx.employee_rating, rating_count=1)
+            owner_id = tx.employee_id
+        elif tx.transaction_type == 'payout':
+            deltas = {'payout_count': 1, 'payout_amount': tx.amount}
+            owner_id = tx.user_id
+        else:
+            return
+
+        TipRollupService._add('employee', owner_id, local_day(tx.created_at), deltas)
+
+    @staticmethod
+    def _add(scope, owner_id, day, deltas):
+        bucket = TipRollup.objects.filter(scope=scope, owner_id=owner_id, day=day)
+        increments = {field: F(field) + value for field, value in deltas.items()}
+        if bucket.update(**increments):
+            return
+        try:
+            with db_transaction.atomic():
+                TipRollup.objects.create(scope=scope, owner_id=owner_id, day=day, **deltas)
+        except IntegrityError:
+            # created concurrently by another transaction
+            bucket.update(**increments)
+
+    # --- rebuilding -------------------------------------------------------
+
+    @staticmethod
+    def compute(start_day=None, end_day=None) -> dict:
+        """{(scope, owner uuid, day): counters} recomputed from the raw transactions"""
+        completed = Transaction.objects.filter(status='completed')
+        if start_day:
+            completed = completed.filter(created_at__gte=day_start(start_day))
+        if end_day:
+            completed = completed.filter(created_at__lte=day_end(end_day))
+
+        tips = completed.filter(transaction_type='tip', employee__isnull=False).annotate(
+            day=TruncDate('created_at')
+        )
+        tip_aggregates = dict(
+            tip_count=Count('id'),
+            tip_amount=Sum('amount'),
+            rating_sum=Sum('employee_rating'),
+            rating_count=Count('employee_rating'),
+        )
+        payouts = completed.filter(transaction_type='payout').annotate(day=TruncDate('created_at'))
+
+        buckets = {}
+
+        def add(key, row):
+            bucket = buckets.setdefault(key, dict.fromkeys(COUNTERS, 0))
+            for field in COUNTERS:
+                if row.get(field):
+                    bucket[field] += row[field]
+
+        for row in tips.values('employee', 'day').annotate(**tip_aggregates):
+            add(('employee', row['employee'], row['day']), row)
+        for row in payouts.values('user', 'day').annotate(payout_count=Count('id'), payout_amount=Sum('amount')):
+            add(('employee', row['user'], row['day']), row)
+        return buckets
+
+    @staticmethod
+    def stored(start_day=None, end_day=None) -> dict:
+        rollups = TipRollup.objects.all()
+        if start_day:
+            rollups = rollups.filter(day__gte=start_day)
+        if end_day:
+            rollups = rollups.filter(day__lte=end_day)
+        return {
+            (row['scope'], row['owner'], row['day']): {field: row[field] for field in COUNTERS}
+            for row in rollups.values('scope', 'owner', 'day', *COUNTERS)
+        }
+
+    @staticmethod
+    def rebuild(start_day=None, end_day=None, batch_size=1000) -> int:
+        """
+        Replaces the buckets of the day range with freshly computed ones.
+
+        The rollup table is locked against writes before computing: a transaction
+        completed meanwhile waits in record() and is added on top of the new buckets
+        instead of being missed between the computation and the replacement.
+        """
+        with db_transaction.atomic():
+            TipRollupService._lock()
+            buckets = TipRollupService.compute(start_day, end_day)
+            stale = TipRollup.objects.all()
+            if start_day:
+                stale = stale.filter(day__gte=start_day)
+            if end_day:
+                stale = stale.filter(day__lte=end_day)
+            stale.delete()
+            TipRollup.objects.bulk_create([
+                TipRollup(scope=scope, owner_id=owner_id, day=day, **counters)
+                for (scope, owner_id, day), counters in buckets.items()
+            ], batch_size=batch_size)
+        return len(buckets)
+
+    @staticmethod
+    def _lock():
+        """Blocks record() until the current transaction ends (other databases serialize writers anyway)"""
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {TipRollup._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')
+
+    # --- reading ----------------------------------------------------------
+
+    @staticmethod
+    def split_window(start, end=None):
+        """
+        Splits [start, end] (end None = now) into a range of whole days, or None,
+        and the raw (from, to) intervals of the partial days at the edges.
+        """
+        end_is_now = end is None
+        end = end or timezone.now()
+        first_day, last_day = local_day(start), local_day(end)
+        partial = []
+
+        if start != day_start(first_day):
+            if first_day == last_day:
+                return None, [(start, end)]
+            partial.append((start, day_end(first_day)))
+            first_day += timedelta(days=1)
+        # today's bucket already holds everything up to now
+        if not end_is_now and end < day_end(last_day):
+            partial.append((day_start(last_day), end))
+            last_day -= timedelta(days=1)
+
+        days = (first_day, last_day) if first_day <= last_day else None
+        return days, partial
+
+    @staticmethod
+    def organization_tips(organization: UserData, start, end=None) -> dict:
+        """{'total_amount', 'transaction_count'} of the organization's completed tips in the window"""
+        days, partial = TipRollupService.split_window(start, end)
+        total, count = Decimal(0), 0
+
+        if days:
+            row = TipRollupService.organization_buckets(organization).filter(day__range=days).aggregate(
+                total=Sum('tip_amount'), count=Sum('tip_count')
+            )
+            total += row['total'] or 0
+            count += row['count'] or 0
+        for window in partial:
+            row = TipRollupService._raw_tips(organization).filter(created_at__range=window).aggregate(
+                total=Sum('amount'), count=Count('id')
+            )
+            total += row['total'] or 0
+            count += row['count']
+        return {'total_amount': total, 'transaction_count': count}
+
+    @staticmethod
+    def organization_daily(organization: UserData, first_day, last_day) -> dict:
+        """{day: tips amount} from the organization buckets"""
+        return dict(
+            TipRollupService.organization_buckets(organization).filter(
+                day__range=(first_day, last_day)
+            ).values('day').annotate(total=Sum('tip_amount')).values_list('day', 'total')
+        )
+
+    @staticmethod
+    def top_employees(organization: UserData, start=None, end=None, limit=5) -> list:
+        """Employees of the organization by tips received in the window (start None = all time)"""
+        totals = {}
+
+        def add(employee_uuid, name, amount, count):
+            entry = totals.setdefault(employee_uuid, {
+                'employee__name': name, 'employee__uuid': employee_uuid,
+                'total_tips': Decimal(0), 'transaction_count': 0,
+            })
+            entry['total_tips'] += amount or 0
+            entry['transaction_count'] += count or 0
+
+        rollups = TipRollupService.organization_buckets(organization).filter(tip_count__gt=0)
+        partial = []
+        if start is not None:
+            days, partial = TipRollupService.split_window(start, end)
+            rollups = rollups.filter(day__range=days) if days else rollups.none()
+
+        for row in rollups.values('owner', 'owner__name').annotate(
+            total=Sum('tip_amount'), count=Sum('tip_count')
+        ):
+            add(row['owner'], row['owner__name'], row['total'], row['count'])
+        for window in partial:
+            for row in TipRollupService._raw_tips(organization).filter(created_at__range=window).values(
+                'employee', 'employee__name'
+            ).annotate(total=Sum('amount'), count=Count('id')):
+                add(row['employee'], row['employee__name'], row['total'], row['count'])
+
+        ranked = sorted(totals.values(), key=lambda entry: entry['total_tips'], reverse=True)
+        return ranked[:limit]
+
+    @staticmethod
+    def organization_buckets(organization: UserData):
+        """Buckets of the organization's current employees"""
+        return TipRollup.objects.filter(
+            scope='employee', owner__organization=organization, owner__user_type='employee'
+        )
+
+    @staticmethod
+    def _raw_tips(organization: UserData):
+        return Transaction.objects.filter(
+            employee__organization=organization,
+            employee__user_type='employee',
+            transaction_type='tip',
+            status='completed'
+        )
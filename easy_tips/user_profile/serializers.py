@@ -14,7 +14,6 @@ class TransactionSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'transaction_type', 'transaction_type_display', 'amount',
             'status', 'employee_rating', 'comment', 'payment_method',
-            'created_at', 'created_at_formatted'
             'created_at', 'created_at_formatted', 'employee_name', 'guest_session_id']
 
     def get_created_at_formatted(self, obj):
@@ -23,13 +22,14 @@ class TransactionSerializer(serializers.ModelSerializer):
     def get_transaction_type_display(self, obj):
         return dict(Transaction.TRANSACTION_TYPES).get(obj.transaction_type, obj.transaction_type)
 
+    def get_employee_name(self, obj):
+        return obj.employee.name if obj.employee else None
+
 class TipPaymentSerializer(serializers.Serializer):
     amount = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('1.00'))
     employee_rating = serializers.IntegerField(min_value=1, max_value=5, required=False)
     comment = serializers.CharField(required=False, allow_blank=True)
     payment_method = serializers.ChoiceField(choices=['card', 'phone'])
-    def get_employee_name(self, obj):
-        return obj.employee.name if obj.employee else None
 
 
 class GuestTipPaymentSerializer(serializers.Serializer):
@@ -0,0 +1,34 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from auth_app.models import UserData
+from auth_app.signals import employees_added
+from .public_cards import CARD_FIELDS, ORGANIZATION_CARD_FIELDS, EmployeeCardCache, OrganizationCardCache
+from .stats_cache import OrganizationStatsCache
+
+
+@receiver(employees_added)
+def invalidate_organization_statistics(sender, employees, **kwargs):
+    OrganizationStatsCache.bump(sender.uuid)
+
+
+@receiver(employees_added)
+def invalidate_imported_cards(sender, employees, **kwargs):
+    # the bulk import updates names with bulk_update, which sends no post_save
+    EmployeeCardCache.invalidate([employee.uuid for employee in employees])
+
+
+@receiver(post_save, sender=UserData)
+def invalidate_public_cards(sender, instance, update_fields=None, **kwargs):
+    # balance and profile-flag saves are by far the most frequent ones and leave the cards as they are
+    if update_fields is not None \
+            and not set(update_fields) & {*CARD_FIELDS, *ORGANIZATION_CARD_FIELDS, 'user_type'}:
+        return
+    EmployeeCardCache.invalidate([instance.uuid])
+    OrganizationCardCache.invalidate([instance.uuid])
+
+
+@receiver(post_delete, sender=UserData)
+def drop_public_cards(sender, instance, **kwargs):
+    EmployeeCardCache.invalidate([instance.uuid])
+    OrganizationCardCache.invalidate([instance.uuid])
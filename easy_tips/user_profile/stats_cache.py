@@ -0,0 +1,57 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = "org_stats_version:{}"
+ENTRY_KEY = "org_stats:{}:{}:{}"
+
+
+def _timeout():
+    return getattr(settings, 'ORGANIZATION_STATS_CACHE_TIMEOUT', 60)
+
+
+class OrganizationStatsCache:
+    """
+    Cached get_organization_statistics results per (organization, period).
+
+    Entry keys carry the organization's version number, so bumping the version
+    (a tip completed for one of its employees, an employee added) makes every
+    period miss at once without deleting anything. The short TTL lets the rolling
+    '24h' and 'week' windows move forward when nothing happens.
+    """
+
+    @staticmethod
+    def version(organization_id) -> int:
+        key = VERSION_KEY.format(organization_id)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, 1, None)
+            version = cache.get(key, 1)
+        return version
+
+    @staticmethod
+    def bump(organization_id):
+        """Invalidates the organization's entries once the current transaction commits"""
+        transaction.on_commit(lambda: OrganizationStatsCache._bump(organization_id))
+
+    @staticmethod
+    def _bump(organization_id):
+        key = VERSION_KEY.format(organization_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 2, None)
+
+    @staticmethod
+    def get_or_compute(organization_id, period: str, compute):
+        """Returns (statistics, cached, age in seconds)"""
+        key = ENTRY_KEY.format(organization_id, period, OrganizationStatsCache.version(organization_id))
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['statistics'], True, time.time() - entry['computed_at']
+
+        statistics = compute()
+        cache.set(key, {'statistics': statistics, 'computed_at': time.time()}, _timeout())
+        return statistics, False, 0.0
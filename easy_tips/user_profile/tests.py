@@ -1,3 +1,385 @@
-from django.test import TestCase
+import random
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from auth_app.models import Session, UserData
+from auth_app.services import AuthService
+from .balances import BalanceLedger
+from .models import TipRollup, Transaction
+from .payment_service import PaymentService
+from .qr_codes import CACHE_KEY as QR_CACHE_KEY
+from .rollups import TipRollupService, day_end, day_start
+from .webhooks import handle_event
+
+
+class SnapshotSaveTests(TestCase):
+    """
+    request.user is a cached snapshot of the row. Profile updates made through it keep
+    a credit booked after the snapshot was taken (TestCase never runs the on_commit
+    invalidation, so the snapshot stays stale as it does on another worker).
+    """
+
+    def credit_after_snapshot(self, user, session):
+        self.client.cookies['session_id'] = str(session.uuid)
+        self.client.get('/api/auth/profile-status/')
+        BalanceLedger.credit(user.uuid, Decimal('25.00'), 'tip')
+
+    def test_profile_update_keeps_concurrent_credit(self):
+        employee = UserData.objects.create(user_type='employee', phone_number='+79990000001', name='Employee')
+        self.credit_after_snapshot(employee, AuthService.create_employee_session(employee))
+
+        response = self.client.put('/api/profile/', {'name': 'Renamed'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        employee.refresh_from_db()
+        self.assertEqual(employee.name, 'Renamed')
+        self.assertEqual(employee.balance, Decimal('25.00'))
+
+    def test_organization_update_keeps_concurrent_credit(self):
+        organization = UserData.objects.create(user_type='organization', login='snapshot-org', name='Organization')
+        self.credit_after_snapshot(organization, AuthService.create_organization_session(organization))
+
+        response = self.client.patch(
+            '/api/auth/organization/profile-update/', {'description': 'Cafe'}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        organization.refresh_from_db()
+        self.assertEqual(organization.description, 'Cafe')
+        self.assertEqual(organization.balance, Decimal('25.00'))
+
+
+class EmployeeQRCodeTests(TestCase):
+    """A matching If-None-Match is answered from the digest, without fetching or rendering the image"""
+
+    def setUp(self):
+        cache.clear()
+        self.employee = UserData.objects.create(user_type='employee', phone_number='+79990000002', name='Employee')
+        self.client.cookies['session_id'] = str(AuthService.create_employee_session(self.employee).uuid)
+
+    def assertRevalidates(self, params):
+        response = self.client.get('/api/profile/employee/qr-code/', params)
+        self.assertEqual(response.status_code, 200)
+        cache.clear()
+
+        response = self.client.get('/api/profile/employee/qr-code/', params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        digest = PaymentService.employee_qr_digest(str(self.employee.uuid), params.get('as', 'png'))
+        self.assertIsNone(cache.get(QR_CACHE_KEY.format(digest)))
+
+    def test_image(self):
+        self.assertRevalidates({'as': 'svg'})
+
+    def test_json(self):
+        self.assertRevalidates({})
+
+
+def place_tip(employee, at, status='completed', amount=10, rating=None, **fields):
+    """A tip created at `at` (auto_now_add ignores created_at on create)"""
+    tip = Transaction.objects.create(
+        user=employee, employee=employee, transaction_type='tip', status=status,
+        amount=Decimal(amount), employee_rating=rating, **fields
+    )
+    Transaction.objects.filter(pk=tip.pk).update(created_at=at)
+    tip.created_at = at
+    return tip
+
+
+class RollupStatisticsTests(TestCase):
+    """Organization statistics read from the rollups equal the ones computed from the transactions"""
+    PERIODS = ['all', '24h', 'yesterday', 'week', 'month']
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        today = timezone.localdate(now)
+        cls.organization = UserData.objects.create(user_type='organization', login='rollups', name='Organization')
+        cls.other_organization = UserData.objects.create(user_type='organization', login='rollups-2', name='Other')
+
+        def employee(name, organization, user_type='employee'):
+            return UserData.objects.create(user_type=user_type, name=name, organization=organization)
+
+        # three tipped employees and two without tips: the 'all' top five is padded with the latter
+        tipped = [employee(f'Employee {i}', cls.organization) for i in range(3)]
+        for i in range(2):
+            employee(f'Idle {i}', cls.organization)
+        # moves to the other organization after being tipped, and takes the tips along
+        mover = employee('Mover', cls.organization)
+        # still linked to the organization but no longer an employee: counted nowhere
+        former = employee('Former', cls.organization, user_type='guest')
+
+        rng = random.Random(16)
+        moments = []
+        for days_ago in range(40):
+            day = today - timedelta(days=days_ago)
+            moments += [day_start(day), day_start(day) + timedelta(hours=12), day_end(day)]
+        # just inside and just outside the rolling windows
+        for window in (timedelta(hours=24), timedelta(days=7), timedelta(days=30)):
+            moments += [now - window + timedelta(minutes=1), now - window - timedelta(minutes=1)]
+        moments.append(now - timedelta(seconds=1))
+
+        statuses = ['completed', 'pending', 'completed', 'failed']
+        for index, at in enumerate(moment for moment in moments if moment < now):
+            for offset, tipped_employee in enumerate((*tipped, mover, former)):
+                place_tip(
+                    tipped_employee, at, amount=rng.randint(1, 50), rating=rng.choice([None, 1, 5]),
+                    status=statuses[(index + offset) % len(statuses)]
+                )
+        # payouts are not tips
+        Transaction.objects.create(user=tipped[0], transaction_type='payout', status='completed', amount=5)
+
+        UserData.objects.filter(pk=mover.pk).update(organization=cls.other_organization)
+        TipRollupService.rebuild()
+
+    def statistics(self, organization, period, use_rollups):
+        with override_settings(STATISTICS_USE_ROLLUPS=use_rollups):
+            stats = PaymentService.get_organization_statistics(str(organization.uuid), period)
+        for entry in stats['top_employees']:
+            entry['employee__uuid'] = str(entry['employee__uuid'])
+        # employees with equal totals may come in either order
+        stats['top_employees'].sort(key=lambda entry: (-entry['total_tips'], entry['employee__uuid']))
+        return stats
+
+    def test_rollups_match_transactions_for_every_period(self):
+        for organization in (self.organization, self.other_organization):
+            for period in self.PERIODS:
+                with self.subTest(organization=organization.login, period=period):
+                    raw = self.statistics(organization, period, use_rollups=False)
+                    self.assertEqual(self.statistics(organization, period, use_rollups=True), raw)
+                    self.assertTrue(raw['tip_transactions_period'])
+
+    def test_all_time_top_is_padded_with_idle_employees(self):
+        top = self.statistics(self.organization, 'all', use_rollups=True)['top_employees']
+        self.assertEqual(len(top), 5)
+        self.assertEqual(sorted(entry['employee__name'] for entry in top if not entry['transaction_count']),
+                         ['Idle 0', 'Idle 1'])
+
+    def test_organization_buckets_are_the_current_employees(self):
+        owners = set(
+            TipRollupService.organization_buckets(self.organization).values_list('owner__name', flat=True)
+        )
+        self.assertEqual(owners, {'Employee 0', 'Employee 1', 'Employee 2'})
+        owners = set(
+            TipRollupService.organization_buckets(self.other_organization).values_list('owner__name', flat=True)
+        )
+        self.assertEqual(owners, {'Mover'})
+
+
+class SplitWindowTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.week_ago = self.today - timedelta(days=7)
+
+    def test_window_from_a_day_boundary_up_to_now(self):
+        self.assertEqual(
+            TipRollupService.split_window(day_start(self.week_ago)),
+            ((self.week_ago, self.today), [])
+        )
+
+    def test_partial_first_day(self):
+        start = day_start(self.week_ago) + timedelta(hours=5)
+        self.assertEqual(
+            TipRollupService.split_window(start),
+            ((self.week_ago + timedelta(days=1), self.today), [(start, day_end(self.week_ago))])
+        )
+
+    def test_partial_last_day(self):
+        end = day_start(self.today - timedelta(days=1)) + timedelta(hours=5)
+        self.assertEqual(
+            TipRollupService.split_window(day_start(self.week_ago), end),
+            ((self.week_ago, self.today - timedelta(days=2)), [(day_start(self.today - timedelta(days=1)), end)])
+        )
+
+    def test_window_ending_on_a_day_end_has_no_partial_day(self):
+        end = day_end(self.today - timedelta(days=1))
+        self.assertEqual(
+            TipRollupService.split_window(day_start(self.week_ago), end),
+            ((self.week_ago, self.today - timedelta(days=1)), [])
+        )
+
+    def test_window_within_one_day(self):
+        start = day_start(self.week_ago) + timedelta(hours=1)
+        end = start + timedelta(hours=2)
+        self.assertEqual(TipRollupService.split_window(start, end), (None, [(start, end)]))
+
+
+class RollupRecordTests(TestCase):
+    """Buckets kept up by record() equal the ones rebuild() computes, and check_tip_rollups agrees"""
+
+    def check(self):
+        call_command('check_tip_rollups', stdout=StringIO())
+
+    def test_record_matches_rebuild(self):
+        organization = UserData.objects.create(user_type='organization', login='record', name='Organization')
+        employees = [
+            UserData.objects.create(user_type='employee', name=f'Employee {i}', organization=organization)
+            for i in range(3)
+        ]
+        guest = UserData.objects.create(user_type='guest')
+        now = timezone.now()
+
+        for i in range(30):
+            employee = employees[i % 3]
+            tip = place_tip(
+                employee, now - timedelta(days=i % 10, hours=i % 5), status='pending',
+                amount=5 + i, rating=None if i % 4 else 4, stripe_payment_intent_id=f'pi_record_{i}'
+            )
+            Transaction.objects.filter(pk=tip.pk).update(user=guest)
+            if i % 3 != 2:
+                PaymentService.confirm_tip_payment(f'pi_record_{i}')
+        # a redelivered event is not counted twice
+        PaymentService.confirm_tip_payment('pi_record_0')
+        PaymentService.process_tip_payment(employees[0], Decimal('7'), 5)
+        PaymentService.process_withdrawal(employees[0], Decimal('3'), 'card', {})
+
+        recorded = TipRollupService.stored()
+        self.assertTrue(recorded)
+        self.check()
+
+        TipRollupService.rebuild()
+        self.assertEqual(TipRollupService.stored(), recorded)
+        self.check()
+
+    def test_check_reports_a_drifted_bucket(self):
+        employee = UserData.objects.create(user_type='employee', name='Employee')
+        PaymentService.process_tip_payment(employee, Decimal('7'), 5)
+        TipRollup.objects.filter(owner=employee).update(tip_count=2)
+
+        with self.assertRaises(CommandError):
+            self.check()
+
+
+# EXPLAIN checks need the PostgreSQL planner and are skipped on any other database; run them against
+# the docker-compose Postgres: docker compose run --rm web python manage.py test auth_app.tests user_profile.tests
+@skipUnless(connection.vendor == 'postgresql', "Index checks need the PostgreSQL planner")
+@override_settings(STATISTICS_USE_ROLLUPS=False)
+class TransactionIndexTests(TestCase):
+    """
+    EXPLAINs the Transaction queries the views and the webhook actually run, on a
+    seeded table, and checks that each one is answered from its index.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.organization = UserData.objects.create(user_type='organization', name='organization')
+        employees = UserData.objects.bulk_create([
+            UserData(user_type='employee', name=f'employee {i}', organization=cls.organization) for i in range(200)
+        ])
+        guests = UserData.objects.bulk_create([UserData(user_type='guest') for _ in range(200)])
+        cls.employee, cls.guest = employees[0], guests[0]
+
+        transactions = []
+        for i in range(50000):
+            employee = random.choice(employees)
+            payout = i % 10 == 0
+            transactions.append(Transaction(
+                user=employee if payout else random.choice(guests),
+                employee=employee,
+                transaction_type='payout' if payout else 'tip',
+                status='pending' if i % 7 == 0 else 'failed' if i % 11 == 0 else 'completed',
+                amount=random.randint(1, 50),
+                stripe_payment_intent_id=f'pi_{i}' if i % 2 == 0 else None,
+                stripe_checkout_session_id=f'cs_{i}' if i % 2 == 0 else None,
+            ))
+        created = Transaction.objects.bulk_create(transactions, batch_size=5000)
+
+        with connection.cursor() as cursor:
+            # spread created_at over a year (auto_now_add ignores the value passed to bulk_create)
+            cursor.execute(
+                "UPDATE user_profile_transaction SET created_at = now() - (random() * interval '365 days') "
+                "WHERE id = ANY(%s::uuid[])",
+                [[str(transaction.id) for transaction in created]]
+            )
+            cursor.execute('ANALYZE user_profile_transaction')
+
+        cls.sessions = {
+            user.user_type: Session.objects.create(
+                user_data=user, session_type=user.user_type, expires_at=now + timedelta(days=1)
+            )
+            for user in (cls.organization, cls.employee, cls.guest)
+        }
+
+    def login(self, user_type):
+        self.client.cookies['session_id'] = str(self.sessions[user_type].uuid)
+
+    def assertUsesIndex(self, run, *index_names):
+        """Every Transaction query run() makes is planned with one of index_names"""
+        with CaptureQueriesContext(connection) as context:
+            run()
+
+        plans = []
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or 'user_profile_transaction' not in sql:
+                    continue
+                cursor.execute('EXPLAIN ' + sql)
+                plans.append('\n'.join(row[0] for row in cursor.fetchall()))
+
+        self.assertTrue(plans, "No Transaction query was run")
+        for plan in plans:
+            self.assertNotIn('Seq Scan on user_profile_transaction', plan)
+            self.assertTrue(any(name in plan for name in index_names), plan)
+
+    def test_employee_history(self):
+        self.login('employee')
+        self.assertUsesIndex(
+            lambda: self.client.get('/api/profile/tips/history/', {'count': 'none'}),
+            'tx_employee_created_idx'
+        )
+
+    def test_employee_history_filtered(self):
+        self.login('employee')
+        self.assertUsesIndex(
+            lambda: self.client.get('/api/profile/tips/history/', {'type': 'payout', 'status': 'failed', 'count': 'none'}),
+            'tx_employee_type_status_idx', 'tx_employee_created_idx'
+        )
+
+    def test_guest_history(self):
+        self.login('guest')
+        self.assertUsesIndex(
+            lambda: self.client.get('/api/profile/tips/history/', {'count': 'none'}),
+            'tx_user_created_idx'
+        )
+
+    def test_transaction_statistics(self):
+        self.login('guest')
+        start_date = (timezone.now() - timedelta(days=30)).date().isoformat()
+        self.assertUsesIndex(
+            lambda: self.client.get('/api/profile/tips/statistics/', {'start_date': start_date}),
+            'tx_user_created_idx'
+        )
+
+    def test_organization_statistics(self):
+        self.login('organization')
+        self.assertUsesIndex(
+            lambda: self.client.get('/api/profile/organization/statistics/', {'period': 'week'}),
+            'tx_completed_tip_idx', 'tx_employee_type_status_idx', 'tx_employee_created_idx'
+        )
+
+    def test_tip_page_presets(self):
+        self.assertUsesIndex(
+            lambda: self.client.get(f'/api/profile/tip-page/{self.employee.uuid}/'),
+            'tx_completed_tip_idx', 'tx_employee_type_status_idx'
+        )
+
+    def test_webhook_payment_intent_lookup(self):
+        self.assertUsesIndex(lambda: PaymentService.is_payment_settled('pi_42'), 'tx_payment_intent_idx')
+
+    def test_webhook_checkout_session_lookup(self):
+        event = {
+            'id': 'evt_1',
+            'type': 'checkout.session.completed',
+            'data': {'object': {'id': 'cs_missing', 'payment_intent': None, 'metadata': {}}},
+        }
+        self.assertUsesIndex(lambda: handle_event(event, check_settled=False), 'tx_checkout_session_idx')
@@ -0,0 +1,81 @@
+"""
+Everything the guest tip page needs, in one response.
+
+The bootstrap is assembled from three cached parts with their own lifetimes:
+the employee card and the organization card (public_cards.py, dropped on
+profile changes) and the preset amounts (recomputed from recent tips once
+TIP_PRESETS_CACHE_TIMEOUT expires). No guest identity is involved: the guest
+is created lazily when the tip is submitted.
+"""
+import hashlib
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Transaction
+from .public_cards import EmployeeCardCache, OrganizationCardCache
+
+PRESETS_KEY = "tip_presets:{}"
+
+# percentiles of the employee's recent tips offered as buttons
+PRESET_PERCENTILES = (0.25, 0.5, 0.75)
+
+
+def _nice(amount: Decimal) -> Decimal:
+    """Rounds to a button-friendly amount: whole units below 10, fives below 100, tens above"""
+    step = Decimal(1) if amount < 10 else Decimal(5) if amount < 100 else Decimal(10)
+    return max(step, (amount / step).quantize(Decimal(1), rounding=ROUND_HALF_UP) * step)
+
+
+class TipPageService:
+    @staticmethod
+    def preset_amounts(employee_uuid) -> list:
+        """Suggested amounts from the employee's recent completed tips, TIP_PRESET_AMOUNTS until there are enough"""
+        key = PRESETS_KEY.format(employee_uuid)
+        presets = cache.get(key)
+        if presets is None:
+            presets = TipPageService.compute_presets(employee_uuid)
+            cache.set(key, presets, getattr(settings, 'TIP_PRESETS_CACHE_TIMEOUT', 3600))
+        return presets
+
+    @staticmethod
+    def compute_presets(employee_uuid) -> list:
+        defaults = [str(Decimal(amount)) for amount in settings.TIP_PRESET_AMOUNTS]
+        amounts = sorted(Transaction.objects.filter(
+            employee_id=employee_uuid,
+            transaction_type='tip',
+            status='completed'
+        ).order_by('-created_at').values_list('amount', flat=True)[:settings.TIP_PRESET_SAMPLE_SIZE])
+        if len(amounts) < settings.TIP_PRESET_MIN_SAMPLES:
+            return defaults
+
+        presets = sorted({_nice(amounts[int(percentile * (len(amounts) - 1))]) for percentile in PRESET_PERCENTILES})
+        if len(presets) < len(PRESET_PERCENTILES):
+            # the tips are too uniform to give distinct buttons
+            return defaults
+        return [str(amount) for amount in presets]
+
+    @staticmethod
+    def bootstrap(employee_uuid):
+        """Returns (payload, etag) or None if there is no such employee"""
+        employee = EmployeeCardCache.get(employee_uuid)
+        if employee is None:
+            return None
+
+        organization = None
+        if employee['organization_id']:
+            organization = OrganizationCardCache.get(employee['organization_id'])
+        presets = TipPageService.preset_amounts(employee_uuid)
+
+        payload = {
+            'employee': employee['card'],
+            'organization': organization['card'] if organization else None,
+            'preset_amounts': presets,
+            'currency': settings.DEFAULT_CURRENCY,
+        }
+        etag = hashlib.sha256('|'.join([
+            employee['etag'], organization['etag'] if organization else '', ','.join(presets),
+            settings.DEFAULT_CURRENCY
+        ]).encode()).hexdigest()
+        return payload, etag
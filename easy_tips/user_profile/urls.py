@@ -6,10 +6,12 @@ urlpatterns = [
     path('employee/qr-code/', views.get_employee_qr_code, name='get_employee_qr_code'),
     path('guest-tip/payment/', views.create_guest_tip_payment, name='create_guest_tip_payment'),
     path('employee/<uuid:employee_uuid>/info/', views.get_employee_info, name='get_employee_info'),
+    path('tip-page/<uuid:employee_uuid>/', views.tip_page, name='tip_page'),
     path('tips/withdraw/', views.withdraw_tips, name='withdraw_tips'),
     path('tips/balance/', views.get_balance, name='get_balance'),
     path('tips/history/', views.transaction_history, name='transaction_history'),
     path('tips/statistics/', views.transaction_statistics, name='transaction_statistics'),
     path('stripe/webhook/', views.stripe_webhook, name='stripe_webhook'),
     path('organization/statistics/', views.organization_statistics, name='organization_statistics'),
+    path('organization/qr-codes/export/', views.organization_qr_export, name='organization_qr_export'),
 ]
\ No newline at end of file
@@ -1,6 +1,9 @@
+import hashlib
+import uuid
+
 from django.conf import settings
-from django.db.models import Count, Sum, Q
-from django.db.models.functions import TruncMonth
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags, quote_etag
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
@@ -12,10 +15,16 @@ from datetime import datetime, timedelta
 
 from auth_app.authentication import SessionAuthentication
 from auth_app.models import UserData
+from auth_app.pagination import InvalidCursor, KeysetPaginator, approximate_count
 from auth_app.permissions import IsAuthenticatedUserData
 from auth_app.serializers import UserDataSerializer
+from auth_app.services import AuthService, set_session_cookie
+from . import qr_export
 from .models import Transaction
 from .payment_service import PaymentService
+from .public_cards import EmployeeCardCache
+from .qr_codes import FORMATS as QR_FORMATS
+from .stats_cache import OrganizationStatsCache
 from .serializers import (
     TipPaymentSerializer,
     WithdrawSerializer,
@@ -25,6 +34,10 @@ from .serializers import (
     GuestTipPaymentSerializer, OrganizationStatisticsSerializer
 )
 from .stripe_service import StripeService
+from .tip_page import TipPageService
+from .webhooks import StripeEventLog
+
+HISTORY_PAGINATOR = KeysetPaginator(ordering=('-created_at', '-id'))
 
 
 @api_view(['GET', 'PUT'])
@@ -41,8 +54,13 @@ def profile(request):
     elif request.method == 'PUT':
         serializer = UserDataSerializer(user_data, data=request.data, partial=True)
         if serializer.is_valid():
+            user_data, guest_session = AuthService.persist_guest(user_data)
+            serializer.instance = user_data
             serializer.save()
-            return Response(serializer.data)
+            response = Response(serializer.data)
+            if guest_session:
+                set_session_cookie(response, guest_session)
+            return response
         return Response(serializer.errors, status=400)
 
 
@@ -50,33 +68,73 @@ def profile(request):
 @authentication_classes([SessionAuthentication])
 @permission_classes([IsAuthenticatedUserData])
 def get_employee_qr_code(request):
-    """Returns a QR code for the employee that leads to the tip payment form"""
+    """
+    Returns a QR code for the employee that leads to the tip payment form.
+
+    ?as=png or ?as=svg returns the image itself instead of a base64 data URI in JSON.
+    Both carry an ETag and answer If-None-Match with 304.
+    """
     if request.user.user_type != 'employee':
         return Response(
             {'error': 'Only employees can generate tip QR codes'},
             status=status.HTTP_403_FORBIDDEN
         )
 
-    try:
-        qr_data = PaymentService.get_employee_qr_code(str(request.user.uuid))
-
-        serializer = EmployeeQRCodeSerializer({
-            'qr_code': qr_data['qr_code'],
-            'form_url': qr_data['payment_url']
-        })
+    raw_format = request.GET.get('as')
+    if raw_format and raw_format not in QR_FORMATS:
+        return Response({'error': f"Unsupported format '{raw_format}'"}, status=status.HTTP_400_BAD_REQUEST)
+
+    employee_uuid = str(request.user.uuid)
+    # the ETag is known from the digest alone: a 304 needs neither the image nor its base64 form
+    digest = PaymentService.employee_qr_digest(employee_uuid, raw_format or 'png')
+    if raw_format:
+        # the image only changes with FRONTEND_URL or the render parameters, the digest covers both
+        etag = quote_etag(digest)
+        cache_control = f"private, max-age={settings.QR_CODE_MAX_AGE}"
+    else:
+        etag = quote_etag(hashlib.sha256(
+            f"{digest}|{request.user.name}|{request.user.phone_number}".encode()
+        ).hexdigest())
+        cache_control = "private, no-cache"
 
-        return Response({
-            'success': True,
-            'employee': {
-                'uuid': str(request.user.uuid),
-                'name': request.user.name,
-                'phone_number': request.user.phone_number
-            },
-            'qr_data': serializer.data
-        })
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        try:
+            qr_data = PaymentService.get_employee_qr_code(employee_uuid, raw_format or 'png', data_uri=not raw_format)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if raw_format:
+            response = HttpResponse(qr_data['image'], content_type=qr_data['content_type'])
+        else:
+            serializer = EmployeeQRCodeSerializer({
+                'qr_code': qr_data['qr_code'],
+                'form_url': qr_data['payment_url']
+            })
+
+            response = Response({
+                'success': True,
+                'employee': {
+                    'uuid': employee_uuid,
+                    'name': request.user.name,
+                    'phone_number': request.user.phone_number
+                },
+                'qr_data': serializer.data
+            })
+
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def etag_matches(request, etag: str) -> bool:
+    """If-None-Match check, weak comparison as RFC 9110 prescribes for it"""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    candidates = parse_etags(header)
+    return '*' in candidates or etag.removeprefix('W/') in [tag.removeprefix('W/') for tag in candidates]
 
 
 @api_view(['POST'])
@@ -94,6 +152,12 @@ def create_guest_tip_payment(request):
         comment = serializer.validated_data.get('comment')
         guest_session_id = serializer.validated_data.get('guest_session_id')
 
+        # a guest straight from the tip page has no identity yet: it gets one only with this tip
+        guest = request.user
+        if not isinstance(guest, UserData) and not guest_session_id:
+            guest, _, _ = AuthService.create_lazy_guest()
+            guest_session_id = str(guest.uuid)
+
         result = PaymentService.create_guest_tip_payment(
             employee_uuid=employee_id,
             amount=amount,
@@ -102,16 +166,24 @@ def create_guest_tip_payment(request):
             guest_session_id=guest_session_id
         )
 
+        # A lazy guest becomes a real row only once it pays
+        guest_session = None
+        if guest_session_id and AuthService.is_lazy_guest(guest) and guest_session_id == str(guest.uuid):
+            _, guest_session = AuthService.persist_guest(guest)
+
         response_serializer = CheckoutSessionResponseSerializer({
             'session_id': result['session_id'],
             'url': result['url'],
             'transaction_id': result['transaction_id']
         })
 
-        return Response({
+        response = Response({
             'success': True,
             'checkout_data': response_serializer.data
         })
+        if guest_session:
+            set_session_cookie(response, guest_session)
+        return response
 
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -120,27 +192,66 @@ def create_guest_tip_payment(request):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_employee_info(request, employee_uuid):
-    """Returns employee information for the payment form (no auth required)"""
-    try:
-        employee = UserData.objects.get(uuid=employee_uuid, user_type='employee')
-        return Response({
+    """
+    Returns employee information for the payment form (no auth required).
+
+    Served from the cached public card with an ETag; the Cache-Control headers let
+    a CDN or reverse proxy answer repeated scans without reaching the application.
+    """
+    entry = EmployeeCardCache.get(employee_uuid)
+    if entry is None:
+        return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    etag = quote_etag(entry['etag'])
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = Response({
             'success': True,
-            'employee': {
-                'uuid': str(employee.uuid),
-                'name': employee.name,
-                'phone_number': employee.phone_number,
-                'avatar_url': employee.avatar_url
-            }
+            'employee': entry['card']
         })
-    except UserData.DoesNotExist:
+
+    response['ETag'] = etag
+    response['Cache-Control'] = (
+        f"public, max-age={settings.EMPLOYEE_CARD_MAX_AGE}, "
+        f"stale-while-revalidate={settings.EMPLOYEE_CARD_STALE_WHILE_REVALIDATE}"
+    )
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def tip_page(request, employee_uuid):
+    """
+    Bootstrap of the guest tip page: the employee card, the organization's name and
+    avatar and preset amounts, cached and public like get_employee_info.
+
+    No guest identity is needed: create_guest_tip_payment establishes it on submit.
+    """
+    bootstrap = TipPageService.bootstrap(employee_uuid)
+    if bootstrap is None:
         return Response({'error': 'Employee not found'}, status=status.HTTP_404_NOT_FOUND)
 
+    payload, etag = bootstrap
+    etag = quote_etag(etag)
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = Response({'success': True, **payload})
+
+    response['ETag'] = etag
+    response['Cache-Control'] = (
+        f"public, max-age={settings.EMPLOYEE_CARD_MAX_AGE}, "
+        f"stale-while-revalidate={settings.EMPLOYEE_CARD_STALE_WHILE_REVALIDATE}"
+    )
+    return response
+
 
 @api_view(['POST'])
 @csrf_exempt
 @permission_classes([AllowAny])
 def stripe_webhook(request):
-    """Handles Stripe webhooks"""
+    """Handles Stripe webhooks: verifies and stores the event, the worker in webhooks.py processes it"""
     payload = request.body
     sig_header = request.META.get('HTTP_STRIPE_SIGNATURE', '')
 
@@ -150,80 +261,10 @@ def stripe_webhook(request):
         print(f"❌ Webhook verification failed: {str(e)}")
         return Response({'error': str(e)}, status=400)
 
-    if event['type'] == 'payment_intent.succeeded':
-        payment_intent = event['data']['object']
-
-        transaction = PaymentService.confirm_tip_payment(payment_intent['id'])
-        if transaction:
-            print(f"✅ Transaction {transaction.id} confirmed successfully")
-        else:
-            print(f"❌ Failed to confirm transaction for payment intent {payment_intent['id']}")
-
-    elif event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-
-        try:
-            transaction = Transaction.objects.get(stripe_checkout_session_id=session['id'])
-            print(f"📄 Found transaction by checkout_session_id: {transaction.id}")
-
-            if session.get('payment_intent'):
-                transaction.stripe_payment_intent_id = session['payment_intent']
-                transaction.save(update_fields=['stripe_payment_intent_id'])
-                print(f"📝 Updated transaction {transaction.id} with payment_intent: {session['payment_intent']}")
-
-            transaction = PaymentService.confirm_tip_payment(session['payment_intent'])
-            if transaction:
-                print(f"✅ Transaction {transaction.id} confirmed from session")
-            else:
-                print(f"❌ Failed to confirm transaction from session {session['id']}")
-
-        except Transaction.DoesNotExist:
-            print(f"❌ Transaction not found for checkout_session_id {session['id']}")
-            metadata = session.get('metadata', {})
-            transaction_id = metadata.get('transaction_id')
-            if transaction_id:
-                try:
-                    transaction = Transaction.objects.get(id=transaction_id)
-                    print(f"📄 Found transaction by metadata transaction_id: {transaction.id}")
-
-                    transaction.stripe_checkout_session_id = session['id']
-                    if session.get('payment_intent'):
-                        transaction.stripe_payment_intent_id = session['payment_intent']
-                    transaction.save()
-
-                    if session.get('payment_intent'):
-                        transaction = PaymentService.confirm_tip_payment(session['payment_intent'])
-                        if transaction:
-                            print(f"✅ Transaction {transaction.id} confirmed from metadata")
-
-                except Transaction.DoesNotExist:
-                    print(f"❌ Transaction not found by metadata either: {transaction_id}")
-
-    elif event['type'] == 'charge.succeeded':
-        charge = event['data']['object']
-
-        if charge.get('payment_intent'):
-            transaction = PaymentService.confirm_tip_payment(charge['payment_intent'])
-            if transaction:
-                print(f"✅ Transaction {transaction.id} confirmed from charge")
-            else:
-                print(f"❌ Failed to confirm transaction from charge {charge['id']}")
-
-    elif event['type'] == 'payment_intent.payment_failed':
-        payment_intent = event['data']['object']
-        print(f"❌ Payment failed: {payment_intent['id']}")
-
-        try:
-            transaction = Transaction.objects.get(stripe_payment_intent_id=payment_intent['id'])
-            transaction.status = 'failed'
-            transaction.save(update_fields=['status'])
-            print(f"📝 Transaction {transaction.id} marked as failed")
-        except Transaction.DoesNotExist:
-            print(f"⚠️ Transaction not found for failed payment intent {payment_intent['id']}")
-
-    else:
-        print(f"ℹ️ Unhandled event type: {event['type']}")
-
+    # asynchronously the event is only stored and acknowledged, process_stripe_events applies it
+    outcome = StripeEventLog.receive(payload, process_now=not settings.STRIPE_WEBHOOK_ASYNC)
+    if outcome in ('duplicate', 'redundant'):
+        print(f"ℹ️ {outcome.capitalize()} event {event['id']} ({event['type']}) skipped")
     return Response({'success': True})
 
 
@@ -268,20 +309,82 @@ def get_balance(request):
     })
 
 
+def parse_date_param(value: str, end_of_day: bool = False):
+    """YYYY-MM-DD query parameter as an aware datetime (start or end of that day), ValueError if malformed"""
+    try:
+        date = timezone.make_aware(datetime.strptime(value, '%Y-%m-%d'))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD")
+    if end_of_day:
+        date = date.replace(hour=23, minute=59, second=59, microsecond=999999)
+    return date
+
+
 @api_view(['GET'])
 @authentication_classes([SessionAuthentication])
 @permission_classes([IsAuthenticatedUserData])
 def transaction_history(request):
-    """Transaction history"""
+    """
+    Transaction history, newest first.
+
+    Keyset-paginated by (created_at, id): pass the returned next_cursor as ?cursor=.
+    Filters: ?type=tip|payout, ?status=pending|completed|failed, ?start_date= / ?end_date= (YYYY-MM-DD);
+    ?page_size= up to 200. ?count=exact|approximate|none, by default the first page gets an
+    approximate total and the following pages none.
+    """
     if request.user.user_type == 'employee':
-        transactions = request.user.received_tips.all().order_by('-created_at')[:50]
+        transactions = request.user.received_tips.all()
     else:
-        transactions = request.user.transactions.all().order_by('-created_at')[:50]
+        transactions = request.user.transactions.all()
+
+    transaction_type = request.GET.get('type')
+    if transaction_type:
+        if transaction_type not in dict(Transaction.TRANSACTION_TYPES):
+            return Response({'error': f"Invalid type '{transaction_type}'"}, status=status.HTTP_400_BAD_REQUEST)
+        transactions = transactions.filter(transaction_type=transaction_type)
+
+    transaction_status = request.GET.get('status')
+    if transaction_status:
+        if transaction_status not in dict(Transaction.STATUS_CHOICES):
+            return Response({'error': f"Invalid status '{transaction_status}'"}, status=status.HTTP_400_BAD_REQUEST)
+        transactions = transactions.filter(status=transaction_status)
+
+    try:
+        if request.GET.get('start_date'):
+            transactions = transactions.filter(created_at__gte=parse_date_param(request.GET['start_date']))
+        if request.GET.get('end_date'):
+            transactions = transactions.filter(
+                created_at__lte=parse_date_param(request.GET['end_date'], end_of_day=True)
+            )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    cursor = request.GET.get('cursor')
+    count_mode = request.GET.get('count', 'none' if cursor else 'approximate')
+    if count_mode not in ('exact', 'approximate', 'none'):
+        return Response({'error': f"Invalid count '{count_mode}'"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        page, next_cursor = HISTORY_PAGINATOR.paginate(
+            transactions.select_related('employee'),
+            cursor=cursor,
+            page_size=request.GET.get('page_size')
+        )
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    serializer = TransactionSerializer(transactions, many=True)
+    total_count, count_exact = None, None
+    if count_mode == 'exact':
+        total_count, count_exact = transactions.count(), True
+    elif count_mode == 'approximate':
+        total_count, count_exact = approximate_count(transactions)
+
+    serializer = TransactionSerializer(page, many=True)
     return Response({
         'transactions': serializer.data,
-        'total_count': transactions.count()
+        'total_count': total_count,
+        'total_count_exact': count_exact,
+        'next_cursor': next_cursor
     })
 
 
@@ -295,44 +398,23 @@ def transaction_statistics(request):
 
     transactions = request.user.transactions.all()
 
-    # Filter by date
-    if start_date_str:
-        try:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-            start_date = timezone.make_aware(start_date)
-            transactions = transactions.filter(created_at__gte=start_date)
-        except ValueError:
-            pass
+    # Filter by date; a malformed date is an error rather than an unbounded scan
+    try:
+        start_date = parse_date_param(start_date_str) if start_date_str else None
+        end_date = parse_date_param(end_date_str, end_of_day=True) if end_date_str else None
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-    if end_date_str:
-        try:
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-            end_date = timezone.make_aware(end_date).replace(
-                hour=23, minute=59, second=59, microsecond=999999)
-            transactions = transactions.filter(created_at__lte=end_date)
-        except ValueError:
-            pass
-
-    # Summary
-    total_tips = transactions.filter(transaction_type='tip').count()
-    total_payouts = transactions.filter(transaction_type='payout').count()
-    total_tips_amount = transactions.filter(transaction_type='tip').aggregate(Sum('amount'))['amount__sum'] or 0
-    total_payouts_amount = transactions.filter(transaction_type='payout').aggregate(Sum('amount'))['amount__sum'] or 0
-
-    # Monthly statistics (last 6 months)
+    if start_date and end_date and start_date > end_date:
+        return Response({'error': 'start_date is after end_date'}, status=status.HTTP_400_BAD_REQUEST)
+    if start_date:
+        transactions = transactions.filter(created_at__gte=start_date)
+    if end_date:
+        transactions = transactions.filter(created_at__lte=end_date)
+
+    # Summary and monthly statistics (last 6 months) in one query
     six_months_ago = timezone.now() - timedelta(days=180)
-    monthly_stats = (
-        transactions.filter(created_at__gte=six_months_ago)
-        .annotate(month=TruncMonth('created_at'))
-        .values('month')
-        .annotate(
-            tips_count=Count('id', filter=Q(transaction_type='tip')),
-            tips_amount=Sum('amount', filter=Q(transaction_type='tip')),
-            payouts_count=Count('id', filter=Q(transaction_type='payout')),
-            payouts_amount=Sum('amount', filter=Q(transaction_type='payout')),
-        )
-        .order_by('month')
-    )
+    summary, monthly_stats = PaymentService.get_transaction_statistics(transactions, six_months_ago)
 
     return Response({
         'success': True,
@@ -342,14 +424,14 @@ def transaction_statistics(request):
                 'end_date': end_date_str
             },
             'summary': {
-                'total_transactions': transactions.count(),
-                'tips_count': total_tips,
-                'payouts_count': total_payouts,
-                'tips_amount': float(total_tips_amount),
-                'payouts_amount': float(total_payouts_amount),
-                'net_income': float(total_tips_amount - total_payouts_amount)
+                'total_transactions': summary['total_transactions'],
+                'tips_count': summary['tips_count'],
+                'payouts_count': summary['payouts_count'],
+                'tips_amount': float(summary['tips_amount']),
+                'payouts_amount': float(summary['payouts_amount']),
+                'net_income': float(summary['tips_amount'] - summary['payouts_amount'])
             },
-            'monthly_stats': list(monthly_stats)
+            'monthly_stats': monthly_stats
         }
     })
 
@@ -377,12 +459,22 @@ def organization_statistics(request):
 
     try:
         logger.info(f"Getting statistics for organization: {request.user.uuid}, period: {period}")
-        statistics = PaymentService.get_organization_statistics(str(request.user.uuid), period)
+        organization_uuid = str(request.user.uuid)
+        if period in PaymentService.STATISTICS_PERIODS:
+            statistics, cached, cache_age = OrganizationStatsCache.get_or_compute(
+                organization_uuid, period,
+                lambda: PaymentService.get_organization_statistics(organization_uuid, period)
+            )
+        else:
+            statistics = PaymentService.get_organization_statistics(organization_uuid, period)
+            cached, cache_age = False, 0.0
         logger.info(f"Statistics retrieved successfully for period {period}")
 
         return Response({
             'success': True,
-            'statistics': statistics
+            'statistics': statistics,
+            'cached': cached,
+            'cache_age': round(cache_age, 1)
         })
 
     except ValidationError as e:
@@ -393,4 +485,66 @@ def organization_statistics(request):
         return Response(
             {'error': 'Error retrieving organization statistics'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+@api_view(['GET', 'POST'])
+@authentication_classes([SessionAuthentication])
+@permission_classes([IsAuthenticatedUserData])
+def organization_qr_export(request):
+    """
+    QR codes of the organization's employees as one download.
+
+    ?as=zip (default, ?image=png|svg) or ?as=pdf (one A6 page per employee).
+    A subset is chosen with ?employees=<uuid>,<uuid> or a POST body {"employees": [...]}.
+    The response is streamed while the codes are being rendered.
+    """
+    if request.user.user_type != 'organization':
+        return Response(
+            {'error': 'Only organizations can export QR codes'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    output = request.query_params.get('as', 'zip')
+    image_format = request.query_params.get('image', 'png')
+    if output not in ('zip', 'pdf'):
+        return Response({'error': f"Unsupported export '{output}'"}, status=status.HTTP_400_BAD_REQUEST)
+    if image_format not in QR_FORMATS:
+        return Response({'error': f"Unsupported format '{image_format}'"}, status=status.HTTP_400_BAD_REQUEST)
+
+    if request.method == 'POST':
+        selected = request.data.get('employees') or []
+    else:
+        selected = [value for value in request.query_params.get('employees', '').split(',') if value.strip()]
+    if not isinstance(selected, list):
+        return Response({'error': 'employees must be a list of UUIDs'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        selected = {uuid.UUID(str(value).strip()) for value in selected}
+    except ValueError:
+        return Response({'error': 'employees must be a list of UUIDs'}, status=status.HTTP_400_BAD_REQUEST)
+
+    employees = UserData.objects.filter(organization=request.user, user_type='employee')
+    if selected:
+        employees = employees.filter(uuid__in=selected)
+    employees = list(employees.order_by('name', 'uuid').values_list('uuid', 'name'))
+
+    if selected and len(employees) != len(selected):
+        unknown = selected - {employee_uuid for employee_uuid, _ in employees}
+        return Response(
+            {'error': 'Employees not found in the organization', 'employees': sorted(map(str, unknown))},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if not employees:
+        return Response({'error': 'The organization has no employees'}, status=status.HTTP_404_NOT_FOUND)
+
+    logger.info(f"QR export of {len(employees)} employees ({output}) for organization {request.user.uuid}")
+    if output == 'pdf':
+        response = StreamingHttpResponse(
+            qr_export.stream_pdf(employees, title=request.user.name or ''), content_type='application/pdf'
+        )
+    else:
+        response = StreamingHttpResponse(
+            qr_export.stream_zip(employees, image_format), content_type='application/zip'
+        )
+    response['Content-Disposition'] = f'attachment; filename="qr-codes.{output}"'
+    response['Cache-Control'] = 'private, no-store'
+    return response
@@ -0,0 +1,299 @@
+"""
+Stripe webhook ingestion.
+
+The webhook view only verifies the signature and appends the event to the
+StripeEvent table (StripeEventLog.store), so Stripe is acknowledged without
+waiting for the database work of the payment. StripeEventWorker
+(`manage.py process_stripe_events`) then applies the stored events in Stripe's
+order with retries; events that keep failing end up 'dead' until replayed
+with `manage.py replay_stripe_events`.
+
+handle_event holds the processing itself and is also used directly when
+STRIPE_WEBHOOK_ASYNC is off. The StripeEvent table doubles as the ledger of
+processed event ids in both modes, and a tip that is already settled makes
+every further event of its PaymentIntent a no-op: duplicates and the redundant
+events Stripe sends for one payment cost one indexed lookup and a counter
+increment (see count).
+"""
+import json
+import logging
+import random
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, close_old_connections, transaction as db_transaction
+from django.utils import timezone
+
+from .models import StripeEvent, Transaction
+from .payment_service import PaymentService
+
+logger = logging.getLogger(__name__)
+
+COUNTER_KEY = "webhook_count:{}"
+COUNTERS = ('received', 'duplicate', 'redundant', 'applied')
+
+
+def count(name: str, amount: int = 1):
+    """
+    Adds to a counter in the shared cache, so that every web worker and the
+    process_stripe_events worker add up. The DatabaseCache increments by read and
+    write, concurrent increments may be lost there; Redis counts exactly.
+    """
+    key = COUNTER_KEY.format(name)
+    if not cache.add(key, amount, None):
+        try:
+            cache.incr(key, amount)
+        except ValueError:
+            cache.add(key, amount, None)
+
+
+def counters() -> dict:
+    """Event counters of all processes: received, duplicate, redundant, applied"""
+    values = cache.get_many([COUNTER_KEY.format(name) for name in COUNTERS])
+    return {name: values.get(COUNTER_KEY.format(name), 0) for name in COUNTERS}
+
+
+def payment_intent_of(event):
+    """The PaymentIntent an event is about, None for other events"""
+    obj = event['data']['object']
+    if event['type'].startswith('payment_intent.'):
+        return obj.get('id')
+    if event['type'] in ('checkout.session.completed', 'charge.succeeded'):
+        return obj.get('payment_intent')
+    return None
+
+
+def is_redundant(event) -> bool:
+    """The event is about a tip that an earlier event of the same payment has already settled"""
+    payment_intent_id = payment_intent_of(event)
+    return bool(payment_intent_id) and PaymentService.is_payment_settled(payment_intent_id)
+
+
+def handle_event(event, check_settled: bool = True) -> str:
+    """Applies one Stripe event and returns 'applied' or 'redundant'; raises if it should be retried"""
+    if check_settled and is_redundant(event):
+        count('redundant')
+        return 'redundant'
+
+    if event['type'] == 'payment_intent.succeeded':
+        payment_intent = event['data']['object']
+
+        transaction = PaymentService.confirm_tip_payment(payment_intent['id'])
+        if transaction:
+            print(f"✅ Transaction {transaction.id} confirmed successfully")
+        else:
+            print(f"❌ Failed to confirm transaction for payment intent {payment_intent['id']}")
+
+    elif event['type'] == 'checkout.session.completed':
+        session = event['data']['object']
+
+        try:
+            transaction = Transaction.objects.get(stripe_checkout_session_id=session['id'])
+            print(f"📄 Found transaction by checkout_session_id: {transaction.id}")
+
+            if session.get('payment_intent') and transaction.stripe_payment_intent_id != session['payment_intent']:
+                transaction.stripe_payment_intent_id = session['payment_intent']
+                transaction.save(update_fields=['stripe_payment_intent_id'])
+                print(f"📝 Updated transaction {transaction.id} with payment_intent: {session['payment_intent']}")
+
+            transaction = PaymentService.confirm_tip_payment(session['payment_intent'])
+            if transaction:
+                print(f"✅ Transaction {transaction.id} confirmed from session")
+            else:
+                print(f"❌ Failed to confirm transaction from session {session['id']}")
+
+        except Transaction.DoesNotExist:
+            print(f"❌ Transaction not found for checkout_session_id {session['id']}")
+            metadata = session.get('metadata', {})
+            transaction_id = metadata.get('transaction_id')
+            if transaction_id:
+                try:
+                    transaction = Transaction.objects.get(id=transaction_id)
+                    print(f"📄 Found transaction by metadata transaction_id: {transaction.id}")
+
+                    transaction.stripe_checkout_session_id = session['id']
+                    update_fields = ['stripe_checkout_session_id', 'updated_at']
+                    if session.get('payment_intent'):
+                        transaction.stripe_payment_intent_id = session['payment_intent']
+                        update_fields.append('stripe_payment_intent_id')
+                    transaction.save(update_fields=update_fields)
+
+                    if session.get('payment_intent'):
+                        transaction = PaymentService.confirm_tip_payment(session['payment_intent'])
+                        if transaction:
+                            print(f"✅ Transaction {transaction.id} confirmed from metadata")
+
+                except Transaction.DoesNotExist:
+                    print(f"❌ Transaction not found by metadata either: {transaction_id}")
+
+    elif event['type'] == 'charge.succeeded':
+        charge = event['data']['object']
+
+        if charge.get('payment_intent'):
+            transaction = PaymentService.confirm_tip_payment(charge['payment_intent'])
+            if transaction:
+                print(f"✅ Transaction {transaction.id} confirmed from charge")
+            else:
+                print(f"❌ Failed to confirm transaction from charge {charge['id']}")
+
+    elif event['type'] == 'payment_intent.payment_failed':
+        payment_intent = event['data']['object']
+        print(f"❌ Payment failed: {payment_intent['id']}")
+
+        try:
+            transaction = Transaction.objects.get(stripe_payment_intent_id=payment_intent['id'])
+            transaction.status = 'failed'
+            transaction.save(update_fields=['status'])
+            print(f"📝 Transaction {transaction.id} marked as failed")
+        except Transaction.DoesNotExist:
+            print(f"⚠️ Transaction not found for failed payment intent {payment_intent['id']}")
+
+    else:
+        print(f"ℹ️ Unhandled event type: {event['type']}")
+
+    count('applied')
+    return 'applied'
+
+
+class StripeEventLog:
+    @staticmethod
+    def seen(event_id: str) -> bool:
+        """Whether the event is already stored (queued or processed), a lookup on the unique event_id"""
+        return StripeEvent.objects.filter(event_id=event_id).exists()
+
+    @staticmethod
+    def store(event: dict, processed: bool = False) -> bool:
+        """
+        Appends the verified raw event, as already processed when the caller handled it;
+        returns False for a redelivery of an event that is already stored.
+        """
+        extra = {'status': 'processed', 'attempts': 1, 'processed_at': timezone.now()} if processed else {}
+        try:
+            with db_transaction.atomic():
+                StripeEvent.objects.create(
+                    event_id=event['id'],
+                    event_type=event['type'],
+                    payload=event,
+                    stripe_created=datetime.fromtimestamp(event.get('created', 0), tz=dt_timezone.utc),
+                    **extra
+                )
+        except IntegrityError:
+            return False
+        return True
+
+    @staticmethod
+    def receive(payload: bytes, process_now: bool) -> str:
+        """
+        Webhook entry point for a verified payload. Returns 'redundant' for an event of an
+        already settled payment and 'duplicate' for an event id already in the ledger, both
+        answered by a lookup and a counter increment, otherwise 'queued' or, with
+        process_now, the handle_event outcome.
+        """
+        event = json.loads(payload)
+        count('received')
+        # checked first: it also answers most redeliveries, which are of settled payments
+        if is_redundant(event):
+            count('redundant')
+            return 'redundant'
+        if StripeEventLog.seen(event['id']):
+            count('duplicate')
+            return 'duplicate'
+
+        if not process_now:
+            if not StripeEventLog.store(event):
+                # a concurrent delivery of the same event won the insert
+                count('duplicate')
+                return 'duplicate'
+            return 'queued'
+
+        outcome = handle_event(event, check_settled=False)
+        StripeEventLog.store(event, processed=True)
+        return outcome
+
+
+class StripeEventWorker:
+    def __init__(self, batch_size: int = None):
+        self.batch_size = batch_size or getattr(settings, 'STRIPE_EVENT_BATCH_SIZE', 100)
+        self.max_attempts = getattr(settings, 'STRIPE_EVENT_MAX_ATTEMPTS', 8)
+        self.base_delay = getattr(settings, 'STRIPE_EVENT_RETRY_BASE_DELAY', 5)
+        self.max_delay = getattr(settings, 'STRIPE_EVENT_RETRY_MAX_DELAY', 900)
+        self.lease = getattr(settings, 'STRIPE_EVENT_LEASE', 60)
+
+    def claim(self) -> list:
+        """Reserves the next batch of due events in Stripe's order; stale 'processing' rows are due too"""
+        now = timezone.now()
+        with db_transaction.atomic():
+            events = list(
+                StripeEvent.objects.select_for_update(skip_locked=True).filter(
+                    status__in=['pending', 'processing'],
+                    next_attempt_at__lte=now,
+                ).order_by('stripe_created', 'id')[:self.batch_size]
+            )
+            if events:
+                StripeEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+                    status='processing',
+                    next_attempt_at=now + timedelta(seconds=self.lease),
+                )
+        return events
+
+    def run_once(self) -> dict:
+        """Processes one batch one event at a time; returns {'processed', 'retried', 'dead', 'redundant'}"""
+        stats = {'processed': 0, 'retried': 0, 'dead': 0, 'redundant': 0}
+        for event in self.claim():
+            outcome = self.process(event)
+            if outcome == 'redundant':
+                stats['processed'] += 1
+            stats[outcome] += 1
+        if stats['retried'] or stats['dead']:
+            logger.warning(
+                "Stripe events: %(processed)d processed (%(redundant)d redundant), %(retried)d retried, %(dead)d dead",
+                stats
+            )
+        return stats
+
+    def process(self, event: StripeEvent) -> str:
+        event.attempts += 1
+        try:
+            result = handle_event(event.payload)
+        except Exception as e:
+            logger.exception("Stripe event %s (%s) failed, attempt %d", event.event_id, event.event_type, event.attempts)
+            event.last_error = repr(e)
+            if event.attempts >= self.max_attempts:
+                event.status = 'dead'
+                outcome = 'dead'
+            else:
+                event.status = 'pending'
+                event.next_attempt_at = timezone.now() + timedelta(seconds=self.backoff(event.attempts))
+                outcome = 'retried'
+        else:
+            event.status = 'processed'
+            event.processed_at = timezone.now()
+            event.last_error = ''
+            outcome = 'redundant' if result == 'redundant' else 'processed'
+
+        # saved per event: after a crash only the unfinished rest of the batch is processed again
+        event.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_error', 'processed_at'])
+        return outcome
+
+    def backoff(self, attempts: int) -> float:
+        """Exponential with full jitter in the upper half: base * 2^(n-1), capped"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay / 2 + random.random() * delay / 2
+
+    def run(self, poll_interval: float = 1.0, stop: threading.Event = None):
+        """Worker loop: drains batches back to back, sleeps poll_interval when idle"""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            close_old_connections()
+            stats = self.run_once()
+            if not any(stats.values()):
+                stop.wait(poll_interval)
+
+    @staticmethod
+    def replay(events) -> int:
+        """Queues the given StripeEvent rows (a queryset) for processing again"""
+        return events.update(
+            status='pending', attempts=0, next_attempt_at=timezone.now(), last_error='', processed_at=None
+        )